@@ -0,0 +1,210 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/admission.py
+# Per-endpoint admission control and load shedding
+# -----------------------------------------------------------------------------
+# Every endpoint class gets its own lane: a concurrency limit, a bounded FIFO
+# wait queue and a maximum wait. Lanes are independent, so a burst of
+# /transcribe or /analyze-video calls can only fill their own lanes and never
+# delays text inference. Requests beyond a full queue, or that waited too
+# long, are rejected at once with 503 and a Retry-After estimate. A request
+# that spans several lanes (/analyze-complaint) is admitted to its own lane
+# and holds the audio/video slots only while its media stages run.
+#
+# Limits come from ML_ADMISSION_<LANE>=<concurrency>:<queue>[:<max wait s>],
+# e.g. ML_ADMISSION_AUDIO=2:8:30. ML_ADMISSION_ENABLED=0 turns it off.
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import metrics
+
+ENABLED = os.environ.get("ML_ADMISSION_ENABLED", "1") != "0"
+
+ADMITTED = metrics.Counter(
+    'ml_admission_admitted_total', 'Requests admitted, by lane.', ['lane'],
+)
+REJECTED = metrics.Counter(
+    'ml_admission_rejected_total', 'Requests shed with 503, by lane and reason (queue_full/timeout).',
+    ['lane', 'reason'],
+)
+ACTIVE = metrics.Gauge(
+    'ml_admission_active', 'Requests currently holding a lane slot.', ['lane'],
+)
+LIMIT = metrics.Gauge(
+    'ml_admission_limit', 'Concurrency limit per lane.', ['lane'],
+)
+
+
+class Overloaded(Exception):
+    def __init__(self, lane, reason, retry_after):
+        super().__init__(f"{lane} lane overloaded ({reason})")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lane:
+    """Concurrency limit plus a bounded FIFO queue of waiting requests."""
+
+    def __init__(self, name, limit, max_queue, max_wait):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = deque()
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        # Exponentially weighted mean service time, for Retry-After
+        self.avg_service = 1.0
+        LIMIT.set(self.limit, lane=name)
+        ACTIVE.set(0, lane=name)
+        metrics.QUEUE_DEPTH.set(0, queue=f"admission_{name}")
+
+    def retry_after(self):
+        """Seconds until a new request would likely get a slot."""
+        backlog = (len(self.waiting) + 1) / self.limit
+        return max(1, math.ceil(backlog * self.avg_service))
+
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        REJECTED.inc(lane=self.name, reason=reason)
+        return Overloaded(self.name, reason, self.retry_after())
+
+    def _gauges(self):
+        ACTIVE.set(self.active, lane=self.name)
+        metrics.QUEUE_DEPTH.set(len(self.waiting), queue=f"admission_{self.name}")
+
+    async def acquire(self):
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+        else:
+            if len(self.waiting) >= self.max_queue:
+                raise self._reject("queue_full")
+            slot = asyncio.get_running_loop().create_future()
+            self.waiting.append(slot)
+            self._gauges()
+            try:
+                await asyncio.wait_for(asyncio.shield(slot), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                if slot.done():
+                    # Granted just as the wait expired; keep the slot
+                    pass
+                else:
+                    self.waiting.remove(slot)
+                    slot.cancel()
+                    self._gauges()
+                    raise self._reject("timeout")
+            except asyncio.CancelledError:
+                # Client went away while queued: give back a slot handed to us
+                if slot.done() and not slot.cancelled():
+                    self.release(None)
+                else:
+                    self.waiting.remove(slot)
+                    slot.cancel()
+                self._gauges()
+                raise
+        self.admitted += 1
+        ADMITTED.inc(lane=self.name)
+        self._gauges()
+
+    def release(self, service_seconds):
+        if service_seconds is not None:
+            self.avg_service = 0.8 * self.avg_service + 0.2 * service_seconds
+        # Hand the slot straight to the oldest waiter
+        while self.waiting:
+            slot = self.waiting.popleft()
+            if not slot.done():
+                slot.set_result(True)
+                self._gauges()
+                return
+        self.active -= 1
+        self._gauges()
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold a slot around one stage of a request admitted to another lane, so
+        /analyze-complaint's media stages count against the audio and video
+        limits. Raises Overloaded like acquire().
+        """
+        if not ENABLED:
+            yield
+            return
+        await self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "queue_limit": self.max_queue,
+            "max_wait_s": self.max_wait,
+            "active": self.active,
+            "waiting": len(self.waiting),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_service_s": round(self.avg_service, 3),
+        }
+
+
+def lane_from_env(name, limit, max_queue, max_wait):
+    """Build a lane, overridden by ML_ADMISSION_<NAME>=<limit>:<queue>[:<max wait>]."""
+    spec = os.environ.get(f"ML_ADMISSION_{name.upper()}")
+    if spec:
+        parts = spec.split(":")
+        limit = int(parts[0])
+        if len(parts) > 1:
+            max_queue = int(parts[1])
+        if len(parts) > 2:
+            max_wait = float(parts[2])
+    return Lane(name, limit, max_queue, max_wait)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware; holds the lane slot for the whole request, including a
+    streamed response body. `classify(scope)` returns a lane name or None.
+    """
+
+    def __init__(self, app, lanes, classify):
+        self.app = app
+        self.lanes = lanes
+        self.classify = classify
+
+    async def __call__(self, scope, receive, send):
+        if not ENABLED or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        lane = self.lanes.get(self.classify(scope))
+        if lane is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            await lane.acquire()
+        except Overloaded as e:
+            body = json.dumps({"detail": str(e), "lane": e.lane, "retry_after": e.retry_after}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(e.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release(time.perf_counter() - start)
@@ -1,18 +1,50 @@
 # FastAPI application for ML model serving
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from serve_model import predict_complaint
-import uvicorn
+from typing import List, Literal, Optional
+import online_model
+import serve_model
+from serve_model import predict_complaint, predict_complaints, predict_columns
+import admission
+import anyio
+import asyncio
+import cancellation
+import encoding
+import json
+import media_workers
+import metrics
+import model_registry
+import prediction_store
+import profiling
+# Starlette's run_in_threadpool, which also profiles the call for profiled requests
+from profiling import run_in_threadpool, run_limited
+import video_index
+import whisper_tiers
+from video_analysis import remove_temp_file
 import tempfile
 import os
+import time
 import traceback
+from contextlib import asynccontextmanager
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Replay corrections not yet in the saved online model; publish periodically.
+    # Started with the server, not at import, so importing app (tests, the
+    # in-process load test) starts no background threads
+    serve_model.start_online_learning()
+    yield
+
 
 # Create FastAPI app
 app = FastAPI(
     title="GrievAssist ML Service",
     description="ML service for complaint categorization, prioritization, and audio transcription",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -24,26 +56,117 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ========== Whisper Model (lazy load) ==========
-whisper_model = None
 
-def get_whisper_model():
-    global whisper_model
-    if whisper_model is None:
+def route_template(scope):
+    """Path template of the route matching this request (e.g. "/predict"), or None."""
+    for r in app.router.routes:
+        match, _ = r.matches(scope)
+        if match.name == "FULL":
+            return r.path
+    return None
+
+
+# ========== Admission Control ==========
+# Each endpoint class has its own concurrency limit and bounded queue, so
+# media bursts shed load (503 + Retry-After) instead of delaying /predict
+CPU_COUNT = os.cpu_count() or 1
+ENDPOINT_LANES = {
+    "/predict": "text",
+    "/predict/batch": "bulk",
+    "/predict/stream": "bulk",
+    "/predict/store/prune": "bulk",
+    "/feedback": "text",
+    "/transcribe": "audio",
+    "/analyze-video": "video",
+    "/analyze-complaint": "multimodal",
+}
+ADMISSION_LANES = {
+    lane.name: lane for lane in (
+        admission.lane_from_env("text", limit=64, max_queue=256, max_wait=5),
+        admission.lane_from_env("bulk", limit=2, max_queue=4, max_wait=30),
+        admission.lane_from_env("audio", limit=max(1, CPU_COUNT // 4), max_queue=8, max_wait=60),
+        admission.lane_from_env("video", limit=max(1, CPU_COUNT // 4), max_queue=8, max_wait=60),
+        admission.lane_from_env("multimodal", limit=max(1, CPU_COUNT // 4), max_queue=4, max_wait=60),
+    )
+}
+# Media jobs hold a thread for seconds to minutes while they wait on a worker
+# (or run Whisper/OpenCV inline). They borrow threads from their own limiter,
+# sized from the media lanes, so they can never take AnyIO's default pool,
+# which /predict and the other text endpoints run on.
+MEDIA_THREADS = anyio.CapacityLimiter(ADMISSION_LANES["audio"].limit + ADMISSION_LANES["video"].limit)
+app.add_middleware(
+    admission.AdmissionMiddleware,
+    lanes=ADMISSION_LANES,
+    classify=lambda scope: ENDPOINT_LANES.get(route_template(scope)),
+)
+
+
+# ========== Request Metrics ==========
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Label by the route template (not the raw path) to keep cardinality bounded
+    endpoint = route_template(request.scope) or "unmatched"
+    start = time.perf_counter()
+    status = 500
+    metrics.IN_FLIGHT.inc(endpoint=endpoint)
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.IN_FLIGHT.dec(endpoint=endpoint)
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+        metrics.REQUESTS.inc(endpoint=endpoint, method=request.method, status=status)
+
+
+# ========== On-demand Profiling ==========
+# Their work runs in media worker processes, out of the profiler's reach
+UNPROFILABLE_ENDPOINTS = {"/transcribe", "/analyze-video", "/analyze-complaint"} if media_workers.ENABLED else set()
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if not profiling.should_profile(request.headers):
+        return await call_next(request)
+    if request.url.path in UNPROFILABLE_ENDPOINTS:
+        if profiling.requested(request.headers):
+            return JSONResponse(status_code=400, content={
+                "detail": f"{request.url.path} runs in a media worker process and cannot be profiled "
+                          "(set ML_MEDIA_WORKERS=0 to profile it)"
+            })
+        return await call_next(request)
+    session = profiling.start(request.url.path)
+    if session is None:
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    except BaseException:
+        profiling.stop(session)
+        raise
+
+    body = response.body_iterator
+
+    async def profiled_body():
+        # Streamed endpoints do their work while the body is sent
         try:
-            import whisper
-            print("🎙️ Loading Whisper model (base)... This may take a moment on first run.")
-            whisper_model = whisper.load_model("base")
-            print("✅ Whisper model loaded successfully!")
-        except Exception as e:
-            print(f"❌ Failed to load Whisper model: {e}")
-            raise e
-    return whisper_model
+            async for chunk in body:
+                yield chunk
+        finally:
+            name = profiling.stop(session)
+            if name:
+                print(f"🔬 Stored profile {name}")
+            else:
+                print(f"🔬 {request.url.path} did no work off the event loop; no profile stored")
+
+    response.body_iterator = profiled_body()
+    response.headers["X-Profile-Id"] = session.name
+    return response
 
 # ========== Request/Response Models ==========
 class PredictionRequest(BaseModel):
     text: str
     top_k: int = 3
+    # Registry key such as "district/chennai"; unknown keys use the global model
+    model_key: Optional[str] = None
 
 class PredictionResponse(BaseModel):
     category: str
@@ -53,6 +176,40 @@ class PredictionResponse(BaseModel):
     top_k: list
     secondary_categories: list
     category_probs: dict
+    model: str = "global"
+
+MAX_BATCH_SIZE = int(os.environ.get("ML_MAX_BATCH_SIZE", "2000"))
+STREAM_CHUNK_SIZE = int(os.environ.get("ML_STREAM_CHUNK_SIZE", "256"))
+STREAM_MAX_LINE_BYTES = 1024 * 1024
+
+class BatchPredictionRequest(BaseModel):
+    texts: List[str]
+    top_k: int = 3
+    layout: Literal["rows", "columns"] = "rows"
+    model_key: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    layout: str
+    count: int
+    model: str = "global"
+    predictions: Optional[list] = None
+    columns: Optional[dict] = None
+
+class FeedbackItem(BaseModel):
+    text: str
+    category: str
+    priority: Optional[str] = None
+    complaint_id: Optional[str] = None
+
+class FeedbackRequest(BaseModel):
+    items: List[FeedbackItem]
+    publish: bool = False
+
+class StorePruneRequest(BaseModel):
+    ids: List[str] = []
+    model_versions: List[str] = []
+    # Also drop rows made with another vectorizer (never reusable)
+    stale: bool = False
 
 class TranscriptionResponse(BaseModel):
     transcription: str
@@ -61,6 +218,8 @@ class TranscriptionResponse(BaseModel):
     detectedPriority: str
     detectedLanguage: str
     confidence: float
+    whisperTier: str
+    whisperTierReason: str
 
 # ========== Health Check ==========
 @app.get("/")
@@ -69,112 +228,420 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "ml-prediction"}
+    health = {
+        "status": "healthy",
+        "service": "ml-prediction",
+        "model_version": serve_model.model_version(),
+        "online_learning": online_model.stats(),
+        "cascade": serve_model.cascade_stats(),
+        "prediction_store": prediction_store.stats(),
+        "video_index": video_index.stats(),
+    }
+    if media_workers.ENABLED:
+        # Whisper models live in the audio workers
+        health["media_workers"] = media_workers.stats()
+    else:
+        health["whisper"] = dict(whisper_tiers.pool.stats(), batching=whisper_tiers.batching_stats())
+    return health
+
+# ========== Metrics ==========
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text-format metrics: request counts, stage latencies, cache stats."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/models")
+async def model_registry_stats():
+    """Resident per-district/department models, memory use, loads, evictions and hits."""
+    return model_registry.registry.stats()
+
+@app.get("/admission")
+async def admission_stats():
+    """Per-lane limits, current load and admitted/rejected counts."""
+    return {
+        "enabled": admission.ENABLED,
+        "endpoints": ENDPOINT_LANES,
+        "lanes": {name: lane.stats() for name, lane in ADMISSION_LANES.items()},
+    }
+
+# ========== Profiling Debug Endpoints ==========
+@app.get("/debug/profiles")
+async def list_profiles():
+    """List stored request profiles, newest first."""
+    if not profiling.ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set ML_PROFILING_ENABLED=1)")
+    return {"profiles": profiling.list_profiles(), "max_files": profiling.MAX_FILES}
+
+@app.get("/debug/profiles/{name}")
+async def get_profile(name: str, format: str = "pstats"):
+    """Download a stored profile as pstats, or `?format=text` for a top-N table."""
+    if not profiling.ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set ML_PROFILING_ENABLED=1)")
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {name}")
+    if format == "text":
+        return PlainTextResponse(profiling.render_text(path))
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
+
+# ========== Prediction Endpoints ==========
+def format_prediction(result, top_k):
+    """Shape a serve_model result like PredictionResponse (without validating it)."""
+    return {
+        "category": result['dominant_category'],
+        "priority": result['priority'] or 'low',
+        "confidence": result['confidence'],
+        "isFakeScore": result['isFakeScore'],
+        "top_k": result['top_k'][:top_k] if top_k else result['top_k'],
+        "secondary_categories": result['secondary_categories'],
+        "category_probs": result['category_probs'],
+    }
+
+async def negotiated_response(request: Request, payload):
+    """Encode payload as JSON or MessagePack according to the Accept header (in the thread pool)."""
+    try:
+        media_type = encoding.negotiate(request.headers.get("accept"))
+    except encoding.NotAcceptable as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    content = await run_in_threadpool(encoding.encode, payload, media_type)
+    return Response(content=content, media_type=media_type)
+
+async def resolve_model(model_key):
+    """(ModelBundle, served key) for a request; a registry miss loads off the event loop."""
+    if not model_key:
+        return model_registry.registry.resolve(None)
+    return await run_in_threadpool(model_registry.registry.resolve, model_key)
 
-# ========== Prediction Endpoint ==========
 @app.post("/predict", response_model=PredictionResponse)
-async def predict_complaint_endpoint(request: PredictionRequest):
+async def predict_complaint_endpoint(request: PredictionRequest, http_request: Request):
     try:
-        result = predict_complaint(request.text)
-        response = PredictionResponse(
-            category=result['dominant_category'],
-            priority=result['priority'] or 'low',
-            confidence=result['confidence'],
-            isFakeScore=result['isFakeScore'],
-            top_k=result['top_k'][:request.top_k] if request.top_k else result['top_k'],
-            secondary_categories=result['secondary_categories'],
-            category_probs=result['category_probs']
-        )
-        return response
+        model, served_by = await resolve_model(request.model_key)
+        result = await run_in_threadpool(predict_complaint, request.text, model=model)
+        payload = format_prediction(result, request.top_k)
+        payload["model"] = served_by
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    return await negotiated_response(http_request, payload)
 
-# ========== Audio Transcription Endpoint ==========
-@app.post("/transcribe")
-async def transcribe_audio(audio: UploadFile = File(...)):
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch_endpoint(request: BatchPredictionRequest, http_request: Request):
     """
-    Transcribe an audio file using Whisper and classify it using the ML model.
-    Supports English and Tamil audio.
+    Classify many complaints in one vectorized pass.
+    layout="rows" returns a list shaped like /predict; layout="columns" returns
+    one array per field with category_probs as a matrix ordered by `categories`.
     """
-    temp_path = None
+    if len(request.texts) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_SIZE} texts)")
     try:
-        # Save uploaded file to temp location
-        suffix = os.path.splitext(audio.filename)[1] if audio.filename else ".webm"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await audio.read()
-            tmp.write(content)
-            temp_path = tmp.name
-
-        print(f"🎙️ Transcribing audio file: {audio.filename} ({len(content)} bytes)")
-
-        # Transcribe with Whisper
-        model = get_whisper_model()
-        result = model.transcribe(
-            temp_path,
-            language=None,  # Auto-detect language
-            task="transcribe"  # Keep original language
+        model, served_by = await resolve_model(request.model_key)
+        # Up to MAX_BATCH_SIZE rows: off the event loop so other requests keep flowing
+        if request.layout == "columns":
+            columns = await run_in_threadpool(predict_columns, request.texts, model=model)
+            columns["priority"] = [p or 'low' for p in columns["priority"]]
+            payload = {"layout": "columns", "count": len(request.texts), "model": served_by, "columns": columns}
+        else:
+            predictions = await run_in_threadpool(
+                lambda: [format_prediction(r, request.top_k) for r in predict_complaints(request.texts, model=model)]
+            )
+            payload = {
+                "layout": "rows",
+                "count": len(predictions),
+                "model": served_by,
+                "predictions": predictions,
+            }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+    return await negotiated_response(http_request, payload)
+
+# ========== Streaming Bulk Classification ==========
+async def iter_ndjson_records(request: Request):
+    """
+    Incrementally parse an NDJSON request body of {id, text[, model_key]} records.
+    Yields {"line", "id", "text", "model_key"} or {"line", "id", "error"} dicts;
+    only one partial line (capped at STREAM_MAX_LINE_BYTES) is ever buffered.
+    """
+    buffer = b""
+    line_no = 0
+    skipping = False  # inside an over-long line, discarding until newline
+
+    def parse(line):
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            return {"line": line_no, "id": None, "error": f"Invalid JSON: {e}"}
+        if not isinstance(record, dict):
+            return {"line": line_no, "id": None, "error": "Each line must be a JSON object"}
+        text = record.get("text")
+        if not isinstance(text, str):
+            return {"line": line_no, "id": record.get("id"), "error": "Missing or non-string 'text'"}
+        model_key = record.get("model_key")
+        if model_key is not None and not isinstance(model_key, str):
+            return {"line": line_no, "id": record.get("id"), "error": "Non-string 'model_key'"}
+        return {"line": line_no, "id": record.get("id"), "text": text, "model_key": model_key}
+
+    async for chunk in request.stream():
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line, buffer = buffer[:newline], buffer[newline + 1:]
+            line_no += 1
+            if skipping:
+                skipping = False
+                continue
+            if line.strip():
+                yield parse(line)
+        if len(buffer) > STREAM_MAX_LINE_BYTES:
+            line_no += 1
+            skipping = True
+            buffer = b""
+            yield {"line": line_no, "id": None, "error": f"Line exceeds {STREAM_MAX_LINE_BYTES} bytes"}
+    if buffer.strip() and not skipping:
+        line_no += 1
+        yield parse(buffer)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that does not poll receive() for disconnects, so the
+    handler can keep reading the request body while the response streams.
+    A disconnect still surfaces as ClientDisconnect from request.stream().
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def predict_stream_chunk(records, top_k, model_key=None):
+    """
+    Classify one chunk of parsed records; return its NDJSON output bytes and
+    the number of rows returned unchanged. Each row is scored by the model its
+    own model_key (default: `model_key`) resolves to, as on /predict.
+    Complaints the prediction store already scored with that model's current
+    version come back from the store, marked "unchanged": true.
+    """
+    valid = [r for r in records if "text" in r]
+    served = {}
+    for key in {r["model_key"] or model_key for r in valid}:
+        served[key] = model_registry.registry.resolve(key)
+    # One vectorized pass per serving model
+    groups = {}
+    for r in valid:
+        model, served_by = served[r["model_key"] or model_key]
+        groups.setdefault(served_by, (model, []))[1].append(r)
+    outputs = {}
+    n_unchanged = 0
+    for served_by, (model, rows) in groups.items():
+        results, unchanged = prediction_store.rescore(
+            [r["id"] for r in rows], [r["text"] for r in rows], model=model, model_key=served_by,
         )
+        n_unchanged += sum(unchanged)
+        for r, result, same in zip(rows, results, unchanged):
+            out = {"id": r["id"], **format_prediction(result, top_k), "model": served_by}
+            if same:
+                out["unchanged"] = True
+            outputs[r["line"]] = out
+    lines = []
+    for r in records:
+        out = outputs[r["line"]] if "text" in r else {"id": r["id"], "line": r["line"], "error": r["error"]}
+        lines.append(encoding.dumps_json(out))
+    return b"\n".join(lines) + b"\n", n_unchanged
+
+
+@app.post("/predict/stream")
+async def predict_stream_endpoint(request: Request, top_k: int = 3, model_key: Optional[str] = None):
+    """
+    Bulk classification over a single connection.
+    Request body: NDJSON lines of {"id": ..., "text": "..."}, optionally with a
+    "model_key" per line; the model_key query parameter is the default.
+    Response: NDJSON lines shaped like /predict plus "id", in input order,
+    streamed back chunk by chunk (ML_STREAM_CHUNK_SIZE rows per vectorized pass).
+    Bad lines produce {"id", "line", "error"} instead of failing the stream.
+    Rows whose stored prediction is still current carry "unchanged": true.
+    """
+    async def generate():
+        chunk = []
+        rows = unchanged = 0
+        async for record in iter_ndjson_records(request):
+            chunk.append(record)
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                data, skipped = await run_in_threadpool(predict_stream_chunk, chunk, top_k, model_key)
+                rows, unchanged = rows + len(chunk), unchanged + skipped
+                chunk = []
+                yield data
+        if chunk:
+            data, skipped = await run_in_threadpool(predict_stream_chunk, chunk, top_k, model_key)
+            rows, unchanged = rows + len(chunk), unchanged + skipped
+            yield data
+        print(f"🗃️ Bulk stream: {rows} rows, {unchanged} unchanged (served from the prediction store)")
+
+    return DuplexStreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.post("/predict/store/prune")
+async def prune_store_endpoint(request: StorePruneRequest):
+    """
+    Drop rows from the /predict/stream prediction store: by complaint id
+    (deleted complaints), by model version, or all stale rows.
+    """
+    if not (request.ids or request.model_versions or request.stale):
+        raise HTTPException(status_code=400, detail="Give ids, model_versions or stale=true")
+    deleted = await run_in_threadpool(prediction_store.prune, request.ids, request.model_versions, request.stale)
+    return {"deleted": deleted, "store": prediction_store.stats()}
+
+# ========== Admin Feedback ==========
+@app.post("/feedback")
+async def feedback_endpoint(request: FeedbackRequest):
+    """
+    Learn from admin-corrected examples. Corrections update the online model
+    at once and are served from its next publish (every ML_ONLINE_PUBLISH_S,
+    or immediately with "publish": true).
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+    if len(request.items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} items per request")
+    categories = list(serve_model.category_cols)
+    for item in request.items:
+        if item.category not in categories:
+            raise HTTPException(status_code=422, detail=f"Unknown category '{item.category}' (expected one of {categories})")
+        if item.priority is not None and item.priority not in serve_model.PRIORITY_CLASSES:
+            raise HTTPException(status_code=422, detail=f"Unknown priority '{item.priority}'")
+
+    items = [item.model_dump(exclude_none=True) for item in request.items]
+    try:
+        await run_in_threadpool(serve_model.learn_from_feedback, items)
+        published = await run_in_threadpool(online_model.publish) if request.publish else None
+    except Exception as e:
+        print(f"❌ Feedback error: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Feedback failed: {str(e)}")
 
-        transcription = result.get("text", "").strip()
-        detected_language = result.get("language", "unknown")
+    print(f"📝 Learned from {len(items)} admin correction(s)")
+    return {
+        "accepted": len(items),
+        "published": published is not None,
+        "model_version": serve_model.model_version(),
+        "online_learning": online_model.stats(),
+    }
 
-        # Map Whisper language codes to readable names
-        lang_map = {
-            "en": "english",
-            "ta": "tamil",
-            "hi": "hindi",
-        }
-        detected_language_name = lang_map.get(detected_language, detected_language)
-
-        print(f"📝 Transcription ({detected_language_name}): {transcription[:100]}...")
-
-        if not transcription:
-            return {
-                "transcription": "No speech detected in the recording.",
-                "summary": "The audio recording did not contain detectable speech.",
-                "detectedCategory": "other",
-                "detectedPriority": "low",
-                "detectedLanguage": detected_language_name,
-                "confidence": 0.0
-            }
+# ========== Audio Transcription Endpoint ==========
+async def save_upload(upload: UploadFile, default_suffix: str):
+    """Write an uploaded file to a temp path; returns (path, size in bytes)."""
+    suffix = os.path.splitext(upload.filename)[1] if upload.filename else default_suffix
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        content = await upload.read()
+        tmp.write(content)
+        return tmp.name, len(content)
+
+
+def transcribe_file(audio_path: str, token=None):
+    """Transcribe an audio file with Whisper and classify the transcription."""
+    # Model size is picked per clip (length, language confidence, load)
+    result, tier = media_workers.call("audio", "whisper_tiers.transcribe", audio_path, token=token)
+
+    transcription = result.get("text", "").strip()
+    detected_language = result.get("language", "unknown")
+
+    # Map Whisper language codes to readable names
+    lang_map = {
+        "en": "english",
+        "ta": "tamil",
+        "hi": "hindi",
+    }
+    detected_language_name = lang_map.get(detected_language, detected_language)
 
-        # Use existing ML model for category/priority classification
-        try:
-            ml_result = predict_complaint(transcription)
-            category = ml_result['dominant_category']
-            priority = ml_result['priority'] or 'low'
-            confidence = ml_result['confidence']
-        except Exception as ml_err:
-            print(f"⚠️ ML classification failed, using fallback: {ml_err}")
-            category = "other"
-            priority = "medium"
-            confidence = 0.0
-
-        # Generate a simple summary from the transcription
-        summary = generate_summary(transcription)
-
-        response = {
-            "transcription": transcription,
-            "summary": summary,
-            "detectedCategory": category,
-            "detectedPriority": priority,
+    print(f"📝 Transcription ({detected_language_name}): {transcription[:100]}...")
+
+    if not transcription:
+        return {
+            "transcription": "No speech detected in the recording.",
+            "summary": "The audio recording did not contain detectable speech.",
+            "detectedCategory": "other",
+            "detectedPriority": "low",
             "detectedLanguage": detected_language_name,
-            "confidence": confidence
+            "confidence": 0.0,
+            "whisperTier": tier["tier"],
+            "whisperTierReason": tier["reason"],
         }
 
-        print(f"✅ Audio analysis complete: category={category}, priority={priority}, lang={detected_language_name}")
-        return response
+    # Use existing ML model for category/priority classification
+    try:
+        ml_result = predict_complaint(transcription)
+        category = ml_result['dominant_category']
+        priority = ml_result['priority'] or 'low'
+        confidence = ml_result['confidence']
+    except Exception as ml_err:
+        print(f"⚠️ ML classification failed, using fallback: {ml_err}")
+        category = "other"
+        priority = "medium"
+        confidence = 0.0
+
+    # Generate a simple summary from the transcription
+    summary = generate_summary(transcription)
+
+    response = {
+        "transcription": transcription,
+        "summary": summary,
+        "detectedCategory": category,
+        "detectedPriority": priority,
+        "detectedLanguage": detected_language_name,
+        "confidence": confidence,
+        "whisperTier": tier["tier"],
+        "whisperTierReason": tier["reason"],
+    }
+
+    print(f"✅ Audio analysis complete: category={category}, priority={priority}, "
+          f"lang={detected_language_name}, tier={tier['tier']} ({tier['reason']})")
+    return response
+
+
+async def run_cancellable(request: Request, fn, *args, **kwargs):
+    """
+    Run media work fn(*args, token=..., **kwargs) on a MEDIA_THREADS thread.
+    The token is cancelled when the client disconnects or its deadline
+    passes, and fn raises cancellation.Cancelled at its next checkpoint.
+    """
+    token = cancellation.CancelToken(cancellation.deadline_from_headers(request.headers))
+    watcher = asyncio.create_task(cancellation.watch_disconnect(request, token))
+    try:
+        return await run_limited(MEDIA_THREADS, fn, *args, token=token, **kwargs)
+    finally:
+        watcher.cancel()
+
+
+def cancelled_error(request: Request, error):
+    """HTTP error for abandoned work: 504 past the deadline, 499 (client closed) otherwise."""
+    endpoint = route_template(request.scope) or "unmatched"
+    cancellation.CANCELLED.inc(endpoint=endpoint, reason=error.reason)
+    print(f"🛑 {endpoint} stopped early: {error.reason}")
+    if error.reason == "deadline":
+        return HTTPException(status_code=504, detail="Request deadline exceeded")
+    return HTTPException(status_code=499, detail="Client closed request")
 
+
+@app.post("/transcribe")
+async def transcribe_audio(http_request: Request, audio: UploadFile = File(...)):
+    """
+    Transcribe an audio file using Whisper and classify it using the ML model.
+    Supports English and Tamil audio.
+    """
+    temp_path = None
+    try:
+        # Save uploaded file to temp location
+        temp_path, size = await save_upload(audio, ".webm")
+        print(f"🎙️ Transcribing audio file: {audio.filename} ({size} bytes)")
+        # Off the event loop, so text requests keep flowing meanwhile
+        return await run_cancellable(http_request, transcribe_file, temp_path)
+
+    except cancellation.Cancelled as e:
+        raise cancelled_error(http_request, e)
     except Exception as e:
         print(f"❌ Transcription error: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
     finally:
         # Clean up temp file
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
+        remove_temp_file(temp_path)
 
 
 def generate_summary(text: str) -> str:
@@ -205,208 +672,211 @@ class VideoAnalysisResponse(BaseModel):
     category: str
     confidence: float
     frames_analyzed: int
+    frames_decoded: int = 0
+    keyframes: int = 0
+    early_exit: bool = False
     frame_predictions: list = []
 
 
-def analyze_video_frames(video_path: str, max_frames: int = 10):
-    """Extract frames from video and analyze them for complaint categories."""
-    try:
-        import cv2
-    except ImportError:
-        print("⚠️ OpenCV not installed, using fallback analysis")
-        return {"category": "unassigned", "confidence": 0.5, "frames_analyzed": 0, "frame_predictions": []}
-
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise Exception(f"Could not open video: {video_path}")
-
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    duration = total_frames / fps if fps > 0 else 0
-
-    print(f"📹 Video: {total_frames} frames, {fps:.1f} FPS, {duration:.1f}s duration")
-
-    # Extract 1 frame per second, max 10 frames
-    frame_interval = max(int(fps), 1)
-    frames_to_extract = min(max_frames, int(duration) + 1)
-
-    frame_predictions = []
-    frame_idx = 0
-
-    for i in range(frames_to_extract):
-        target_frame = i * frame_interval
-        cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Resize frame to 224x224 for analysis
-        frame_resized = cv2.resize(frame, (224, 224))
-
-        # Analyze frame using visual features
-        prediction = classify_frame(frame_resized, cv2)
-        frame_predictions.append(prediction)
-        frame_idx += 1
-
-    cap.release()
-
-    if not frame_predictions:
-        return {"category": "unassigned", "confidence": 0.5, "frames_analyzed": 0, "frame_predictions": []}
-
-    # Majority voting across frames
-    category_votes = {}
-    confidence_sums = {}
-    for pred in frame_predictions:
-        cat = pred["category"]
-        category_votes[cat] = category_votes.get(cat, 0) + 1
-        confidence_sums[cat] = confidence_sums.get(cat, 0.0) + pred["confidence"]
-
-    # Get winning category
-    winning_category = max(category_votes, key=category_votes.get)
-    avg_confidence = confidence_sums[winning_category] / category_votes[winning_category]
-
-    return {
-        "category": winning_category,
-        "confidence": round(avg_confidence, 4),
-        "frames_analyzed": len(frame_predictions),
-        "frame_predictions": frame_predictions,
-    }
-
-
-def classify_frame(frame, cv2):
-    """Classify a single frame using visual feature analysis.
-
-    Uses color histograms, edge density, and brightness to detect:
-    - Roads: grey/asphalt tones, edge lines
-    - Garbage: diverse colors, high texture variation
-    - Water: blue/brown water tones
-    - Lighting: dark scenes, bright spots
-    """
-    import numpy as np
-
-    # Convert to different color spaces
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-    # Feature 1: Color histogram analysis
-    h_hist = cv2.calcHist([hsv], [0], None, [180], [0, 180]).flatten()
-    s_hist = cv2.calcHist([hsv], [1], None, [256], [0, 256]).flatten()
-    v_hist = cv2.calcHist([hsv], [2], None, [256], [0, 256]).flatten()
-
-    h_hist = h_hist / (h_hist.sum() + 1e-7)
-    s_hist = s_hist / (s_hist.sum() + 1e-7)
-    v_hist = v_hist / (v_hist.sum() + 1e-7)
-
-    # Feature 2: Edge density (Canny)
-    edges = cv2.Canny(gray, 50, 150)
-    edge_density = np.mean(edges) / 255.0
-
-    # Feature 3: Mean brightness & saturation
-    mean_brightness = np.mean(v_hist * np.arange(256))
-    mean_saturation = np.mean(s_hist * np.arange(256))
-
-    # Feature 4: Color dominance
-    blue_ratio = np.sum(h_hist[90:130])   # Blue-cyan hues
-    green_ratio = np.sum(h_hist[35:85])   # Green hues
-    brown_ratio = np.sum(h_hist[10:25])   # Brown/earth hues
-    grey_ratio = 1.0 - np.sum(s_hist[50:])  # Low saturation = grey
-
-    # Score each category
-    scores = {}
-
-    # Roads: grey tones, medium edge density (road markings), low saturation
-    scores["roads"] = float(
-        grey_ratio * 0.35 +
-        min(edge_density * 2, 1.0) * 0.35 +
-        brown_ratio * 0.15 +
-        (1.0 - mean_saturation / 256) * 0.15
-    )
-
-    # Garbage: high color variance (diverse items), high texture
-    color_variance = float(np.std(h_hist))
-    scores["garbage"] = float(
-        color_variance * 3.0 * 0.3 +
-        edge_density * 0.3 +
-        brown_ratio * 0.2 +
-        green_ratio * 0.2
-    )
-
-    # Water: blue tones, low edge density (smooth surface)
-    scores["water"] = float(
-        blue_ratio * 0.4 +
-        (1.0 - edge_density) * 0.25 +
-        mean_saturation / 256 * 0.2 +
-        brown_ratio * 0.15
-    )
-
-    # Lighting: dark scenes, low brightness
-    darkness = 1.0 - (mean_brightness / 256)
-    scores["lighting"] = float(
-        darkness * 0.5 +
-        (1.0 - edge_density) * 0.2 +
-        grey_ratio * 0.15 +
-        (1.0 - mean_saturation / 256) * 0.15
-    )
-
-    # Normalize scores
-    total = sum(scores.values()) + 1e-7
-    for k in scores:
-        scores[k] = scores[k] / total
-
-    # Get predicted category
-    predicted = max(scores, key=scores.get)
-    confidence = scores[predicted]
-
-    return {"category": predicted, "confidence": round(confidence, 4)}
+def analyze_video(video_url: str, max_frames: int = 10, token=None):
+    """Download and classify a video, in a video worker process when enabled."""
+    return media_workers.call("video", "video_analysis.analyze_video_url", video_url, max_frames, token=token)
 
 
 @app.post("/analyze-video", response_model=VideoAnalysisResponse)
-async def analyze_video_endpoint(request: VideoAnalysisRequest):
+async def analyze_video_endpoint(request: VideoAnalysisRequest, http_request: Request):
     """
     Download video from URL, extract frames, analyze with CV, and return category prediction.
     """
-    temp_path = None
     try:
-        import requests as req_lib
-
-        # Step 1: Download video from Cloudinary URL
-        print(f"📥 Downloading video from: {request.video_url[:80]}...")
-        response = req_lib.get(request.video_url, stream=True, timeout=60)
-        response.raise_for_status()
-
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-            for chunk in response.iter_content(chunk_size=8192):
-                tmp.write(chunk)
-            temp_path = tmp.name
-
-        file_size = os.path.getsize(temp_path)
-        print(f"💾 Downloaded video: {file_size / (1024*1024):.2f} MB")
-
-        # Step 2: Analyze video frames
-        result = analyze_video_frames(temp_path, max_frames=10)
-
-        print(f"✅ Video analysis complete: {result['category']} ({result['confidence']:.2%}), {result['frames_analyzed']} frames")
+        result = await run_cancellable(http_request, analyze_video, request.video_url, max_frames=10)
 
         return VideoAnalysisResponse(
             category=result["category"],
             confidence=result["confidence"],
             frames_analyzed=result["frames_analyzed"],
+            frames_decoded=result.get("frames_decoded", 0),
+            keyframes=result.get("keyframes", 0),
+            early_exit=result.get("early_exit", False),
             frame_predictions=result.get("frame_predictions", []),
         )
 
+    except cancellation.Cancelled as e:
+        raise cancelled_error(http_request, e)
     except Exception as e:
         print(f"❌ Video analysis error: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Video analysis failed: {str(e)}")
+
+
+# ========== Multimodal Complaint Analysis ==========
+# Weights used to fuse the per-modality predictions (text is the most reliable)
+MODALITY_WEIGHTS = {"text": 0.5, "voice": 0.3, "video": 0.2}
+PRIORITY_LEVELS = {"high": 3, "medium": 2, "low": 1}
+
+
+def fuse_predictions(predictions):
+    """
+    Combine per-modality predictions ({source, category, priority, confidence}).
+    Category: vote weighted by weight x confidence.
+    Priority: weighted average of high=3 / medium=2 / low=1, rounded half up.
+    Confidence: weighted average.
+    """
+    if not predictions:
+        return {"category": "unassigned", "priority": "low", "confidence": 0.0, "sources": []}
+    if len(predictions) == 1:
+        only = predictions[0]
+        return {
+            "category": only["category"],
+            "priority": only["priority"],
+            "confidence": round(float(only["confidence"]), 4),
+            "sources": [only["source"]],
+        }
+
+    category_scores = {}
+    prio_score = 0.0
+    conf_sum = 0.0
+    total_weight = 0.0
+    for pred in predictions:
+        weight = MODALITY_WEIGHTS[pred["source"]]
+        category_scores[pred["category"]] = (
+            category_scores.get(pred["category"], 0.0) + weight * pred["confidence"]
+        )
+        prio_score += PRIORITY_LEVELS.get(pred["priority"], 1) * weight
+        conf_sum += pred["confidence"] * weight
+        total_weight += weight
+
+    # max() keeps the first category on ties, like the stable sort Node used
+    category = max(category_scores, key=category_scores.get)
+    avg_prio = int(prio_score / total_weight + 0.5)
+    priority = {v: k for k, v in PRIORITY_LEVELS.items()}.get(avg_prio, "low")
+    return {
+        "category": category,
+        "priority": priority,
+        "confidence": round(conf_sum / total_weight, 4),
+        "sources": [pred["source"] for pred in predictions],
+    }
+
+
+def modality_predictions(text_result, voice_result, video_result):
+    """Turn per-modality results into fusion inputs, skipping uninformative ones."""
+    predictions = []
+    if text_result and text_result["category"] != "unassigned":
+        predictions.append({
+            "source": "text",
+            "category": text_result["category"],
+            "priority": text_result["priority"] or "low",
+            "confidence": text_result["confidence"] or 0.5,
+        })
+    if voice_result and voice_result["detectedCategory"] != "other":
+        predictions.append({
+            "source": "voice",
+            "category": voice_result["detectedCategory"],
+            "priority": voice_result["detectedPriority"] or "low",
+            "confidence": voice_result["confidence"] or 0.5,
+        })
+    if video_result and video_result["category"] != "unassigned":
+        predictions.append({
+            "source": "video",
+            "category": video_result["category"],
+            "priority": "medium",  # video analysis doesn't predict priority directly
+            "confidence": video_result["confidence"],
+        })
+    return predictions
+
+
+async def timed_modality(name, fn, *args, lane=None, **kwargs):
+    """
+    Run a blocking pipeline in the threadpool. A media pipeline (one with a
+    `lane`, a key of ADMISSION_LANES) holds a slot of that lane and runs on a
+    MEDIA_THREADS thread. Returns (name, result, error, ms).
+    """
+    start = time.perf_counter()
+    try:
+        if lane is None:
+            result = await run_in_threadpool(fn, *args, **kwargs)
+        else:
+            async with ADMISSION_LANES[lane].slot():
+                result = await run_limited(MEDIA_THREADS, fn, *args, **kwargs)
+        error = None
+    except admission.Overloaded as e:
+        print(f"⚠️ {name} pipeline shed: {e}")
+        result, error = None, str(e)
+    except cancellation.Cancelled as e:
+        result, error = None, str(e)
+    except Exception as e:
+        print(f"⚠️ {name} pipeline failed: {e}")
+        result, error = None, str(e)
+    return name, result, error, round((time.perf_counter() - start) * 1000, 2)
+
+
+@app.post("/analyze-complaint")
+async def analyze_complaint_endpoint(
+    http_request: Request,
+    text: str = Form(...),
+    audio: Optional[UploadFile] = File(None),
+    video_url: Optional[str] = Form(None),
+    video_category: Optional[str] = Form(None),
+    video_confidence: Optional[float] = Form(None),
+    top_k: int = Form(3),
+    model_key: Optional[str] = Form(None),
+):
+    """
+    Analyze a complaint's text, optional voice recording and optional video in
+    one call. The pipelines run concurrently, so latency is that of the slowest
+    modality. A video analyzed earlier can be passed as video_category /
+    video_confidence instead of video_url to fuse it without re-downloading.
+    model_key picks the text model as on /predict.
+    """
+    audio_path = None
+    # Shared by the voice and video pipelines; both stop if the caller goes away
+    token = cancellation.CancelToken(cancellation.deadline_from_headers(http_request.headers))
+    watcher = asyncio.create_task(cancellation.watch_disconnect(http_request, token))
+    try:
+        model, served_by = await resolve_model(model_key)
+        jobs = [timed_modality("text", lambda: dict(format_prediction(predict_complaint(text, model=model), top_k),
+                                                    model=served_by))]
+        if audio is not None and audio.filename:
+            audio_path, size = await save_upload(audio, ".webm")
+            print(f"🎙️ Transcribing audio file: {audio.filename} ({size} bytes)")
+            jobs.append(timed_modality("voice", transcribe_file, audio_path, lane="audio", token=token))
+        if video_url:
+            jobs.append(timed_modality("video", analyze_video, video_url, lane="video", token=token))
+
+        results = {"text": None, "voice": None, "video": None}
+        errors = {}
+        timings = {}
+        for name, result, error, ms in await asyncio.gather(*jobs):
+            results[name] = result
+            timings[name] = ms
+            if error is not None:
+                errors[name] = error
+        if not video_url and video_category:
+            results["video"] = {"category": video_category, "confidence": video_confidence or 0.5}
     finally:
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
+        watcher.cancel()
+        remove_temp_file(audio_path)
+
+    if token.cancelled:
+        raise cancelled_error(http_request, cancellation.Cancelled(token.reason))
+    if "text" in errors:
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {errors['text']}")
+
+    fused = fuse_predictions(modality_predictions(results["text"], results["voice"], results["video"]))
+    print(f"🧮 Fused from {'+'.join(fused['sources']) or 'none'}: category={fused['category']}, "
+          f"priority={fused['priority']}, confidence={fused['confidence']}")
+    return {
+        "text": results["text"],
+        "voice": results["voice"],
+        "video": results["video"],
+        "fused": fused,
+        "errors": errors,
+        "timings_ms": timings,
+    }
 
 
-# Run the app
+# Start the service with start_ml_service.py. Media workers are spawned, and
+# spawn re-imports the main module in each of them: run as a script, this
+# module would load the text models into every worker.
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    raise SystemExit("Start the ML service with: python start_ml_service.py")
 
@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+# -----------------------------------------------------------------------------
+# FILE: server/ml/bench_ml_service.py
+# Offline benchmark suite for the ML service hot paths
+# -----------------------------------------------------------------------------
+# Trains a small, deterministic model fixture from the bundled CSVs, then times
+# the text, video and summary hot paths in-process (no running server needed).
+# Results are written as JSON so two runs can be compared:
+#
+#   python bench_ml_service.py --output before.json
+#   python bench_ml_service.py --output after.json --compare before.json
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = BASE_DIR / 'data'
+
+SAMPLE_TEXTS = [
+    "there are deep potholes on the main road causing accidents",
+    "no water supply in our area for three days",
+    "garbage not collected for a week stinking badly",
+    "traffic signal broken at main junction",
+    "fire broke out in the warehouse near market area",
+    "streetlights not working in our colony very dark at night",
+    "drain overflowing with sewage water on the street",
+    "heavy rain caused flooding in our basement",
+]
+
+
+# ---------------------------------------------------------------------------
+# Timing helpers
+# ---------------------------------------------------------------------------
+def time_call(fn, repeat=50, warmup=3):
+    """Call fn() `warmup` times untimed, then `repeat` times; return seconds per call."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    idx = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[min(idx, len(sorted_values) - 1)]
+
+
+def summarize(samples, items_per_call=1):
+    """Reduce raw per-call timings (seconds) to a JSON-friendly stats dict in ms."""
+    ordered = sorted(samples)
+    mean = statistics.fmean(ordered)
+    return {
+        'n': len(ordered),
+        'items_per_call': items_per_call,
+        'mean_ms': round(mean * 1000, 4),
+        'median_ms': round(statistics.median(ordered) * 1000, 4),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 4),
+        'min_ms': round(ordered[0] * 1000, 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+        'stdev_ms': round(statistics.pstdev(ordered) * 1000, 4),
+        'items_per_sec': round(items_per_call / mean, 2) if mean > 0 else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+def build_model_fixture(out_dir, max_rows):
+    """Train a small model fixture with train_model.py into out_dir."""
+    env = dict(os.environ, ML_MODELS_DIR=str(out_dir), ML_TRAIN_MAX_ROWS=str(max_rows))
+    print(f"🏋️ Training model fixture ({max_rows} rows) into {out_dir} ...")
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(BASE_DIR / 'train_model.py')],
+        cwd=str(BASE_DIR), env=env, check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"✅ Fixture trained in {elapsed:.1f}s")
+    return elapsed
+
+
+def load_corpus_texts(limit=500):
+    """Return complaint descriptions from the bundled CSVs."""
+    import csv
+    texts = []
+    for csv_name in ['complaints_dataset.csv', 'complaints_labeled.csv']:
+        with open(DATA_DIR / csv_name, encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                if row.get('description'):
+                    texts.append(row['description'])
+    return texts[:limit] if limit else texts
+
+
+def make_synthetic_video(path, kind='static', seconds=10, fps=15, size=(320, 240)):
+    """Write a synthetic mp4 clip.
+
+    kind:
+      - static: a single grey "road" scene with light sensor noise
+      - moving: a coloured gradient panning across the frame
+      - cuts:   four hard scene changes (road, water, dark, clutter)
+    """
+    import cv2
+    import numpy as np
+
+    width, height = size
+    rng = np.random.default_rng(42)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+
+    base = np.full((height, width, 3), 110, dtype=np.uint8)
+    cv2.line(base, (width // 2, 0), (width // 2, height), (230, 230, 230), 3)
+    scenes = [
+        base,
+        np.dstack([np.full((height, width), c, np.uint8) for c in (170, 110, 40)]),
+        np.full((height, width, 3), 15, dtype=np.uint8),
+        rng.integers(0, 255, (height, width, 3), dtype=np.uint8),
+    ]
+    gradient = np.tile(np.linspace(0, 179, width, dtype=np.uint8), (height, 1))
+
+    n_frames = int(seconds * fps)
+    for i in range(n_frames):
+        if kind == 'static':
+            noise = rng.integers(0, 4, (height, width, 3), dtype=np.uint8)
+            frame = cv2.add(base, noise)
+        elif kind == 'moving':
+            hue = np.roll(gradient, i * 4, axis=1)
+            hsv = np.dstack([hue, np.full_like(hue, 200), np.full_like(hue, 200)])
+            frame = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+        elif kind == 'cuts':
+            frame = scenes[min(len(scenes) - 1, i * len(scenes) // n_frames)]
+        else:
+            raise ValueError(f"Unknown synthetic video kind: {kind}")
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def make_synthetic_audio(path, seconds=15.0, sample_rate=16000, speech_ratio=0.6, seed=42):
+    """Write a 16-bit mono WAV of speech-like bursts separated by quiet pauses.
+
+    Bursts are harmonic tones with a syllable-rate amplitude envelope; pauses
+    carry low-level background noise. `speech_ratio` is the voiced fraction.
+    """
+    import wave
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    signal = rng.normal(0, 0.003, n)
+
+    pos = int(0.5 * sample_rate)
+    while pos < n:
+        burst = int(rng.uniform(0.8, 2.5) * sample_rate)
+        end = min(n, pos + burst)
+        t = np.arange(end - pos) / sample_rate
+        f0 = rng.uniform(110, 220)
+        voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 5))
+        envelope = 0.5 * (1 - np.cos(2 * np.pi * 4 * t))
+        signal[pos:end] += 0.25 * voice * envelope
+        gap = burst * (1 - speech_ratio) / max(speech_ratio, 1e-3)
+        pos = end + int(gap)
+
+    pcm = (np.clip(signal, -1, 1) * 32767).astype('<i2')
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+def bench_cold_import(models_dir, repeat):
+    """Wall time of a fresh interpreter importing serve_model (artifact load)."""
+    env = dict(os.environ, ML_MODELS_DIR=str(models_dir))
+    cmd = [sys.executable, '-c', 'import serve_model']
+
+    def run():
+        subprocess.run(cmd, cwd=str(BASE_DIR), env=env, check=True, stdout=subprocess.DEVNULL)
+
+    # Baseline interpreter startup so the import cost can be isolated
+    baseline = time_call(
+        lambda: subprocess.run([sys.executable, '-c', 'pass'], check=True),
+        repeat=repeat, warmup=1,
+    )
+    results = {
+        'python_startup': summarize(baseline),
+        'serve_model_cold_import': summarize(time_call(run, repeat=repeat, warmup=1)),
+    }
+    return results
+
+
+def _fastapi_json_response(model_cls, content):
+    """Serialize the way FastAPI does for a declared response_model."""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    validated = model_cls.model_validate(content.model_dump() if hasattr(content, 'model_dump') else content)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def bench_serialization(app, serve_model, corpus, args):
+    """Compare the pydantic response_model path with encoding.py (JSON/MessagePack).
+
+    Each result also records the encoded payload size and the client-side
+    decode time, since parse cost on the Node side is part of the motivation.
+    """
+    import encoding
+
+    results = {}
+    single = app.format_prediction(serve_model.predict_complaint(SAMPLE_TEXTS[0]), 3)
+    batch_size = max(args.batch_sizes)
+    batch_texts = (corpus * (batch_size // len(corpus) + 1))[:batch_size]
+    rows = {
+        'layout': 'rows', 'count': batch_size,
+        'predictions': [app.format_prediction(r, 3) for r in serve_model.predict_complaints(batch_texts)],
+    }
+    columns = serve_model.predict_columns(batch_texts)
+    columns = {'layout': 'columns', 'count': batch_size, 'columns': columns}
+
+    def pydantic_single():
+        return _fastapi_json_response(app.PredictionResponse, app.PredictionResponse(**single))
+
+    def pydantic_rows():
+        return _fastapi_json_response(app.BatchPredictionResponse, app.BatchPredictionResponse(
+            layout='rows', count=batch_size,
+            predictions=[app.PredictionResponse(**p) for p in rows['predictions']],
+        ))
+
+    cases = [
+        ('single_pydantic_json', pydantic_single, 1, 'json'),
+        ('single_fast_json', lambda: encoding.dumps_json(single), 1, 'json'),
+        (f'rows_{batch_size}_pydantic_json', pydantic_rows, batch_size, 'json'),
+        (f'rows_{batch_size}_fast_json', lambda: encoding.dumps_json(rows), batch_size, 'json'),
+        (f'columns_{batch_size}_fast_json', lambda: encoding.dumps_json(columns), batch_size, 'json'),
+    ]
+    if encoding.msgpack is not None:
+        cases += [
+            ('single_msgpack', lambda: encoding.dumps_msgpack(single), 1, 'msgpack'),
+            (f'rows_{batch_size}_msgpack', lambda: encoding.dumps_msgpack(rows), batch_size, 'msgpack'),
+            (f'columns_{batch_size}_msgpack', lambda: encoding.dumps_msgpack(columns), batch_size, 'msgpack'),
+        ]
+    else:
+        print("⚠️ msgpack not installed, skipping MessagePack serialization benchmarks")
+
+    for name, fn, items, fmt in cases:
+        print(f"⏱️  serialize {name}")
+        body = fn()
+        stats = summarize(time_call(fn, repeat=args.repeat * 2), items_per_call=items)
+        stats['payload_bytes'] = len(body)
+        results[f'serialize_{name}'] = stats
+        decode = (lambda: json.loads(body)) if fmt == 'json' else (lambda: encoding.msgpack.unpackb(body))
+        results[f'decode_{name}'] = summarize(time_call(decode, repeat=args.repeat * 2), items_per_call=items)
+    return results
+
+
+def run_benchmarks(models_dir, args):
+    results = {}
+    selected = set(args.only.split(',')) if args.only else None
+
+    def wanted(name):
+        return selected is None or name in selected
+
+    if wanted('startup'):
+        print("⏱️  startup: cold import of serve_model")
+        results.update(bench_cold_import(models_dir, repeat=max(3, args.repeat // 10)))
+
+    # Everything below runs in-process against the fixture
+    os.environ['ML_MODELS_DIR'] = str(models_dir)
+    sys.path.insert(0, str(BASE_DIR))
+    import serve_model
+
+    corpus = load_corpus_texts()
+
+    if wanted('clean_text'):
+        print("⏱️  clean_text")
+        results['clean_text'] = summarize(
+            time_call(lambda: [serve_model.clean_text(t) for t in corpus], repeat=args.repeat),
+            items_per_call=len(corpus),
+        )
+        results['clean_text_no_stopwords'] = summarize(
+            time_call(lambda: [serve_model.clean_text_no_stopwords(t) for t in corpus], repeat=args.repeat),
+            items_per_call=len(corpus),
+        )
+
+    if wanted('predict'):
+        print("⏱️  predict_complaint (single)")
+        text_iter = iter(SAMPLE_TEXTS * (args.repeat + 10))
+        results['predict_single'] = summarize(
+            time_call(lambda: serve_model.predict_complaint(next(text_iter)), repeat=args.repeat)
+        )
+        for batch_size in args.batch_sizes:
+            print(f"⏱️  predict_complaint (batch of {batch_size})")
+            batch = (corpus * (batch_size // len(corpus) + 1))[:batch_size]
+            results[f'predict_batch_{batch_size}'] = summarize(
+                time_call(lambda: [serve_model.predict_complaint(t) for t in batch],
+                          repeat=max(3, args.repeat // 10), warmup=1),
+                items_per_call=batch_size,
+            )
+            print(f"⏱️  predict_complaints (vectorized batch of {batch_size})")
+            results[f'predict_vectorized_{batch_size}'] = summarize(
+                time_call(lambda: serve_model.predict_complaints(batch),
+                          repeat=max(3, args.repeat // 10), warmup=1),
+                items_per_call=batch_size,
+            )
+
+    if wanted('summary') or wanted('serialization'):
+        import app
+
+    if wanted('serialization'):
+        results.update(bench_serialization(app, serve_model, corpus, args))
+
+    if wanted('summary'):
+        print("⏱️  generate_summary")
+        long_texts = [' '.join(corpus[i:i + 6]).replace(' the ', '. The ') for i in range(0, 60, 6)]
+        results['generate_summary'] = summarize(
+            time_call(lambda: [app.generate_summary(t) for t in long_texts], repeat=args.repeat),
+            items_per_call=len(long_texts),
+        )
+
+    if wanted('video'):
+        try:
+            import cv2
+        except ImportError:
+            print("⚠️ OpenCV not installed, skipping video benchmarks")
+        else:
+            import numpy as np
+            import video_analysis
+            rng = np.random.default_rng(0)
+            frame = rng.integers(0, 255, (224, 224, 3), dtype=np.uint8)
+            print("⏱️  classify_frame")
+            results['classify_frame'] = summarize(
+                time_call(lambda: video_analysis.classify_frame(frame, cv2), repeat=args.repeat * 4)
+            )
+            video_dir = Path(tempfile.mkdtemp(prefix='grievassist_bench_video_'))
+            try:
+                for kind in ('static', 'moving', 'cuts'):
+                    print(f"⏱️  analyze_video_frames ({kind})")
+                    path = make_synthetic_video(video_dir / f'{kind}.mp4', kind=kind)
+                    results[f'analyze_video_{kind}'] = summarize(
+                        time_call(lambda: video_analysis.analyze_video_frames(str(path), max_frames=10),
+                                  repeat=max(3, args.repeat // 5), warmup=1)
+                    )
+            finally:
+                shutil.rmtree(video_dir, ignore_errors=True)
+
+    if wanted('vad'):
+        results.update(bench_vad(args))
+
+    return results
+
+
+def bench_vad(args):
+    """Time VAD on synthesized recordings and report the Whisper audio it removes."""
+    import wave
+    import numpy as np
+    import vad
+
+    results = {}
+    audio_dir = Path(tempfile.mkdtemp(prefix='grievassist_bench_audio_'))
+    try:
+        for seconds, speech_ratio in ((15, 0.6), (120, 0.4), (300, 0.3)):
+            name = f'vad_{seconds}s'
+            print(f"⏱️  {name} (speech ratio {speech_ratio})")
+            path = make_synthetic_audio(audio_dir / f'{name}.wav', seconds=seconds, speech_ratio=speech_ratio)
+            with wave.open(str(path), 'rb') as wav:
+                audio = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2').astype(np.float32) / 32768
+            chunks = vad.pack_segments(audio, vad.speech_segments(audio))
+            stats = summarize(time_call(
+                lambda: vad.pack_segments(audio, vad.speech_segments(audio)),
+                repeat=max(3, args.repeat // 5), warmup=1,
+            ))
+            speech = sum(len(c) for c in chunks)
+            # Whisper's cost scales with audio decoded; the encoder with 30 s windows
+            stats.update({
+                'audio_seconds': round(len(audio) / vad.SAMPLE_RATE, 2),
+                'speech_seconds': round(speech / vad.SAMPLE_RATE, 2),
+                'whisper_windows_before': vad.whisper_windows(len(audio)),
+                'whisper_windows_after': len(chunks),
+                'audio_saved_pct': round(100 * (1 - speech / len(audio)), 1),
+            })
+            print(f"   {stats['audio_seconds']}s -> {stats['speech_seconds']}s of speech "
+                  f"({stats['audio_saved_pct']}% less audio), encoder windows "
+                  f"{stats['whisper_windows_before']} -> {stats['whisper_windows_after']}")
+            results[name] = stats
+    finally:
+        shutil.rmtree(audio_dir, ignore_errors=True)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=str(BASE_DIR),
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def environment_info():
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_revision': git_revision(),
+    }
+    for mod in ('numpy', 'sklearn', 'cv2'):
+        try:
+            info[mod] = __import__(mod).__version__
+        except Exception:
+            info[mod] = None
+    return info
+
+
+def compare_results(current, baseline, threshold):
+    """Print per-benchmark median ratios; return names that regressed beyond threshold."""
+    regressions = []
+    print("\n" + "=" * 70)
+    print(f"{'benchmark':32s} {'baseline ms':>12s} {'current ms':>12s} {'ratio':>8s}")
+    print("=" * 70)
+    for name, stats in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            print(f"{name:32s} {'-':>12s} {stats['median_ms']:12.3f} {'new':>8s}")
+            continue
+        ratio = stats['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  ❌'
+        elif ratio < 1 - threshold:
+            flag = '  ✅'
+        print(f"{name:32s} {base['median_ms']:12.3f} {stats['median_ms']:12.3f} {ratio:8.2f}{flag}")
+    return regressions
+
+
+def print_results(results):
+    print("\n" + "=" * 70)
+    print(f"{'benchmark':32s} {'median ms':>10s} {'p95 ms':>10s} {'items/s':>12s}")
+    print("=" * 70)
+    for name, stats in results.items():
+        print(f"{name:32s} {stats['median_ms']:10.3f} {stats['p95_ms']:10.3f} {stats['items_per_sec'] or 0:12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the GrievAssist ML service")
+    parser.add_argument('--output', default='bench_results.json', help='where to write the JSON results')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='relative median slowdown that counts as a regression (default 0.15)')
+    parser.add_argument('--repeat', type=int, default=50, help='timed iterations per micro-benchmark')
+    parser.add_argument('--batch-sizes', type=lambda s: [int(x) for x in s.split(',')], default=[32, 256])
+    parser.add_argument('--fixture-rows', type=int, default=400, help='rows used to train the fixture')
+    parser.add_argument('--models-dir', help='benchmark existing artifacts instead of training a fixture')
+    parser.add_argument('--only', help='comma-separated subset: startup,clean_text,predict,summary,video,serialization,vad')
+    args = parser.parse_args()
+
+    fixture_dir = None
+    fixture_seconds = None
+    if args.models_dir:
+        models_dir = Path(args.models_dir).resolve()
+    else:
+        fixture_dir = Path(tempfile.mkdtemp(prefix='grievassist_bench_models_'))
+        models_dir = fixture_dir
+        fixture_seconds = build_model_fixture(models_dir, args.fixture_rows)
+
+    try:
+        results = run_benchmarks(models_dir, args)
+    finally:
+        if fixture_dir:
+            shutil.rmtree(fixture_dir, ignore_errors=True)
+
+    report = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'environment': environment_info(),
+        'config': {
+            'repeat': args.repeat,
+            'batch_sizes': args.batch_sizes,
+            'fixture_rows': None if args.models_dir else args.fixture_rows,
+            'fixture_train_seconds': round(fixture_seconds, 2) if fixture_seconds else None,
+            'models_dir': str(args.models_dir) if args.models_dir else None,
+        },
+        'results': results,
+    }
+    print_results(results)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions beyond threshold")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -----------------------------------------------------------------------------
+# FILE: server/ml/bench_transport.py
+# Latency benchmark: Unix domain socket vs loopback TCP
+# -----------------------------------------------------------------------------
+# Starts start_ml_service.py with both listeners, then times small /health and
+# /predict requests over:
+#   - tcp_new_conn:   a fresh TCP connection per request (current Node pattern)
+#   - tcp_keepalive:  one persistent TCP connection
+#   - uds_keepalive:  one persistent Unix-socket connection
+#
+#   python bench_transport.py --requests 2000 --output transport.json
+
+import argparse
+import datetime
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_ml_service import SAMPLE_TEXTS, environment_info, summarize
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """http.client connection over an AF_UNIX socket."""
+
+    def __init__(self, socket_path, timeout=30):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            time.sleep(0.25)
+    raise RuntimeError(f"ML service did not become ready on port {port}")
+
+
+def make_request(conn, method, path, body):
+    headers = {'Content-Type': 'application/json'} if body else {}
+    conn.request(method, path, body=body, headers=headers)
+    resp = conn.getresponse()
+    resp.read()
+    if resp.status != 200:
+        raise RuntimeError(f"{method} {path} -> {resp.status}")
+
+
+def time_requests(connect, method, path, bodies, persistent):
+    samples = []
+    conn = connect() if persistent else None
+    for body in bodies:
+        start = time.perf_counter()
+        if not persistent:
+            conn = connect()
+        make_request(conn, method, path, body)
+        if not persistent:
+            conn.close()
+        samples.append(time.perf_counter() - start)
+    if conn is not None:
+        conn.close()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare UDS and TCP latency for small ML service requests')
+    parser.add_argument('--requests', type=int, default=1000, help='timed requests per transport and endpoint')
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    if not hasattr(socket, 'AF_UNIX'):
+        raise SystemExit("❌ Unix domain sockets are not supported on this platform")
+
+    port = free_port()
+    sock_dir = tempfile.mkdtemp(prefix='grievassist_uds_')
+    sock_path = os.path.join(sock_dir, 'ml.sock')
+    proc = subprocess.Popen(
+        [sys.executable, str(BASE_DIR / 'start_ml_service.py'),
+         '--host', '127.0.0.1', '--port', str(port), '--uds', sock_path],
+        cwd=str(BASE_DIR), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    results = {}
+    try:
+        print(f"🚀 Waiting for ML service (tcp :{port}, uds {sock_path}) ...")
+        wait_until_ready(port)
+
+        transports = {
+            'tcp_new_conn': (lambda: http.client.HTTPConnection('127.0.0.1', port, timeout=30), False),
+            'tcp_keepalive': (lambda: http.client.HTTPConnection('127.0.0.1', port, timeout=30), True),
+            'uds_keepalive': (lambda: UnixHTTPConnection(sock_path), True),
+        }
+        predict_bodies = [
+            json.dumps({'text': SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)], 'top_k': 3}).encode()
+            for i in range(args.requests)
+        ]
+        endpoints = {
+            'health': ('GET', '/health', [None] * args.requests),
+            'predict': ('POST', '/predict', predict_bodies),
+        }
+        for endpoint, (method, path, bodies) in endpoints.items():
+            for name, (connect, persistent) in transports.items():
+                print(f"⏱️  {endpoint} over {name}")
+                time_requests(connect, method, path, bodies[:args.warmup], persistent)
+                samples = time_requests(connect, method, path, bodies, persistent)
+                results[f'{endpoint}_{name}'] = summarize(samples)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        if os.path.exists(sock_path):
+            os.unlink(sock_path)
+        os.rmdir(sock_dir)
+
+    print("\n" + "=" * 70)
+    print(f"{'benchmark':32s} {'median ms':>10s} {'p95 ms':>10s} {'mean ms':>10s}")
+    print("=" * 70)
+    for name, stats in results.items():
+        print(f"{name:32s} {stats['median_ms']:10.3f} {stats['p95_ms']:10.3f} {stats['mean_ms']:10.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'environment': environment_info(),
+                'config': {'requests': args.requests},
+                'results': results,
+            }, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/cancellation.py
+# Cooperative cancellation for long-running media requests
+# -----------------------------------------------------------------------------
+# A CancelToken is created per request and handed to the blocking worker
+# (download loop, frame loop, Whisper). The worker calls token.check() at safe
+# points; it raises Cancelled once the client has disconnected or the request's
+# deadline has passed, so abandoned work stops and its temp files are removed.
+#
+# The deadline comes from the caller's X-Request-Timeout-Ms header (a relative
+# budget, so caller and service clocks need not agree), capped by
+# ML_REQUEST_TIMEOUT_S when that is set.
+#
+#   token = CancelToken(deadline_from_headers(request.headers))
+#   watcher = asyncio.create_task(watch_disconnect(request, token))
+#   ... run the work with token, then watcher.cancel()
+
+import os
+import threading
+import time
+
+import metrics
+
+TIMEOUT_HEADER = "x-request-timeout-ms"
+# Server-side ceiling for media requests, in seconds (0 = none)
+MAX_TIMEOUT_S = float(os.environ.get("ML_REQUEST_TIMEOUT_S", "0"))
+# How often a waiting worker thread re-checks its token
+POLL_INTERVAL_S = 0.25
+
+CANCELLED = metrics.Counter(
+    'ml_requests_cancelled_total', 'Media requests stopped early, by endpoint and reason.',
+    ['endpoint', 'reason'],
+)
+
+
+class Cancelled(Exception):
+    def __init__(self, reason):
+        super().__init__(f"request cancelled ({reason})")
+        self.reason = reason
+
+
+class CancelToken:
+    """Thread-safe cancel flag plus an optional monotonic deadline."""
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+        self.reason = None
+        self._event = threading.Event()
+
+    def cancel(self, reason):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self):
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self._event.is_set()
+
+    def check(self):
+        """Raise Cancelled if the request was abandoned or ran out of time."""
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+    def remaining(self, default=None):
+        """Seconds left before the deadline (for I/O timeouts), or `default`."""
+        if self.deadline is None:
+            return default
+        left = max(0.0, self.deadline - time.monotonic())
+        return left if default is None else min(left, default)
+
+
+def deadline_from_headers(headers):
+    """Monotonic deadline from X-Request-Timeout-Ms and ML_REQUEST_TIMEOUT_S, or None."""
+    budgets = []
+    value = headers.get(TIMEOUT_HEADER)
+    if value:
+        try:
+            budgets.append(float(value) / 1000.0)
+        except ValueError:
+            pass
+    if MAX_TIMEOUT_S > 0:
+        budgets.append(MAX_TIMEOUT_S)
+    return time.monotonic() + min(budgets) if budgets else None
+
+
+async def watch_disconnect(request, token):
+    """
+    Cancel `token` when the client goes away; run as a task next to the work
+    and cancel it when the work is done. The request body must already have
+    been read, so the only message left to receive is the disconnect.
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            token.cancel("client disconnected")
+            return
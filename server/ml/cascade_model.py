@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -----------------------------------------------------------------------------
+# FILE: server/ml/cascade_model.py
+# Calibrated cheap first stage for the prediction cascade
+# -----------------------------------------------------------------------------
+# Most complaints ("pothole on main road") are obvious; the full stack
+# (calibrated LinearSVCs, GradientBoosting, IsolationForest) is only needed for
+# the rest. This tool trains a small linear first stage
+# (train_model.train_cascade_stage). It picks the confidence thresholds at
+# which the first stage's answers are at least --target-precision correct
+# (dominant category) and --priority-target correct (priority) on a
+# calibration split. Secondary labels are too noisy in the bundled data to
+# calibrate against; the confidence used also requires every other category
+# to be clearly in or out, and the report shows the micro F1 change.
+#
+# It then evaluates the cascade through serve_model.predict_arrays, against
+# the full stack trained on the same data. It reports the share of texts
+# answered by the first stage, the accuracy change and the latency. Finally,
+# it writes cascade_model.joblib next to the served artifacts:
+#
+#   python cascade_model.py --report cascade_report.json
+#   ML_MODELS_DIR=models_v2 python cascade_model.py --target-precision 0.99
+#
+# serve_model.py loads it when its model_version matches the artifacts.
+# ML_CASCADE=0 turns the cascade off.
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+import serve_model
+import slim_model
+import train_model
+from bench_ml_service import environment_info
+
+BASE_DIR = Path(__file__).resolve().parent
+# Fewer confident calibration rows than this make a threshold meaningless
+MIN_CALIBRATION_ROWS = 20
+# Below 0.5 a threshold would accept undecided categories / minority priorities
+MIN_THRESHOLD = 0.5
+
+
+def calibrate_threshold(confidence, correct, target):
+    """Lowest confidence threshold whose accepted rows are at least `target` correct.
+
+    Returns None when no threshold reaches the target on MIN_CALIBRATION_ROWS rows.
+    """
+    order = np.argsort(-confidence, kind='stable')
+    precision = np.cumsum(correct[order]) / np.arange(1, len(order) + 1)
+    ok = np.flatnonzero((precision >= target) & (np.arange(1, len(order) + 1) >= MIN_CALIBRATION_ROWS))
+    if not len(ok):
+        return None
+    return max(float(confidence[order][ok.max()]), MIN_THRESHOLD)
+
+
+def calibrate(stage, texts, y_multi, y_priority, args):
+    """Add category and priority thresholds to a first stage, from held-out rows."""
+    probs, prio_probs = serve_model.first_stage_proba(list(texts), stage)
+    dominant = np.argmax(probs, axis=1)
+    correct = y_multi[np.arange(len(dominant)), dominant] == 1
+    # Same confidence as serve_model.cascade_confident: distance of the least decided category from 0.5
+    confidence = np.maximum(probs, 1 - probs).min(axis=1)
+    stage['threshold'] = calibrate_threshold(confidence, correct, args.target_precision)
+    stage['priority_threshold'] = None
+    if prio_probs is not None:
+        predicted = np.array(stage['priority_classes'])[np.argmax(prio_probs, axis=1)]
+        stage['priority_threshold'] = calibrate_threshold(
+            prio_probs.max(axis=1), predicted == y_priority, args.priority_target
+        )
+    return stage
+
+
+def scores(arrays, y_multi, y_priority, rows=None):
+    rows = np.arange(len(y_multi)) if rows is None else rows
+    if not len(rows):
+        return {'top1_accuracy': None, 'micro_f1': None, 'priority_accuracy': None}
+    probs = arrays['category_probs'][rows]
+    dominant = np.argmax(probs, axis=1)
+    result = {
+        'top1_accuracy': round(float(np.mean(y_multi[rows, dominant] == 1)), 4),
+        'micro_f1': round(float(f1_score(y_multi[rows], probs >= 0.5, average='micro', zero_division=0)), 4),
+        'priority_accuracy': None,
+    }
+    if y_priority is not None:
+        predicted = np.array([arrays['priority'][i] for i in rows])
+        result['priority_accuracy'] = round(float(accuracy_score(y_priority[rows], predicted)), 4)
+    return result
+
+
+def single_latency_ms(bundle, texts, cascade):
+    samples = []
+    for text in texts:
+        start = time.perf_counter()
+        serve_model.predict_arrays([text], model=bundle, cascade=cascade)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'mean_ms': round(float(np.mean(samples)), 3), 'median_ms': round(float(np.median(samples)), 3)}
+
+
+def evaluate(full, stage, category_cols, priority_le, texts, y_multi, y_priority, latency_texts):
+    """Score the held-out rows through the serving code, with and without the cascade."""
+    tmp_dir = Path(tempfile.mkdtemp(prefix='grievassist_cascade_'))
+    try:
+        slim_model.save_artifacts(full, tmp_dir, category_cols, priority_le)
+        with open(tmp_dir / 'metadata.json', 'w') as f:
+            json.dump({'model_version': 'cascade-eval'}, f)
+        joblib.dump(dict(stage, model_version='cascade-eval'), tmp_dir / 'cascade_model.joblib')
+        bundle = serve_model.ModelBundle(tmp_dir, name='cascade-eval')
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    texts = list(texts)
+    baseline = serve_model.predict_arrays(texts, model=bundle, cascade=False)
+    probs, prio_probs = serve_model.first_stage_proba(
+        [serve_model.clean_text_no_stopwords(t) for t in texts], stage
+    )
+    confident = serve_model.cascade_confident(probs, prio_probs, stage)
+    cascaded = serve_model.predict_arrays(texts, model=bundle, cascade=True)
+
+    first_rows = np.flatnonzero(confident)
+    return {
+        'n_test': len(texts),
+        'short_circuit_ratio': round(float(confident.mean()), 4),
+        'full_stack': scores(baseline, y_multi, y_priority),
+        'cascade': scores(cascaded, y_multi, y_priority),
+        'short_circuited_rows': {
+            'first_stage': scores(cascaded, y_multi, y_priority, first_rows),
+            'full_stack': scores(baseline, y_multi, y_priority, first_rows),
+        },
+        'latency': {
+            'full_stack': single_latency_ms(bundle, latency_texts, cascade=False),
+            'cascade': single_latency_ms(bundle, latency_texts, cascade=True),
+        },
+    }
+
+
+def print_report(result, stage):
+    full, cascade = result['full_stack'], result['cascade']
+    print("\n" + "=" * 72)
+    print(f"Thresholds: category {stage['threshold']}, priority {stage['priority_threshold']}")
+    print(f"Answered by the first stage: {result['short_circuit_ratio']:.1%} of {result['n_test']} held-out texts")
+    print(f"{'':22s} {'top-1 acc':>10s} {'micro F1':>10s} {'priority acc':>13s} {'single ms':>10s}")
+    for name, row in (('full stack', full), ('cascade', cascade)):
+        latency = result['latency']['full_stack' if name == 'full stack' else 'cascade']['mean_ms']
+        prio = f"{row['priority_accuracy']:.4f}" if row['priority_accuracy'] is not None else '-'
+        print(f"{name:22s} {row['top1_accuracy']:>10.4f} {row['micro_f1']:>10.4f} {prio:>13s} {latency:>10.2f}")
+    print("=" * 72)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train and calibrate the cascade first stage')
+    parser.add_argument('--vocab', type=int, default=2000, help='first-stage vocabulary size (default 2000)')
+    parser.add_argument('--target-precision', type=float, default=0.98,
+                        help='required top-1 category accuracy of first-stage answers (default 0.98)')
+    parser.add_argument('--priority-target', type=float, default=0.7,
+                        help='required priority accuracy of first-stage answers (default 0.7)')
+    parser.add_argument('--latency-texts', type=int, default=100, help='held-out texts timed one at a time')
+    parser.add_argument('--report', help='write the JSON report here')
+    parser.add_argument('--no-export', action='store_true', help='evaluate only, do not write the artifact')
+    args = parser.parse_args()
+
+    max_rows = int(os.environ.get('ML_TRAIN_MAX_ROWS', '0') or 0)
+    df, category_cols = train_model.prepare_training_data(max_rows, augment=False)
+    priority_le = None
+    if 'priority' in df.columns:
+        priority_le = LabelEncoder().fit(train_model.normalize_priority(df['priority']))
+
+    def arrays(frame, augment=False):
+        """(texts, y_multi, y_priority, encoded y_priority) of `frame`, optionally augmented first."""
+        if augment:
+            frame = train_model.augment_data(frame, category_cols, n_augments=2)
+        texts, y_multi, y_priority_idx = slim_model.training_arrays(frame, category_cols, priority_le)
+        y_priority = priority_le.inverse_transform(y_priority_idx) if priority_le is not None else None
+        return texts, y_multi, y_priority, y_priority_idx
+
+    # Split the original rows, then augment only the rows that are trained on
+    idx_train, idx_test = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    idx_fit, idx_cal = train_test_split(idx_train, test_size=0.25, random_state=42)
+    print('\nAugmenting the training splits...')
+    X_train, y_train, prio_train, prio_idx_train = arrays(df.iloc[idx_train], augment=True)
+    X_fit, y_fit, prio_fit, _ = arrays(df.iloc[idx_fit], augment=True)
+    X_cal, y_cal, prio_cal, _ = arrays(df.iloc[idx_cal])
+    _, y_test, prio_test, _ = arrays(df.iloc[idx_test])
+
+    print('\n🏋️ Training the full stack on the training split (evaluation baseline)...')
+    full, _ = slim_model.fit_stack(train_model.build_tfidf(), X_train, y_train, prio_idx_train)
+
+    print(f'🏋️ Training the first stage ({args.vocab} terms) and calibrating thresholds...')
+    stage = train_model.train_cascade_stage(X_fit, y_fit, prio_fit, vocab_size=args.vocab)
+    calibrate(stage, X_cal, y_cal, prio_cal, args)
+    if stage['threshold'] is None or (priority_le is not None and stage['priority_threshold'] is None):
+        raise SystemExit("❌ The first stage never reaches the target accuracy; lower --target-precision "
+                         "or --priority-target, or raise --vocab")
+
+    # The threshold search ran on the fit/calibration split; retrain the first stage on all training rows
+    thresholds = {key: stage[key] for key in ('threshold', 'priority_threshold')}
+    stage = train_model.train_cascade_stage(X_train, y_train, prio_train, vocab_size=args.vocab)
+    stage.update(thresholds)
+    raw_test = df['description_clean'].values[idx_test]
+    result = evaluate(full, stage, category_cols, priority_le, raw_test, y_test, prio_test,
+                      list(raw_test[:args.latency_texts]))
+    print_report(result, stage)
+
+    report = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'environment': environment_info(),
+        'config': {'vocab': args.vocab, 'target_precision': args.target_precision,
+                   'priority_target': args.priority_target, 'n_train': int(len(X_train)),
+                   'n_calibration': int(len(idx_cal)), 'n_test': int(len(idx_test))},
+        'thresholds': thresholds,
+        'results': result,
+    }
+
+    if not args.no_export:
+        X_all, y_all, prio_all, _ = arrays(df, augment=True)
+        print(f"\n📦 Retraining the first stage on all {len(X_all)} samples...")
+        final = train_model.train_cascade_stage(X_all, y_all, prio_all, vocab_size=args.vocab)
+        final.update(thresholds)
+        final.update({
+            'model_version': serve_model.MODEL_VERSION,
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'vocab_size': len(final['tfidf'].vocabulary_),
+            'evaluation': {key: result[key] for key in ('short_circuit_ratio', 'full_stack', 'cascade')},
+        })
+        out_path = serve_model.MODELS_DIR / 'cascade_model.joblib'
+        joblib.dump(final, out_path)
+        report['exported'] = {'path': str(out_path), 'model_version': serve_model.MODEL_VERSION}
+        print(f"✅ Cascade first stage for {serve_model.MODEL_VERSION} written to {out_path}")
+        print("   Restart the service to load it (ML_CASCADE=0 turns it off)")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/encoding.py
+# Response content negotiation for the prediction endpoints
+# -----------------------------------------------------------------------------
+# Prediction handlers build plain dicts and encode them here directly, which
+# skips FastAPI's response-model validation and jsonable_encoder pass.
+#
+#   Accept: application/json       -> JSON (orjson when installed)
+#   Accept: application/msgpack    -> MessagePack (requires `msgpack`)
+#
+# Both serializers are optional; JSON falls back to the standard library.
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+MSGPACK_ALIASES = {'application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack'}
+
+
+class NotAcceptable(Exception):
+    """Raised when the client accepts no media type we can produce."""
+
+
+def available_types():
+    return [JSON, MSGPACK] if msgpack is not None else [JSON]
+
+
+def _parse_accept(accept):
+    """Yield (media_type, q) pairs from an Accept header."""
+    for part in accept.split(','):
+        fields = [f.strip() for f in part.split(';')]
+        media = fields[0].lower()
+        if not media:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith('q='):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        yield media, q
+
+
+def negotiate(accept):
+    """Pick JSON or MessagePack for an Accept header (JSON when absent or unknown)."""
+    if not accept:
+        return JSON
+    best, best_q = None, 0.0
+    wants_msgpack = False
+    for media, q in _parse_accept(accept):
+        if media in MSGPACK_ALIASES:
+            wants_msgpack = True
+            candidate = MSGPACK if msgpack is not None else None
+        elif media in (JSON, 'application/*', '*/*'):
+            candidate = JSON
+        else:
+            candidate = None
+        # Ties go to the first listed type, as clients usually list preference first
+        if candidate and q > best_q:
+            best, best_q = candidate, q
+    if best is None:
+        if wants_msgpack:
+            raise NotAcceptable(f"Supported media types: {', '.join(available_types())}")
+        # Unknown types (e.g. text/html) keep the historical JSON behaviour
+        return JSON
+    return best
+
+
+def dumps_json(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps_msgpack(obj):
+    if msgpack is None:
+        raise NotAcceptable('MessagePack support requires the `msgpack` package')
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def encode(obj, media_type):
+    """Serialize obj for media_type; returns bytes."""
+    if media_type == MSGPACK:
+        return dumps_msgpack(obj)
+    return dumps_json(obj)
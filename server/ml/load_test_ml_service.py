@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -----------------------------------------------------------------------------
+# FILE: server/ml/load_test_ml_service.py
+# Concurrent load generator for the ML service
+# -----------------------------------------------------------------------------
+# Drives /predict, /transcribe and /analyze-video with a weighted traffic mix
+# at a target concurrency (and optionally a fixed arrival rate), then reports
+# throughput, error rate and p50/p95/p99 latency per endpoint.
+#
+#   # in-process against app.app (no server needed)
+#   python load_test_ml_service.py --duration 20 --concurrency 16
+#
+#   # against a running service, open-loop at 50 req/s
+#   python load_test_ml_service.py --url http://localhost:8001 --rate 50
+#
+# Audio and video fixtures are synthesized locally; videos are served from a
+# throwaway HTTP server on 127.0.0.1 so /analyze-video never leaves the host.
+
+import argparse
+import asyncio
+import datetime
+import functools
+import http.server
+import itertools
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from bench_ml_service import (
+    SAMPLE_TEXTS,
+    environment_info,
+    load_corpus_texts,
+    make_synthetic_audio,
+    make_synthetic_video,
+    percentile,
+)
+
+ENDPOINTS = ('predict', 'transcribe', 'analyze-video')
+
+
+def parse_mix(value):
+    """Parse 'predict=8,transcribe=1,analyze-video=1' into a weights dict."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError('traffic mix must have at least one positive weight')
+    return mix
+
+
+# ---------------------------------------------------------------------------
+# Local media fixtures
+# ---------------------------------------------------------------------------
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class MediaFixtures:
+    """Synthesizes audio/video clips and serves the videos over local HTTP."""
+
+    def __init__(self, audio_seconds, video_seconds):
+        self.dir = Path(tempfile.mkdtemp(prefix='grievassist_load_media_'))
+        self.audio_paths = []
+        self.video_names = []
+        self.audio_seconds = audio_seconds
+        self.video_seconds = video_seconds
+        self._server = None
+
+    def build(self, need_audio, need_video):
+        if need_audio:
+            for i, ratio in enumerate((0.4, 0.7, 0.9)):
+                self.audio_paths.append(make_synthetic_audio(
+                    self.dir / f'clip_{i}.wav', seconds=self.audio_seconds, speech_ratio=ratio, seed=i))
+        if need_video:
+            for kind in ('static', 'moving', 'cuts'):
+                make_synthetic_video(self.dir / f'{kind}.mp4', kind=kind, seconds=self.video_seconds)
+                self.video_names.append(f'{kind}.mp4')
+            handler = functools.partial(_QuietHandler, directory=str(self.dir))
+            self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def video_url(self, name):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/{name}'
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.status_counts = {}
+
+    def record(self, latency, status):
+        self.latencies.append(latency)
+        key = str(status)
+        self.status_counts[key] = self.status_counts.get(key, 0) + 1
+        if not (isinstance(status, int) and 200 <= status < 300):
+            self.errors += 1
+
+    def report(self, elapsed):
+        ordered = sorted(self.latencies)
+        total = len(ordered)
+        ok = total - self.errors
+        return {
+            'requests': total,
+            'errors': self.errors,
+            'error_rate': round(self.errors / total, 4) if total else 0.0,
+            'throughput_rps': round(ok / elapsed, 2) if elapsed > 0 else 0.0,
+            'p50_ms': round(percentile(ordered, 50) * 1000, 2),
+            'p95_ms': round(percentile(ordered, 95) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 99) * 1000, 2),
+            'mean_ms': round(sum(ordered) / total * 1000, 2) if total else 0.0,
+            'max_ms': round(ordered[-1] * 1000, 2) if total else 0.0,
+            'status_counts': self.status_counts,
+        }
+
+
+async def send_request(client, endpoint, fixtures, texts, rng, timeout):
+    """Issue one request for `endpoint`; return the HTTP status (or exception name)."""
+    if endpoint == 'predict':
+        resp = await client.post('/predict', json={'text': rng.choice(texts), 'top_k': 3}, timeout=timeout)
+    elif endpoint == 'transcribe':
+        path = rng.choice(fixtures.audio_paths)
+        with open(path, 'rb') as f:
+            payload = f.read()
+        resp = await client.post('/transcribe', files={'audio': (path.name, payload, 'audio/wav')}, timeout=timeout)
+    else:
+        url = fixtures.video_url(rng.choice(fixtures.video_names))
+        resp = await client.post('/analyze-video', json={'video_url': url}, timeout=timeout)
+    return resp.status_code
+
+
+async def run_load(client, args, fixtures, texts):
+    rng = random.Random(args.seed)
+    names = list(args.mix)
+    weights = [args.mix[n] for n in names]
+    stats = {name: EndpointStats() for name in names}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    tasks = set()
+
+    async def one(endpoint, scheduled):
+        try:
+            # Latency is measured from the scheduled send time, so queueing
+            # behind the concurrency limit is counted (no coordinated omission).
+            try:
+                status = await send_request(client, endpoint, fixtures, texts, rng, args.timeout)
+            except Exception as e:
+                status = type(e).__name__
+            stats[endpoint].record(time.perf_counter() - scheduled, status)
+        finally:
+            semaphore.release()
+
+    start = time.perf_counter()
+    deadline = start + args.duration if args.duration else None
+    interval = 1.0 / args.rate if args.rate else 0.0
+    for i in itertools.count():
+        if args.requests and i >= args.requests:
+            break
+        scheduled = start + i * interval if interval else time.perf_counter()
+        if deadline and scheduled >= deadline:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await semaphore.acquire()
+        endpoint = rng.choices(names, weights)[0]
+        task = asyncio.create_task(one(endpoint, scheduled if interval else time.perf_counter()))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    return stats, elapsed
+
+
+async def main_async(args):
+    import httpx
+
+    fixtures = MediaFixtures(args.audio_seconds, args.video_seconds).build(
+        need_audio=bool(args.mix.get('transcribe')),
+        need_video=bool(args.mix.get('analyze-video')),
+    )
+    texts = load_corpus_texts() or SAMPLE_TEXTS
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, limits=limits)
+            target = args.url
+        else:
+            from app import app
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://ml-service')
+            target = 'in-process'
+        print(f"🚦 Load test -> {target}: concurrency={args.concurrency}, "
+              f"rate={args.rate or 'unlimited'} req/s, mix={args.mix}")
+        async with client:
+            stats, elapsed = await run_load(client, args, fixtures, texts)
+    finally:
+        fixtures.close()
+    return target, stats, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load generator for the GrievAssist ML service')
+    parser.add_argument('--url', help='base URL of a running service (default: drive app.app in-process)')
+    parser.add_argument('--concurrency', type=int, default=8, help='max requests in flight')
+    parser.add_argument('--rate', type=float, default=0.0, help='target arrivals per second (0 = closed loop)')
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds to generate load (0 = use --requests)')
+    parser.add_argument('--requests', type=int, default=0, help='stop after this many requests')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('predict=8,transcribe=1,analyze-video=1'),
+                        help='weighted endpoint mix, e.g. predict=8,transcribe=1,analyze-video=1')
+    parser.add_argument('--timeout', type=float, default=120.0, help='per-request timeout in seconds')
+    parser.add_argument('--audio-seconds', type=float, default=15.0)
+    parser.add_argument('--video-seconds', type=float, default=8.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args()
+    if not args.duration and not args.requests:
+        parser.error('one of --duration or --requests must be non-zero')
+
+    target, stats, elapsed = asyncio.run(main_async(args))
+
+    report = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'environment': environment_info(),
+        'config': {
+            'target': target,
+            'concurrency': args.concurrency,
+            'rate': args.rate,
+            'duration': args.duration,
+            'requests': args.requests,
+            'mix': args.mix,
+        },
+        'elapsed_sec': round(elapsed, 3),
+        'endpoints': {name: s.report(elapsed) for name, s in stats.items()},
+    }
+
+    print("\n" + "=" * 86)
+    print(f"{'endpoint':15s} {'reqs':>6s} {'err%':>7s} {'rps':>8s} {'p50 ms':>10s} {'p95 ms':>10s} {'p99 ms':>10s} {'max ms':>10s}")
+    print("=" * 86)
+    for name, r in report['endpoints'].items():
+        print(f"{name:15s} {r['requests']:6d} {r['error_rate'] * 100:6.1f}% {r['throughput_rps']:8.2f} "
+              f"{r['p50_ms']:10.1f} {r['p95_ms']:10.1f} {r['p99_ms']:10.1f} {r['max_ms']:10.1f}")
+    print(f"\n⏱️  {elapsed:.1f}s elapsed")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/media_workers.py
+# Supervised worker processes for Whisper and OpenCV
+# -----------------------------------------------------------------------------
+# The API process keeps only the text models. Transcription and video
+# analysis run in separate processes ("audio" and "video" workers), started
+# with the spawn method so nothing is forked from the large API process. Each
+# worker talks to the API over a pipe and runs up to <concurrency> jobs at once
+# on threads, so Whisper's cross-request batching still applies inside it.
+#
+# The supervisor (this module, in the API process):
+#   - restarts a worker that dies (OOM kill, segfault in a codec); only the
+#     jobs in flight on it fail, and /predict is unaffected
+#   - recycles a worker after ML_<KIND>_WORKER_MAX_JOBS jobs, or once its RSS
+#     passes ML_<KIND>_WORKER_MEMORY_MB: no new jobs are sent to it, a
+#     replacement starts at once, and it exits when its last job finishes
+#   - kills a worker outright whose RSS passes 1.5x the cap mid-job
+#   - forwards cancellation (cancellation.py) and each job's deadline, and
+#     removes the temp files of a worker that died
+#   - adds the counter/histogram increments each result carries (stage
+#     timings, cache lookups) to the API process's /metrics
+#
+# ML_MEDIA_WORKERS=0 runs everything in the API process, as before.
+#
+#   result = call("video", "video_analysis.analyze_video_url", url, 10, token=token)
+
+import importlib
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+
+import cancellation
+import metrics
+
+ENABLED = os.environ.get("ML_MEDIA_WORKERS", "1") != "0"
+# A worker over its memory cap by this factor is killed without waiting for its jobs
+HARD_LIMIT_FACTOR = 1.5
+MEMORY_CHECK_INTERVAL_S = 1.0
+
+_ctx = multiprocessing.get_context("spawn")
+
+
+def _kind_config(kind, workers, concurrency, memory_mb, max_jobs):
+    prefix = f"ML_{kind.upper()}_WORKER"
+    return {
+        "workers": int(os.environ.get(f"{prefix}S", workers)),
+        "concurrency": int(os.environ.get(f"{prefix}_CONCURRENCY", concurrency)),
+        "memory_mb": float(os.environ.get(f"{prefix}_MEMORY_MB", memory_mb)),
+        "max_jobs": int(os.environ.get(f"{prefix}_MAX_JOBS", max_jobs)),
+    }
+
+
+KINDS = {
+    "audio": _kind_config("audio", workers=1, concurrency=4, memory_mb=3072, max_jobs=500),
+    "video": _kind_config("video", workers=1, concurrency=2, memory_mb=1024, max_jobs=200),
+}
+
+RESTARTS = metrics.Counter(
+    'ml_media_worker_restarts_total', 'Media worker replacements, by kind and reason (recycled/memory/crashed).',
+    ['kind', 'reason'],
+)
+WORKERS = metrics.Gauge(
+    'ml_media_workers', 'Live media worker processes, by kind.', ['kind'],
+)
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+class WorkerError(Exception):
+    """An exception raised by the job inside the worker (message preserved)."""
+
+
+def rss_mb(pid):
+    """Resident set size of a process in MB (Linux /proc), or None."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _resolve(target):
+    module, _, name = target.rpartition(".")
+    return getattr(importlib.import_module(module), name)
+
+
+# ========== Worker Process ==========
+def _worker_main(kind, conn, concurrency, memory_mb, temp_dir):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Downloads and decoder scratch files land here; removed by the supervisor
+    tempfile.tempdir = temp_dir
+    os.environ["TMPDIR"] = temp_dir
+    send_lock = threading.Lock()
+    tokens = {}
+    exporter = metrics.DeltaExporter()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    def run(job_id, target, args):
+        token = tokens[job_id]
+        try:
+            message = ("done", job_id, "ok", _resolve(target)(*args, token=token))
+        except cancellation.Cancelled as e:
+            message = ("done", job_id, "cancelled", e.reason)
+        except Exception as e:
+            print(f"❌ {kind} worker job failed: {traceback.format_exc()}")
+            message = ("done", job_id, "error", str(e))
+        finally:
+            tokens.pop(job_id, None)
+        # Stage timings and cache lookups recorded here, for the API's /metrics
+        send(message + (exporter.take(),))
+
+    def watch_memory():
+        hard_limit = memory_mb * HARD_LIMIT_FACTOR
+        while True:
+            time.sleep(MEMORY_CHECK_INTERVAL_S)
+            used = rss_mb(os.getpid())
+            if used is not None and used > hard_limit:
+                print(f"💥 {kind} worker at {used:.0f} MB (hard limit {hard_limit:.0f} MB), exiting")
+                send(("killed", "memory"))
+                os._exit(1)
+
+    if memory_mb > 0:
+        threading.Thread(target=watch_memory, name=f"{kind}-memory", daemon=True).start()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"{kind}-job")
+    print(f"🧰 {kind} worker started (pid {os.getpid()})")
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message[0] == "run":
+            _, job_id, target, args, deadline = message
+            tokens[job_id] = cancellation.CancelToken(deadline)
+            executor.submit(run, job_id, target, args)
+        elif message[0] == "cancel":
+            token = tokens.get(message[1])
+            if token is not None:
+                token.cancel("cancelled by caller")
+        elif message[0] == "stop":
+            break
+    executor.shutdown(wait=True)
+
+
+# ========== Supervisor (API process) ==========
+class _Job:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Worker:
+    def __init__(self, kind, config):
+        self.kind = kind
+        self.temp_dir = tempfile.mkdtemp(prefix=f"grievassist_{kind}_worker_")
+        self.conn, child_conn = _ctx.Pipe()
+        self.process = _ctx.Process(
+            target=_worker_main,
+            args=(kind, child_conn, config["concurrency"], config["memory_mb"], self.temp_dir),
+            name=f"grievassist-{kind}-worker", daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.pending = {}
+        self.jobs = 0
+        self.draining = False
+        self.exit_reason = None
+        self.send_lock = threading.Lock()
+
+    def send(self, message):
+        try:
+            with self.send_lock:
+                self.conn.send(message)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def stats(self):
+        used = rss_mb(self.process.pid)
+        return {
+            "pid": self.process.pid,
+            "jobs": self.jobs,
+            "in_flight": len(self.pending),
+            "rss_mb": round(used, 1) if used is not None else None,
+            "draining": self.draining,
+        }
+
+
+class WorkerPool:
+    """Worker processes of one kind, with restart and recycling."""
+
+    def __init__(self, kind, workers, concurrency, memory_mb, max_jobs):
+        self.kind = kind
+        self.config = {"concurrency": max(1, concurrency), "memory_mb": memory_mb}
+        self.size = max(1, workers)
+        self.max_jobs = max_jobs
+        self.workers = []
+        self.restarts = {"recycled": 0, "memory": 0, "crashed": 0}
+        self.cond = threading.Condition()
+        self._ids = itertools.count()
+
+    def _spawn(self):
+        worker = _Worker(self.kind, self.config)
+        self.workers.append(worker)
+        threading.Thread(target=self._read, args=(worker,), name=f"{self.kind}-supervisor", daemon=True).start()
+        WORKERS.set(sum(not w.draining for w in self.workers), kind=self.kind)
+        return worker
+
+    def _retire(self, worker, reason):
+        """Stop routing jobs to `worker`, start its replacement, stop it once idle."""
+        if worker.draining:
+            return
+        worker.draining = True
+        self.restarts[reason] += 1
+        RESTARTS.inc(kind=self.kind, reason=reason)
+        print(f"♻️ Recycling {self.kind} worker {worker.process.pid} ({reason}, {worker.jobs} jobs)")
+        self._spawn()
+        if not worker.pending:
+            worker.send(("stop",))
+
+    def _pick(self):
+        live = [w for w in self.workers
+                if not w.draining and len(w.pending) < self.config["concurrency"]]
+        return min(live, key=lambda w: len(w.pending)) if live else None
+
+    def call(self, target, args, token=None):
+        with self.cond:
+            while len([w for w in self.workers if not w.draining]) < self.size:
+                self._spawn()
+            worker = self._pick()
+            while worker is None:
+                if token is not None:
+                    token.check()
+                self.cond.wait(cancellation.POLL_INTERVAL_S)
+                worker = self._pick()
+            job_id = next(self._ids)
+            job = _Job()
+            worker.pending[job_id] = job
+            worker.jobs += 1
+            if self.max_jobs and worker.jobs >= self.max_jobs:
+                self._retire(worker, "recycled")
+
+        deadline = token.deadline if token is not None else None
+        if not worker.send(("run", job_id, target, args, deadline)):
+            with self.cond:
+                worker.pending.pop(job_id, None)
+            raise WorkerCrashed(f"{self.kind} worker is not accepting jobs")
+        while not job.done.wait(None if token is None else cancellation.POLL_INTERVAL_S):
+            if token.cancelled:
+                # The worker stops at its next checkpoint; the caller need not wait for it
+                worker.send(("cancel", job_id))
+                token.check()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _read(self, worker):
+        """Collect results from one worker; replace it if it dies."""
+        while True:
+            try:
+                message = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "killed":
+                worker.exit_reason = message[1]
+                continue
+            _, job_id, status, payload, deltas = message
+            metrics.REGISTRY.merge(deltas)
+            with self.cond:
+                job = worker.pending.pop(job_id, None)
+                if job is not None:
+                    if status == "ok":
+                        job.result = payload
+                    elif status == "cancelled":
+                        job.error = cancellation.Cancelled(payload)
+                    else:
+                        job.error = WorkerError(payload)
+                    job.done.set()
+                used = rss_mb(worker.process.pid)
+                if not worker.draining and used is not None and used > self.config["memory_mb"] > 0:
+                    self._retire(worker, "memory")
+                if worker.draining and not worker.pending:
+                    worker.send(("stop",))
+                self.cond.notify_all()
+
+        worker.process.join(timeout=5)
+        with self.cond:
+            self.workers.remove(worker)
+            for job in worker.pending.values():
+                job.error = WorkerCrashed(
+                    f"{self.kind} worker exited (code {worker.process.exitcode}) during the job"
+                )
+                job.done.set()
+            if worker.process.exitcode != 0:
+                reason = worker.exit_reason or "crashed"
+                self.restarts[reason] += 1
+                RESTARTS.inc(kind=self.kind, reason=reason)
+                print(f"💥 {self.kind} worker {worker.process.pid} died "
+                      f"(exit code {worker.process.exitcode}, {reason}); "
+                      f"{len(worker.pending)} job(s) failed")
+            if not worker.draining:
+                # A draining worker already has its replacement
+                self._spawn()
+            WORKERS.set(sum(not w.draining for w in self.workers), kind=self.kind)
+            self.cond.notify_all()
+        worker.conn.close()
+        shutil.rmtree(worker.temp_dir, ignore_errors=True)
+
+    def stats(self):
+        with self.cond:
+            return {
+                "concurrency": self.config["concurrency"],
+                "memory_mb": self.config["memory_mb"],
+                "max_jobs": self.max_jobs,
+                "restarts": dict(self.restarts),
+                "workers": [w.stats() for w in self.workers],
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_for(kind):
+    with _pools_lock:
+        if kind not in _pools:
+            _pools[kind] = WorkerPool(kind, **KINDS[kind])
+        return _pools[kind]
+
+
+def call(kind, target, *args, token=None):
+    """
+    Run module.function(*args, token=token) (target "module.function") in a
+    `kind` worker and return its result. Raises cancellation.Cancelled,
+    WorkerError (the job failed) or WorkerCrashed (the worker died).
+    Without ML_MEDIA_WORKERS it runs in the calling thread.
+    """
+    if not ENABLED:
+        return _resolve(target)(*args, token=token)
+    return pool_for(kind).call(target, args, token)
+
+
+def stats():
+    with _pools_lock:
+        return {"enabled": ENABLED, **{kind: pool.stats() for kind, pool in _pools.items()}}
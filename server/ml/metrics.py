@@ -0,0 +1,307 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/metrics.py
+# Minimal Prometheus-style metrics for the ML service
+# -----------------------------------------------------------------------------
+# Counters, gauges and histograms with labels, rendered in the Prometheus text
+# exposition format (version 0.0.4) by `render()`. Kept dependency-free so that
+# serve_model.py can be instrumented without pulling in a client library.
+#
+#   with stage_timer('tfidf_transform'):
+#       vect = tfidf.transform([clean])
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets (seconds) spanning sub-millisecond text stages up to
+# multi-second Whisper transcriptions.
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    kind = 'counter'
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0.0)
+
+    def _dump(self):
+        with self._lock:
+            return dict(self._values)
+
+    def _delta(self, current, previous):
+        return {k: v - previous.get(k, 0.0) for k, v in current.items() if v != previous.get(k, 0.0)}
+
+    def _merge(self, delta):
+        with self._lock:
+            for key, amount in delta.items():
+                self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}' for k, v in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down (in-flight requests, queue depth...)."""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0.0)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}' for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed observations with _sum and _count."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][idx] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _dump(self):
+        with self._lock:
+            return {k: (tuple(v[0]), v[1]) for k, v in self._values.items()}
+
+    def _delta(self, current, previous):
+        delta = {}
+        for key, (counts, total) in current.items():
+            old_counts, old_total = previous.get(key, ((0,) * len(counts), 0.0))
+            if counts != old_counts:
+                delta[key] = ([c - o for c, o in zip(counts, old_counts)], total - old_total)
+        return delta
+
+    def _merge(self, delta):
+        with self._lock:
+            for key, (counts, total) in delta.items():
+                state = self._values.get(key)
+                if state is None:
+                    state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def add_collector(self, fn):
+        """Register a callable run just before rendering (e.g. to refresh derived gauges)."""
+        self._collectors.append(fn)
+
+    def render(self):
+        for fn in self._collectors:
+            fn()
+        return '\n'.join(m.render() for m in self._metrics) + '\n'
+
+    def merge(self, deltas):
+        """Add counter/histogram increments exported by another process (DeltaExporter.take)."""
+        by_name = {m.name: m for m in self._metrics}
+        for name, delta in deltas.items():
+            # Metrics the receiving process never registered are dropped
+            if name in by_name:
+                by_name[name]._merge(delta)
+
+
+class DeltaExporter:
+    """
+    Counter and histogram increments since the previous take(). A media worker
+    sends them with each job result so that the API process's /metrics
+    includes the stages and caches recorded in the worker. Gauges describe
+    the worker's own state and are not exported.
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else REGISTRY
+        self._lock = threading.Lock()
+        self._previous = {}
+
+    def take(self):
+        deltas = {}
+        with self._lock:
+            for metric in self.registry._metrics:
+                if not hasattr(metric, '_delta'):
+                    continue
+                current = metric._dump()
+                delta = metric._delta(current, self._previous.get(metric.name, {}))
+                self._previous[metric.name] = current
+                if delta:
+                    deltas[metric.name] = delta
+        return deltas
+
+
+REGISTRY = Registry()
+
+
+# ---------------------------------------------------------------------------
+# Service metrics
+# ---------------------------------------------------------------------------
+REQUESTS = Counter(
+    'ml_requests_total', 'HTTP requests handled, by endpoint and status code.',
+    ['endpoint', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'ml_request_duration_seconds', 'End-to-end HTTP request latency.', ['endpoint'],
+)
+IN_FLIGHT = Gauge(
+    'ml_requests_in_flight', 'Requests currently being handled.', ['endpoint'],
+)
+QUEUE_DEPTH = Gauge(
+    'ml_queue_depth', 'Work items waiting in internal queues.', ['queue'],
+)
+STAGE_LATENCY = Histogram(
+    'ml_stage_duration_seconds',
+    'Latency of individual pipeline stages (text, audio and video).',
+    ['stage'],
+)
+CACHE_REQUESTS = Counter(
+    'ml_cache_requests_total', 'Cache lookups by cache and result (hit/miss).', ['cache', 'result'],
+)
+CACHE_HIT_RATIO = Gauge(
+    'ml_cache_hit_ratio', 'Fraction of cache lookups that were hits since startup.', ['cache'],
+)
+
+
+def stage_timer(stage):
+    """Context manager recording the duration of a pipeline stage."""
+    return STAGE_LATENCY.time(stage=stage)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def _refresh_cache_ratios():
+    totals = {}
+    with CACHE_REQUESTS._lock:
+        items = list(CACHE_REQUESTS._values.items())
+    for (cache, result), count in items:
+        hits, lookups = totals.get(cache, (0.0, 0.0))
+        totals[cache] = (hits + (count if result == 'hit' else 0.0), lookups + count)
+    for cache, (hits, lookups) in totals.items():
+        CACHE_HIT_RATIO.set(hits / lookups if lookups else 0.0, cache=cache)
+
+
+REGISTRY.add_collector(_refresh_cache_ratios)
+
+
+def render():
+    return REGISTRY.render()
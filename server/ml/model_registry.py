@@ -0,0 +1,171 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/model_registry.py
+# Per-district / per-department models next to the global one
+# -----------------------------------------------------------------------------
+# Specific models live under ML_MODEL_REGISTRY_DIR (default models/registry),
+# one train_model.py artifact set per key:
+#
+#   models/registry/district/chennai/      -> key "district/chennai"
+#   models/registry/department/water/      -> key "department/water"
+#
+#   ML_DATA_DIR=data/districts/chennai \
+#   ML_MODELS_DIR=models/registry/district/chennai python train_model.py
+#
+# Models load on first use. The most recently used ones stay resident within
+# ML_MODEL_REGISTRY_MB (artifact size on disk as the estimate); the least
+# recently used are evicted. A key without a model resolves to the global model.
+#
+#   model, key = registry.resolve("district/chennai")
+#   predict_complaint(text, model=model)
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+import metrics
+import serve_model
+
+REGISTRY_DIR = Path(os.environ.get("ML_MODEL_REGISTRY_DIR", serve_model.MODELS_DIR / "registry"))
+MEMORY_BUDGET_MB = float(os.environ.get("ML_MODEL_REGISTRY_MB", "512"))
+# "district/chennai", "department/public-works": lowercase path segments only
+KEY_PATTERN = re.compile(r"^[a-z0-9_-]+(/[a-z0-9_-]+)*$")
+
+ROUTED = metrics.Counter(
+    'ml_model_requests_total', 'Predictions by the model that served them (global on fallback).', ['model'],
+)
+
+
+def normalize_key(key):
+    """'District/Chennai ' -> 'district/chennai'; None if the key is not usable."""
+    if not key:
+        return None
+    key = re.sub(r"\s+", "-", key.strip().lower())
+    return key if KEY_PATTERN.match(key) else None
+
+
+class ModelRegistry:
+    """Specific models loaded on demand, LRU-evicted within a memory budget."""
+
+    def __init__(self, root, budget_mb):
+        self.root = Path(root)
+        self.budget_mb = budget_mb
+        self.models = OrderedDict()  # key -> ModelBundle, least recently used first
+        self.stats_by_key = {}
+        self.fallbacks = 0
+        # key -> Future of a load in progress; loads run outside `lock`
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def _entry(self, key):
+        return self.stats_by_key.setdefault(key, {"loads": 0, "evictions": 0, "hits": 0, "load_seconds": 0.0})
+
+    def available(self, key):
+        return (self.root / key / "category_model.joblib").exists()
+
+    def used_mb(self):
+        return sum(model.size_mb for model in self.models.values())
+
+    def is_resident(self, key):
+        return key in self.models
+
+    def _evict_for(self, size_mb):
+        while self.models and self.used_mb() + size_mb > self.budget_mb:
+            key, _ = self.models.popitem(last=False)
+            self._entry(key)["evictions"] += 1
+            print(f"🧹 Evicting model {key} to stay within {self.budget_mb:.0f} MB")
+
+    def resolve(self, key):
+        """Return (ModelBundle, served key) for a routing key; the global model if none fits."""
+        key = normalize_key(key)
+        if key is None:
+            ROUTED.inc(model="global")
+            return serve_model.GLOBAL_MODEL, "global"
+        with self.lock:
+            model = self.models.get(key)
+            if model is not None:
+                self.models.move_to_end(key)
+                self._entry(key)["hits"] += 1
+                metrics.record_cache("model_registry", hit=True)
+                ROUTED.inc(model=key)
+                return model, key
+            pending = self.loading.get(key)
+
+        if pending is None:
+            if not self.available(key):
+                with self.lock:
+                    self.fallbacks += 1
+                ROUTED.inc(model="global")
+                return serve_model.GLOBAL_MODEL, "global"
+            with self.lock:
+                pending = self.loading.get(key)
+                if pending is None:
+                    pending = self.loading[key] = Future()
+                    loader = True
+                else:
+                    loader = False
+            if loader:
+                metrics.record_cache("model_registry", hit=False)
+                return self._load(key, pending), key
+        # Another request is loading this key; other keys are not held up meanwhile
+        model = pending.result()
+        with self.lock:
+            self._entry(key)["hits"] += 1
+        metrics.record_cache("model_registry", hit=True)
+        ROUTED.inc(model=key)
+        return model, key
+
+    def _load(self, key, pending):
+        """Load `key` without holding the registry lock, then insert it (evicting as needed)."""
+        try:
+            start = time.perf_counter()
+            model = serve_model.ModelBundle(self.root / key, name=key)
+            elapsed = time.perf_counter() - start
+        except BaseException as e:
+            with self.lock:
+                del self.loading[key]
+            pending.set_exception(e)
+            raise
+        with self.lock:
+            self._evict_for(model.size_mb)
+            self.models[key] = model
+            del self.loading[key]
+            entry = self._entry(key)
+            entry["loads"] += 1
+            entry["load_seconds"] += elapsed
+            used = self.used_mb()
+        pending.set_result(model)
+        print(f"✅ Model {key} loaded ({model.version}, {model.size_mb:.1f} MB, {elapsed:.2f}s; "
+              f"{used:.1f}/{self.budget_mb:.0f} MB in use)")
+        ROUTED.inc(model=key)
+        return model
+
+    def vectorizer_id(self, key):
+        """Vectorizer id of the model for `key`, without loading it; None once its artifacts are removed."""
+        if key == "global":
+            return serve_model.GLOBAL_MODEL.vectorizer_id
+        if not self.available(key):
+            return None
+        with self.lock:
+            model = self.models.get(key)
+        return model.vectorizer_id if model is not None else serve_model.vectorizer_id(self.root / key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "root": str(self.root),
+                "budget_mb": self.budget_mb,
+                "used_mb": round(self.used_mb(), 1),
+                "resident": {key: {"version": m.version, "size_mb": round(m.size_mb, 1)}
+                             for key, m in self.models.items()},
+                "loading": sorted(self.loading),
+                "fallbacks": self.fallbacks,
+                "models": {key: dict(entry, load_seconds=round(entry["load_seconds"], 3))
+                           for key, entry in self.stats_by_key.items()},
+            }
+
+
+registry = ModelRegistry(REGISTRY_DIR, MEMORY_BUDGET_MB)
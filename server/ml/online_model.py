@@ -0,0 +1,236 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/online_model.py
+# Online learning from admin corrections
+# -----------------------------------------------------------------------------
+# A linear correction model in the base model's TF-IDF space. It adds a
+# learned term to the base model's category logits (and priority
+# log-probabilities):
+#
+#     p(category) = sigmoid(logit(p_base) + x . W[:, category])
+#
+# W starts at zero, so the served predictions equal the base model's until
+# corrections arrive. Each correction takes a few logistic-loss gradient steps
+# (partial_fit) with L2 decay toward zero. The correction flips that text and
+# moves similar texts (shared n-grams) the same way.
+#
+# Corrections are appended to a JSONL log. The model they update (the learner)
+# is copied to the served model every ML_ONLINE_PUBLISH_S seconds, as a new
+# model version "<base version>+fb<n>", and saved in the state directory
+# (ML_STATE_DIR).
+# On startup, corrections not yet in the saved model are replayed. After a
+# full retrain (a new base version) the whole log is replayed.
+#
+#   served model:  adjust_categories(vect, probs), adjust_priority(vect, probs)
+#   learning:      learner.partial_fit(...) via serve_model.learn_from_feedback
+
+import copy
+import datetime
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+ENABLED = os.environ.get("ML_ONLINE_LEARNING", "1") != "0"
+PUBLISH_INTERVAL_S = float(os.environ.get("ML_ONLINE_PUBLISH_S", "60"))
+LEARNING_RATE = float(os.environ.get("ML_ONLINE_LEARNING_RATE", "0.5"))
+# Gradient steps per correction
+EPOCHS = int(os.environ.get("ML_ONLINE_EPOCHS", "5"))
+# L2 decay toward the base model
+ALPHA = float(os.environ.get("ML_ONLINE_ALPHA", "1e-4"))
+EPS = 1e-6
+
+MODEL_FILE = "online_model.joblib"
+FEEDBACK_FILE = "feedback.jsonl"
+
+
+class CorrectionModel:
+    """Additive logit corrections for the category and priority heads."""
+
+    def __init__(self, n_features, categories, priority_classes):
+        self.categories = list(categories)
+        self.priority_classes = list(priority_classes or [])
+        self.W = np.zeros((n_features, len(self.categories)), dtype=np.float32)
+        self.Wp = np.zeros((n_features, len(self.priority_classes)), dtype=np.float32)
+        self.updates = 0
+
+    @property
+    def n_features(self):
+        return self.W.shape[0]
+
+    def category_proba(self, vect, base_probs):
+        logits = np.log(np.clip(base_probs, EPS, 1 - EPS)) - np.log(np.clip(1 - base_probs, EPS, 1 - EPS))
+        return 1.0 / (1.0 + np.exp(-(logits + vect @ self.W)))
+
+    def priority_proba(self, vect, base_probs):
+        z = np.log(np.clip(base_probs, EPS, 1.0)) + vect @ self.Wp
+        z = np.exp(z - z.max(axis=1, keepdims=True))
+        return z / z.sum(axis=1, keepdims=True)
+
+    def partial_fit(self, vect, base_probs, y_category, mask=None, base_prio=None, y_priority=None):
+        """
+        One incremental update from corrected rows.
+        y_category: (n, n_categories) 0/1 targets, trained only where `mask`
+        is 1. y_priority: class index per row, or -1 where the correction gave
+        no priority.
+        """
+        for _ in range(EPOCHS):
+            residual = self.category_proba(vect, base_probs) - y_category
+            if mask is not None:
+                residual *= mask
+            grad = vect.T @ residual
+            self.W *= 1 - LEARNING_RATE * ALPHA
+            self.W -= LEARNING_RATE * np.asarray(grad, dtype=np.float32)
+            if base_prio is not None and y_priority is not None and self.Wp.shape[1]:
+                rows = np.flatnonzero(y_priority >= 0)
+                if len(rows):
+                    target = np.zeros((len(rows), self.Wp.shape[1]))
+                    target[np.arange(len(rows)), y_priority[rows]] = 1
+                    grad = vect[rows].T @ (self.priority_proba(vect[rows], base_prio[rows]) - target)
+                    self.Wp *= 1 - LEARNING_RATE * ALPHA
+                    self.Wp -= LEARNING_RATE * np.asarray(grad, dtype=np.float32)
+        self.updates += vect.shape[0]
+
+
+# ========== Module State ==========
+_lock = threading.Lock()
+_publish_lock = threading.Lock()
+learner = None          # updated by every correction
+served = None           # snapshot used by predictions; replaced on publish
+base_version = None
+version = None          # served online version, None until the first publish
+feedback_applied = 0    # lines of the feedback log reflected in `learner`
+published_applied = 0
+last_published_at = None
+_out_dir = None
+_publisher = None
+
+
+def _feedback_path():
+    return Path(os.environ.get("ML_FEEDBACK_LOG", _out_dir / FEEDBACK_FILE))
+
+
+def init(out_dir, model_version, n_features, categories, priority_classes):
+    """Load the saved correction model for this base version, or start from zero."""
+    global learner, served, base_version, version, feedback_applied, published_applied, _out_dir
+    _out_dir = Path(out_dir)
+    base_version = model_version
+    learner = CorrectionModel(n_features, categories, priority_classes)
+    feedback_applied = 0
+    if not ENABLED:
+        return
+    try:
+        saved = joblib.load(_out_dir / MODEL_FILE)
+    except (OSError, ValueError, EOFError):
+        saved = None
+    if saved is not None:
+        model = saved["model"]
+        compatible = (saved.get("base_version") == model_version and model.n_features == n_features
+                      and model.categories == list(categories))
+        if compatible:
+            learner = model
+            feedback_applied = saved.get("feedback_applied", 0)
+            version = saved.get("version")
+            served = copy.deepcopy(model)
+            print(f"✅ Online corrections loaded ({version}, {feedback_applied} corrections)")
+        else:
+            print("🔄 Base model changed; replaying all corrections onto it")
+    published_applied = feedback_applied
+
+
+def unapplied_feedback():
+    """Corrections in the log that the learner has not seen yet."""
+    path = _feedback_path()
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    return [json.loads(line) for line in lines[feedback_applied:] if line.strip()]
+
+
+def log_feedback(items):
+    path = _feedback_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    received_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    with open(path, "a", encoding="utf-8") as f:
+        for item in items:
+            f.write(json.dumps(dict(item, received_at=received_at), ensure_ascii=False) + "\n")
+
+
+def apply(fit, items, log=True):
+    """
+    Log the corrections and run `fit(learner)` under one lock, so the log's
+    order always matches what the learner (and a saved snapshot) has seen.
+    """
+    global feedback_applied
+    with _lock:
+        if log:
+            log_feedback(items)
+        if ENABLED:
+            fit(learner)
+            feedback_applied += len(items)
+
+
+def publish():
+    """Serve a snapshot of the learner as a new model version; returns it (or None)."""
+    global served, version, published_applied, last_published_at
+    with _publish_lock:
+        with _lock:
+            if feedback_applied == published_applied:
+                return None
+            snapshot = copy.deepcopy(learner)
+            applied = feedback_applied
+        new_version = f"{base_version}+fb{applied}"
+        _out_dir.mkdir(parents=True, exist_ok=True)
+        joblib.dump({"model": snapshot, "base_version": base_version, "version": new_version,
+                     "feedback_applied": applied}, _out_dir / MODEL_FILE)
+        served, version, published_applied = snapshot, new_version, applied
+        last_published_at = time.time()
+    print(f"📦 Published online model {new_version}")
+    return new_version
+
+
+def _publish_loop():
+    while True:
+        time.sleep(PUBLISH_INTERVAL_S)
+        try:
+            publish()
+        except Exception as e:
+            print(f"⚠️ Online model publish failed: {e}")
+
+
+def start_publisher():
+    global _publisher
+    if ENABLED and _publisher is None:
+        _publisher = threading.Thread(target=_publish_loop, name="online-publisher", daemon=True)
+        _publisher.start()
+
+
+def current_version():
+    return version or base_version
+
+
+def adjust_categories(vect, probs):
+    model = served
+    return probs if model is None else model.category_proba(vect, probs)
+
+
+def adjust_priority(vect, probs):
+    model = served
+    return probs if model is None or not model.Wp.shape[1] else model.priority_proba(vect, probs)
+
+
+def stats():
+    return {
+        "enabled": ENABLED,
+        "base_version": base_version,
+        "version": current_version(),
+        "corrections_applied": feedback_applied,
+        "corrections_published": published_applied,
+        "publish_interval_s": PUBLISH_INTERVAL_S,
+        "last_published_at": (datetime.datetime.fromtimestamp(last_published_at, datetime.timezone.utc).isoformat()
+                              if last_published_at else None),
+    }
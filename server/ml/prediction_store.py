@@ -0,0 +1,280 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/prediction_store.py
+# Persistent prediction store for incremental re-scoring
+# -----------------------------------------------------------------------------
+# Bulk reclassification (/predict/stream, used by the admin /reclassify route)
+# records each complaint's last prediction in a local SQLite file, keyed by
+# complaint id and the model that served it ("global", "district/chennai", see
+# model_registry.py). A row also stores the hash of the text it was made from, the
+# model version that made it and the TF-IDF vector. On the next run each
+# complaint is:
+#
+#   fresh        same text and model version: the stored prediction is
+#                returned as is ("unchanged": true), nothing is computed
+#   reused       same text and vectorizer, new classifier (admin corrections
+#                published, a classifier-only retrain): the stored vector
+#                goes straight to the classifiers
+#   scored       new text, new complaint or new vectorizer: full pipeline
+#
+# Vectors are stored as float32 (indices + values), about 2-4 KB per complaint.
+# ML_PREDICTION_STORE sets the file (default predictions.sqlite3 in ML_STATE_DIR);
+# ML_PREDICTION_STORE=0 turns the store off.
+#
+# Retention: a row is overwritten when its complaint is re-scored and kept
+# until it is pruned (prune(), POST /predict/store/prune). The Node backend
+# prunes a complaint's rows when the complaint is deleted; rows left by an
+# earlier vectorizer, or by a registry model that was removed, can never be
+# reused and are dropped with stale=True.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+import metrics
+import model_registry
+import serve_model
+from metrics import stage_timer
+
+STORE_PATH = os.environ.get("ML_PREDICTION_STORE", "")
+ENABLED = STORE_PATH != "0"
+
+ROWS = metrics.Counter(
+    'ml_prediction_store_rows_total', 'Bulk rows by store outcome (fresh/reused/scored).', ['result'],
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id TEXT NOT NULL,
+    model_key TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    vectorizer_id TEXT NOT NULL,
+    prediction TEXT NOT NULL,
+    n_features INTEGER NOT NULL,
+    vec_indices BLOB NOT NULL,
+    vec_data BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (id, model_key)
+)
+"""
+# Stores written before rows were kept per model hold global-model rows only
+MIGRATE_UNKEYED = """
+ALTER TABLE predictions RENAME TO predictions_unkeyed;
+{schema};
+INSERT INTO predictions SELECT id, 'global', text_hash, model_version, vectorizer_id, prediction, n_features,
+    vec_indices, vec_data, updated_at FROM predictions_unkeyed;
+DROP TABLE predictions_unkeyed;
+""".format(schema=SCHEMA.strip())
+# SQLite's default limit on host parameters per statement is 999 on older builds
+LOOKUP_BATCH = 500
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class PredictionStore:
+    """Last prediction and TF-IDF vector per complaint id and model key, in one SQLite file."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(predictions)")]
+        if columns and "model_key" not in columns:
+            self.conn.executescript(MIGRATE_UNKEYED)
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+        # Kept up to date by save(), so stats() never scans the table
+        self.rows = self.conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def lookup(self, ids, model_key="global"):
+        """{id: row} for the stored ids among `ids`, as scored by `model_key`."""
+        rows = {}
+        ids = list(ids)
+        with self.lock:
+            for start in range(0, len(ids), LOOKUP_BATCH):
+                part = ids[start:start + LOOKUP_BATCH]
+                cursor = self.conn.execute(
+                    "SELECT id, text_hash, model_version, vectorizer_id, prediction, n_features, vec_indices, "
+                    f"vec_data FROM predictions WHERE model_key = ? AND id IN ({','.join('?' * len(part))})",
+                    [model_key] + part,
+                )
+                for row in cursor:
+                    rows[row[0]] = {
+                        "text_hash": row[1], "model_version": row[2], "vectorizer_id": row[3],
+                        "prediction": row[4], "n_features": row[5], "vec_indices": row[6], "vec_data": row[7],
+                    }
+        return rows
+
+    def save(self, entries, new_rows=0, model_key="global"):
+        """
+        Upsert (id, text_hash, model_version, vectorizer_id, prediction dict,
+        1-row CSR vector) tuples scored by `model_key`, `new_rows` of which
+        were not stored yet.
+        """
+        now = time.time()
+        params = []
+        for id_, hash_, version, vectorizer_id, prediction, vect in entries:
+            params.append((
+                id_, model_key, hash_, version, vectorizer_id, json.dumps(prediction), vect.shape[1],
+                vect.indices.astype(np.int32).tobytes(), vect.data.astype(np.float32).tobytes(), now,
+            ))
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", params)
+            self.conn.commit()
+            self.rows += new_rows
+
+    def model_keys(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT DISTINCT model_key FROM predictions")]
+
+    def prune(self, ids=(), model_versions=(), keep_vectorizers=None):
+        """
+        Delete the rows of `ids` (for every model), the rows made by any of
+        `model_versions` and, given `keep_vectorizers` ({model_key: vectorizer
+        id or None}), each listed key's rows made with another vectorizer (all
+        of them for None). Returns the number of rows deleted.
+        """
+        ids, model_versions = list(ids), list(model_versions)
+        with self.lock:
+            before = self.conn.total_changes
+            for column, values in (("id", ids), ("model_version", model_versions)):
+                for start in range(0, len(values), LOOKUP_BATCH):
+                    part = values[start:start + LOOKUP_BATCH]
+                    self.conn.execute(f"DELETE FROM predictions WHERE {column} IN ({','.join('?' * len(part))})", part)
+            for model_key, keep in (keep_vectorizers or {}).items():
+                self.conn.execute("DELETE FROM predictions WHERE model_key = ? AND vectorizer_id IS NOT ?",
+                                  (model_key, keep))
+            self.conn.commit()
+            deleted = self.conn.total_changes - before
+            self.rows -= deleted
+        return deleted
+
+
+def stack_vectors(rows):
+    """CSR matrix from stored rows (all with the same n_features)."""
+    indptr = [0]
+    indices, data = [], []
+    for row in rows:
+        idx = np.frombuffer(row["vec_indices"], dtype=np.int32)
+        indices.append(idx)
+        data.append(np.frombuffer(row["vec_data"], dtype=np.float32))
+        indptr.append(indptr[-1] + len(idx))
+    return sp.csr_matrix(
+        (np.concatenate(data).astype(np.float64) if data else np.zeros(0),
+         np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+         np.array(indptr)),
+        shape=(len(rows), rows[0]["n_features"] if rows else 0),
+    )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store_path():
+    return STORE_PATH or str(serve_model.STATE_DIR / "predictions.sqlite3")
+
+
+def get_store():
+    """The process-wide store (opened on first use), or None when disabled."""
+    global _store
+    if not ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = PredictionStore(store_path())
+            print(f"🗃️ Prediction store at {_store.path}")
+        return _store
+
+
+def rescore(ids, texts, model=None, model_key="global"):
+    """
+    Predictions of `model` (a ModelBundle served for `model_key`, default the
+    global model) for complaints (ids[i], texts[i]), computing only what the
+    store does not already hold for that model, and recording the new ones.
+    Returns (results, unchanged): predict_complaint dicts, and whether each
+    one was returned from the store as is. Rows without an id are scored
+    and not stored.
+    """
+    model = model or serve_model.GLOBAL_MODEL
+    store = get_store()
+    if store is None:
+        return serve_model.predict_complaints(texts, model=model), [False] * len(texts)
+
+    version = serve_model.scoring_version(model)
+    ids = [str(id_) if id_ is not None else None for id_ in ids]
+    hashes = [text_hash(t) for t in texts]
+    stored = store.lookup({id_ for id_ in ids if id_ is not None}, model_key)
+    results = [None] * len(texts)
+    unchanged = [False] * len(texts)
+    reuse, score = [], []
+    for i, (id_, hash_) in enumerate(zip(ids, hashes)):
+        row = stored.get(id_)
+        if row is None or row["text_hash"] != hash_ or row["vectorizer_id"] != model.vectorizer_id:
+            score.append(i)
+        elif row["model_version"] == version:
+            results[i] = json.loads(row["prediction"])
+            unchanged[i] = True
+        else:
+            reuse.append(i)
+
+    todo = reuse + score
+    if todo:
+        parts = []
+        if reuse:
+            parts.append(stack_vectors([stored[ids[i]] for i in reuse]))
+        if score:
+            with stage_timer('tfidf_transform'):
+                parts.append(model.tfidf.transform([serve_model.clean_text_no_stopwords(texts[i]) for i in score]))
+        vect = sp.vstack(parts, format="csr")
+        for i, result in zip(todo, serve_model.predict_complaints([texts[i] for i in todo], model=model, vect=vect)):
+            results[i] = result
+        store.save([(ids[i], hashes[i], version, model.vectorizer_id, results[i], vect[k])
+                    for k, i in enumerate(todo) if ids[i] is not None],
+                   new_rows=len({ids[i] for i in score if ids[i] is not None and ids[i] not in stored}),
+                   model_key=model_key)
+
+    ROWS.inc(len(texts) - len(todo), result="fresh")
+    ROWS.inc(len(reuse), result="reused")
+    ROWS.inc(len(score), result="scored")
+    return results, unchanged
+
+
+def prune(ids=(), model_versions=(), stale=False):
+    """
+    Drop stored predictions by complaint id or model version; stale=True also
+    drops rows whose model now has another vectorizer, or no longer exists.
+    Returns the number of rows deleted (0 when the store is disabled).
+    """
+    store = get_store()
+    if store is None:
+        return 0
+    keep = {key: model_registry.registry.vectorizer_id(key) for key in store.model_keys()} if stale else None
+    deleted = store.prune([str(id_) for id_ in ids], model_versions, keep)
+    print(f"🗃️ Pruned {deleted} stored prediction(s), {store.rows} left")
+    return deleted
+
+
+def stats():
+    """Store size and row outcomes, from memory: never opens the store or takes its lock."""
+    if not ENABLED:
+        return {"enabled": False}
+    store = _store
+    return {
+        "enabled": True,
+        "path": store.path if store is not None else store_path(),
+        # None until the first bulk stream opens the store
+        "rows": store.rows if store is not None else None,
+        **{result: int(ROWS.get(result=result)) for result in ("fresh", "reused", "scored")},
+    }
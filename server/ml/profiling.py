@@ -0,0 +1,169 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/profiling.py
+# On-demand per-request profiling for the ML service
+# -----------------------------------------------------------------------------
+# Disabled unless ML_PROFILING_ENABLED=1. When enabled, a request is profiled
+# with cProfile if it carries `X-Profile: 1` or falls inside the sampling rate
+# (ML_PROFILE_SAMPLE_RATE, 0..1). Each profile is stored as a .pstats file in
+# ML_PROFILE_DIR, keeping at most ML_PROFILE_MAX_FILES (oldest are deleted).
+#
+# cProfile only sees the thread it is enabled in, and the event loop thread
+# interleaves every request. So the profile covers the request's blocking work
+# instead: each call the request makes through `run_in_threadpool` below runs
+# under its own profiler in the worker thread, and the calls are merged into
+# one .pstats file. Work done in another process (media workers) cannot be
+# captured; app.py refuses to profile those endpoints.
+#
+# Open a downloaded profile with `python -m pstats <file>` or snakeviz.
+
+import contextvars
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import anyio.to_thread
+from starlette.concurrency import run_in_threadpool as _run_in_threadpool
+
+ENABLED = os.environ.get('ML_PROFILING_ENABLED', '0').lower() in ('1', 'true', 'yes')
+SAMPLE_RATE = float(os.environ.get('ML_PROFILE_SAMPLE_RATE', '0') or 0)
+PROFILE_DIR = Path(os.environ.get('ML_PROFILE_DIR', Path(tempfile.gettempdir()) / 'grievassist_profiles'))
+MAX_FILES = int(os.environ.get('ML_PROFILE_MAX_FILES', '50') or 50)
+HEADER = 'x-profile'
+
+_NAME_RE = re.compile(r'^[0-9]+-[a-z0-9_-]+-[0-9a-f]{6}\.pstats$')
+
+# Only one request is profiled at a time, so a profile never mixes requests
+# (and Python 3.12+ allows a single active cProfile per interpreter)
+_busy = threading.Lock()
+_session = contextvars.ContextVar('profile_session', default=None)
+
+
+def requested(headers):
+    return headers.get(HEADER, '').lower() in ('1', 'true', 'yes')
+
+
+def should_profile(headers):
+    """Decide whether this request gets profiled. Cheap when disabled."""
+    if not ENABLED:
+        return False
+    if requested(headers):
+        return True
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+class Session:
+    """The profilers of one request's thread-pool calls."""
+
+    def __init__(self, endpoint):
+        slug = re.sub(r'[^a-z0-9]+', '_', endpoint.lower()).strip('_') or 'root'
+        self.name = f'{int(time.time() * 1000)}-{slug}-{os.urandom(3).hex()}.pstats'
+        self.profilers = []
+        self.lock = threading.Lock()
+        self.token = None
+
+    def run(self, fn, *args, **kwargs):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active in this interpreter (3.12+); run unprofiled
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with self.lock:
+                self.profilers.append(profiler)
+
+
+def start(endpoint):
+    """Open a profiling session for the current request, or None if another is open."""
+    if not _busy.acquire(blocking=False):
+        return None
+    session = Session(endpoint)
+    session.token = _session.set(session)
+    return session
+
+
+def stop(session):
+    """
+    Close the session and store its merged profile. Returns the stored name,
+    or None when the request did no work in the thread pool.
+    """
+    try:
+        _session.reset(session.token)
+    except ValueError:
+        # Closed from another context (end of a streamed body)
+        pass
+    finally:
+        _busy.release()
+    with session.lock:
+        profilers = list(session.profilers)
+    if not profilers:
+        return None
+    stats = pstats.Stats(profilers[0])
+    for profiler in profilers[1:]:
+        stats.add(profiler)
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stats.dump_stats(str(PROFILE_DIR / session.name))
+    _prune()
+    return session.name
+
+
+async def run_in_threadpool(fn, *args, **kwargs):
+    """starlette's run_in_threadpool, profiled when the calling request is."""
+    session = _session.get()
+    if session is None:
+        return await _run_in_threadpool(fn, *args, **kwargs)
+    return await _run_in_threadpool(session.run, fn, *args, **kwargs)
+
+
+async def run_limited(limiter, fn, *args, **kwargs):
+    """run_in_threadpool on threads borrowed from `limiter` instead of the default pool."""
+    session = _session.get()
+    if session is not None:
+        fn, args = session.run, (fn,) + args
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=limiter)
+
+
+def _prune():
+    files = sorted(PROFILE_DIR.glob('*.pstats'), key=lambda p: p.stat().st_mtime)
+    for old in files[:max(0, len(files) - MAX_FILES)]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+
+
+def list_profiles():
+    if not PROFILE_DIR.exists():
+        return []
+    out = []
+    for path in sorted(PROFILE_DIR.glob('*.pstats'), key=lambda p: p.stat().st_mtime, reverse=True):
+        stat = path.stat()
+        out.append({'name': path.name, 'size_bytes': stat.st_size, 'created_at': stat.st_mtime})
+    return out
+
+
+def profile_path(name):
+    """Resolve a stored profile by name, or None if it is unknown/invalid."""
+    if not _NAME_RE.match(name):
+        return None
+    path = PROFILE_DIR / name
+    return path if path.exists() else None
+
+
+def render_text(path, limit=40, sort='cumulative'):
+    """Human-readable top-N table for a stored profile."""
+    buf = io.StringIO()
+    stats = pstats.Stats(str(path), stream=buf)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return buf.getvalue()
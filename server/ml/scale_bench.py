@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -----------------------------------------------------------------------------
+# FILE: server/ml/scale_bench.py
+# Training and inference cost against corpus size
+# -----------------------------------------------------------------------------
+# For each corpus size, generates a synthetic corpus (synth_corpus.py) and
+# trains the full train_model.py stack on it in a fresh process. It records:
+#   - training time per stage (load/clean/augment, TF-IDF, category,
+#     priority, IsolationForest)
+#   - peak RSS of the training process
+#   - artifact size, and inference throughput on unseen synthetic complaints
+# Results go to a JSON report and, with matplotlib installed, to a plot of
+# all three against corpus size:
+#
+#   python scale_bench.py --sizes 10000,30000,100000 --report scale.json --plot scale.png
+#   python scale_bench.py --sizes 1000000 --no-priority --work-dir /data/corpora
+#
+# The priority model (GradientBoosting) dominates training time at large sizes;
+# --no-priority skips it.
+
+import argparse
+import datetime
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_SIZES = '10000,30000,100000'
+INFERENCE_ROWS = 2000
+INFERENCE_BATCH = 256
+
+
+def parse_sizes(value):
+    return [int(float(part)) for part in value.split(',') if part.strip()]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ---------------------------------------------------------------------------
+# One size (runs in its own process, with ML_DATA_DIR set to the corpus)
+# ---------------------------------------------------------------------------
+def run_one(result_path, with_priority):
+    import numpy as np
+    from sklearn.preprocessing import LabelEncoder
+
+    import slim_model
+    import synth_corpus
+    import train_model
+
+    result = {'baseline_rss_mb': round(peak_rss_mb(), 1), 'stages': {}}
+    stages = result['stages']
+
+    def timed(stage, fn, *args):
+        start = time.perf_counter()
+        value = fn(*args)
+        stages[stage] = round(time.perf_counter() - start, 2)
+        return value
+
+    df, category_cols = timed('prepare', train_model.prepare_training_data)
+    result['n_rows_trained'] = int(len(df))
+    tfidf = train_model.build_tfidf()
+    X_vect = timed('tfidf', tfidf.fit_transform, df['description_features'].values)
+    result['n_features'] = int(X_vect.shape[1])
+    artifacts = {'tfidf': tfidf, 'prio_clf': None}
+    artifacts['cat_clf'] = timed('category', train_model.train_category_model,
+                                 X_vect, df[category_cols].astype(int).values)
+    priority_le = None
+    if with_priority and 'priority' in df.columns:
+        priority_le = LabelEncoder()
+        y_priority = priority_le.fit_transform(train_model.normalize_priority(df['priority']))
+        artifacts['prio_clf'] = timed('priority', train_model.train_priority_model, X_vect, y_priority)
+    artifacts['iso'] = timed('isoforest', train_model.train_isoforest, X_vect)
+    result['train_seconds'] = round(sum(stages.values()), 2)
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    del df, X_vect
+
+    # Unseen complaints (another seed), cleaned and scored like serve_model.predict_arrays
+    texts = list(synth_corpus.CorpusGenerator(seed=7).chunk(INFERENCE_ROWS)['description'])
+    start = time.perf_counter()
+    for i in range(0, len(texts), INFERENCE_BATCH):
+        batch = [train_model.clean_text_no_stopwords(t) for t in texts[i:i + INFERENCE_BATCH]]
+        slim_model.predict_once(artifacts, batch)
+    elapsed = time.perf_counter() - start
+    result['inference_rows_per_s'] = round(len(texts) / elapsed, 1)
+    single = [train_model.clean_text_no_stopwords(texts[0])]
+    samples = []
+    for _ in range(20):
+        start = time.perf_counter()
+        slim_model.predict_once(artifacts, single)
+        samples.append((time.perf_counter() - start) * 1000)
+    result['single_median_ms'] = round(float(np.median(samples)), 2)
+    result['memory'] = slim_model.measure_memory(artifacts, category_cols, priority_le)
+
+    with open(result_path, 'w') as f:
+        json.dump(result, f)
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+def bench_size(n_rows, work_dir, args):
+    import synth_corpus
+
+    corpus_dir = work_dir / f'synthetic_{n_rows}'
+    corpus = corpus_dir / 'complaints_dataset.csv'
+    row = {'rows': n_rows}
+    if corpus.exists():
+        print(f"♻️  Reusing {corpus}")
+    else:
+        print(f"🧪 Generating {n_rows:,d} rows...")
+        start = time.perf_counter()
+        synth_corpus.write_corpus(corpus, n_rows, seed=args.seed, quiet=True)
+        row['generate_seconds'] = round(time.perf_counter() - start, 2)
+
+    print(f"🏋️ Training on {n_rows:,d} rows...")
+    result_path = corpus_dir / 'result.json'
+    env = dict(os.environ, ML_DATA_DIR=str(corpus_dir))
+    cmd = [sys.executable, str(Path(__file__).resolve()), '--run-one', str(result_path)]
+    if args.no_priority:
+        cmd.append('--no-priority')
+    proc = subprocess.run(cmd, cwd=str(BASE_DIR), env=env,
+                          stdout=None if args.verbose else subprocess.DEVNULL)
+    if proc.returncode != 0:
+        print(f"❌ Training on {n_rows:,d} rows failed (exit code {proc.returncode})")
+        row['error'] = f'exit code {proc.returncode}'
+        return row
+    with open(result_path) as f:
+        row.update(json.load(f))
+    print(f"   {row['train_seconds']:.1f}s, peak {row['peak_rss_mb']:.0f} MB, "
+          f"{row['inference_rows_per_s']:,.0f} rows/s inference")
+    return row
+
+
+def print_report(rows):
+    print("\n" + "=" * 100)
+    print(f"{'rows':>10s} {'trained':>10s} {'features':>9s} {'prepare s':>10s} {'fit s':>8s} "
+          f"{'total s':>8s} {'peak MB':>8s} {'model MB':>9s} {'rows/s':>9s} {'p50 ms':>7s}")
+    print("-" * 100)
+    for r in rows:
+        if 'error' in r:
+            print(f"{r['rows']:>10,d}  failed: {r['error']}")
+            continue
+        fit = r['train_seconds'] - r['stages']['prepare']
+        print(f"{r['rows']:>10,d} {r['n_rows_trained']:>10,d} {r['n_features']:>9,d} "
+              f"{r['stages']['prepare']:>10.1f} {fit:>8.1f} {r['train_seconds']:>8.1f} "
+              f"{r['peak_rss_mb']:>8.0f} {r['memory']['artifact_bytes'] / 1e6:>9.1f} "
+              f"{r['inference_rows_per_s']:>9,.0f} {r['single_median_ms']:>7.2f}")
+    print("=" * 100)
+
+
+def plot(rows, path):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("⚠️ matplotlib not installed; skipping the plot (pip install matplotlib)")
+        return
+    rows = [r for r in rows if 'error' not in r]
+    sizes = [r['rows'] for r in rows]
+    fig, axes = plt.subplots(1, 3, figsize=(16, 4.5))
+
+    for stage in rows[0]['stages'] if rows else []:
+        axes[0].plot(sizes, [r['stages'].get(stage, 0) for r in rows], marker='o', label=stage)
+    axes[0].plot(sizes, [r['train_seconds'] for r in rows], marker='o', color='black', label='total')
+    axes[0].set_ylabel('training time (s)')
+    axes[0].legend(fontsize=8)
+
+    axes[1].plot(sizes, [r['peak_rss_mb'] for r in rows], marker='o', label='training peak RSS')
+    axes[1].plot(sizes, [r['memory']['artifact_bytes'] / 1e6 for r in rows], marker='o', label='artifacts on disk')
+    axes[1].set_ylabel('memory (MB)')
+    axes[1].legend(fontsize=8)
+
+    axes[2].plot(sizes, [r['inference_rows_per_s'] for r in rows], marker='o')
+    axes[2].set_ylabel(f'inference (rows/s, batches of {INFERENCE_BATCH})')
+
+    for ax in axes:
+        ax.set_xscale('log')
+        ax.set_xlabel('corpus rows')
+        ax.grid(True, which='both', alpha=0.3)
+    fig.suptitle('GrievAssist training and inference vs corpus size')
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    print(f"📈 Plot saved to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Training and inference cost against corpus size')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'corpus sizes (default {DEFAULT_SIZES})')
+    parser.add_argument('--report', default='scale_report.json', help='JSON report path')
+    parser.add_argument('--plot', default='scale_report.png', help='plot path (needs matplotlib)')
+    parser.add_argument('--work-dir', help='keep generated corpora here and reuse them (default: temp dir)')
+    parser.add_argument('--seed', type=int, default=42, help='corpus seed')
+    parser.add_argument('--no-priority', action='store_true', help='skip the priority model')
+    parser.add_argument('--verbose', action='store_true', help='show the training output')
+    parser.add_argument('--run-one', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(args.run_one, with_priority=not args.no_priority)
+        return
+
+    from bench_ml_service import environment_info
+
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix='grievassist_scale_'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        rows = [bench_size(n, work_dir, args) for n in sorted(parse_sizes(args.sizes))]
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(rows)
+    report = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'environment': environment_info(),
+        'config': {'sizes': [r['rows'] for r in rows], 'seed': args.seed,
+                   'priority_model': not args.no_priority, 'inference_rows': INFERENCE_ROWS},
+        'results': rows,
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report saved to {args.report}")
+    if args.plot:
+        plot(rows, args.plot)
+
+
+if __name__ == '__main__':
+    main()
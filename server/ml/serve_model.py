@@ -6,28 +6,108 @@
 #   dominant_category, category_probs, secondary_categories,
 #   priority, isFakeScore, top_k, confidence
 
+import hashlib
+import json
 import joblib
 import numpy as np
 from pathlib import Path
+import os
 import re
 
+import metrics
+import online_model
+from metrics import stage_timer
+
 BASE_DIR = Path(__file__).resolve().parent
-MODELS_DIR = BASE_DIR / 'models'
+# ML_MODELS_DIR lets benchmarks and tools point at an alternate artifact set
+MODELS_DIR = Path(os.environ.get('ML_MODELS_DIR', BASE_DIR / 'models'))
+# Files the service writes while running (prediction store, video index,
+# online model, feedback log) live in ML_STATE_DIR, never among the artifacts
+STATE_DIR = Path(os.environ.get('ML_STATE_DIR', BASE_DIR / 'state'))
+
+# ML_MMAP_MODE=r memory-maps the numpy arrays inside the artifacts so that
+# several worker processes share one copy of the model weights
+MMAP_MODE = os.environ.get('ML_MMAP_MODE') or None
+
+# Cheap first stage (cascade_model.joblib, written by cascade_model.py):
+# confident texts skip the full model stack. ML_CASCADE=0 always runs the full stack.
+CASCADE_ENABLED = os.environ.get('ML_CASCADE', '1') != '0'
+CASCADE_ROWS = metrics.Counter(
+    'ml_cascade_rows_total', 'Predicted rows by the cascade stage that answered them (first/full).', ['stage'],
+)
+
+ARTIFACT_FILES = (
+    'tfidf_vectorizer.joblib', 'category_model.joblib', 'category_columns.joblib', 'isoforest.joblib',
+    'priority_model.joblib', 'priority_encoder.joblib', 'metadata.json', 'cascade_model.joblib',
+)
+
+
+def _load(name, models_dir=MODELS_DIR):
+    return joblib.load(Path(models_dir) / name, mmap_mode=MMAP_MODE)
+
+
+def vectorizer_id(models_dir):
+    """Hash of an artifact set's vectorizer file, so stored vectors are reused only with the same one."""
+    with open(Path(models_dir) / 'tfidf_vectorizer.joblib', 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:16]
+
+
+class ModelBundle:
+    """One artifact set as written by train_model.py (vectorizer, category,
+    priority and anomaly models), loaded from `models_dir`."""
+
+    def __init__(self, models_dir, name='global'):
+        models_dir = Path(models_dir)
+        self.name = name
+        self.tfidf = _load('tfidf_vectorizer.joblib', models_dir)
+        self.vectorizer_id = vectorizer_id(models_dir)
+        self.cat_clf = _load('category_model.joblib', models_dir)
+        self.category_cols = _load('category_columns.joblib', models_dir)
+        self.iso = _load('isoforest.joblib', models_dir)
+        try:
+            self.prio_clf = _load('priority_model.joblib', models_dir)
+            self.prio_encoder = _load('priority_encoder.joblib', models_dir)
+        except Exception:
+            self.prio_clf = None
+            self.prio_encoder = None
+
+        try:
+            with open(models_dir / 'metadata.json') as f:
+                self.metadata = json.load(f)
+        except (OSError, ValueError):
+            self.metadata = {}
+        # Artifacts trained before versioning only carry created_at
+        self.version = self.metadata.get('model_version') or self.metadata.get('created_at') or 'unknown'
+        self.cascade = None
+        if (models_dir / 'cascade_model.joblib').exists():
+            cascade = _load('cascade_model.joblib', models_dir)
+            # A first stage calibrated against an earlier training run would gate wrongly
+            if cascade.get('model_version') == self.version:
+                self.cascade = cascade
+            else:
+                print(f"⚠️ Ignoring cascade_model.joblib in {models_dir}: calibrated for "
+                      f"{cascade.get('model_version')}, not {self.version} (rerun cascade_model.py)")
+        # On-disk size of the artifacts, used as the memory estimate
+        self.size_mb = sum(
+            (models_dir / name).stat().st_size for name in ARTIFACT_FILES if (models_dir / name).exists()
+        ) / 1e6
+
 
 # Load artifacts
 print("Loading ML model artifacts...")
-tfidf = joblib.load(MODELS_DIR / 'tfidf_vectorizer.joblib')
-cat_clf = joblib.load(MODELS_DIR / 'category_model.joblib')
-category_cols = joblib.load(MODELS_DIR / 'category_columns.joblib')
-iso = joblib.load(MODELS_DIR / 'isoforest.joblib')
-try:
-    prio_clf = joblib.load(MODELS_DIR / 'priority_model.joblib')
-    prio_encoder = joblib.load(MODELS_DIR / 'priority_encoder.joblib')
-except Exception:
-    prio_clf = None
-    prio_encoder = None
-
-print(f"✅ Models loaded. Categories: {category_cols}")
+GLOBAL_MODEL = ModelBundle(MODELS_DIR)
+# The global model's parts, as used throughout the service and tools
+tfidf = GLOBAL_MODEL.tfidf
+cat_clf = GLOBAL_MODEL.cat_clf
+category_cols = GLOBAL_MODEL.category_cols
+iso = GLOBAL_MODEL.iso
+prio_clf = GLOBAL_MODEL.prio_clf
+prio_encoder = GLOBAL_MODEL.prio_encoder
+metadata = GLOBAL_MODEL.metadata
+MODEL_VERSION = GLOBAL_MODEL.version
+
+print(f"✅ Models loaded ({MODEL_VERSION}). Categories: {category_cols}"
+      + (" (cascade first stage loaded)" if GLOBAL_MODEL.cascade else ""))
 
 # ---------------------------------------------------------------------------
 # Text preprocessing (must match training pipeline exactly)
@@ -94,54 +174,68 @@ def _adjust_priority_score(text_lower: str, predicted_priority: str, prob: float
 
 
 # ---------------------------------------------------------------------------
-# Main prediction function
+# Vectorized model stages (operate on a whole batch of rows)
 # ---------------------------------------------------------------------------
-def predict_complaint(text: str, secondary_threshold: float = 0.30):
-    """Predict categories and priority for a complaint text.
-
-    Returns a dict with:
-      - dominant_category (str)
-      - category_probs (dict)
-      - secondary_categories (list)
-      - priority (str)
-      - isFakeScore (float)    # 0 => likely genuine, 1 => likely fake/anomalous
-      - top_k (list of {label, score})
-      - confidence (float)     # probability of dominant category
-    """
-    # Preprocess to match training pipeline
-    clean = clean_text_no_stopwords(text)
-    vect = tfidf.transform([clean])
-
-    # ---- Category probabilities ----
-    label_probs = {}
+def _category_proba_matrix(vect, model=GLOBAL_MODEL):
+    """Return an (n_rows, n_categories) array of category probabilities."""
+    cat_clf = model.cat_clf
     try:
-        probs = cat_clf.predict_proba(vect)
+        with stage_timer('category_proba'):
+            probs = cat_clf.predict_proba(vect)
         # Handle different return shapes from OneVsRest
         if isinstance(probs, np.ndarray):
-            arr = probs[0]
-            for i, col in enumerate(category_cols):
-                label_probs[col] = float(arr[i])
-        else:
-            # List of arrays per estimator
-            arr = np.array([p[0][1] if p.shape[-1] == 2 else p[0] for p in probs]).ravel()
-            for i, col in enumerate(category_cols):
-                label_probs[col] = float(arr[i])
+            return probs
+        # List of arrays per estimator
+        return np.column_stack([p[:, 1] if p.shape[-1] == 2 else p.ravel() for p in probs])
     except Exception:
         try:
             # Fallback to decision_function
-            df_vals = cat_clf.decision_function(vect)
-            if isinstance(df_vals, np.ndarray):
-                arr = df_vals[0] if df_vals.ndim > 1 else df_vals
-            else:
-                arr = np.array(df_vals).ravel()
+            df_vals = np.asarray(cat_clf.decision_function(vect))
+            if df_vals.ndim == 1:
+                df_vals = df_vals.reshape(vect.shape[0], -1)
             # Sigmoid to convert to probabilities
-            probs_arr = 1 / (1 + np.exp(-arr))
-            for i, col in enumerate(category_cols):
-                label_probs[col] = float(probs_arr[i])
+            return 1 / (1 + np.exp(-df_vals))
         except Exception:
-            preds = cat_clf.predict(vect)[0]
-            for i, col in enumerate(category_cols):
-                label_probs[col] = float(preds[i])
+            return np.asarray(cat_clf.predict(vect), dtype=float)
+
+
+def _priority_labels(vect, texts_lower, model=GLOBAL_MODEL):
+    """Return the priority label for each row, after keyword adjustment."""
+    prio_clf, prio_encoder = model.prio_clf, model.prio_encoder
+    if prio_clf is None:
+        return [None] * vect.shape[0]
+    with stage_timer('priority_proba'):
+        prio_prob = prio_clf.predict_proba(vect)
+        if model is GLOBAL_MODEL:
+            prio_prob = online_model.adjust_priority(vect, prio_prob)
+        prio_idx = np.argmax(prio_prob, axis=1)
+        if prio_encoder:
+            labels = [str(l) for l in prio_encoder.inverse_transform(prio_idx)]
+        else:
+            labels = [str(int(i)) for i in prio_idx]
+        max_probs = prio_prob[np.arange(len(prio_idx)), prio_idx]
+    # Apply keyword-based adjustment
+    with stage_timer('keyword_adjust'):
+        labels = [
+            _adjust_priority_score(t, label, float(p))
+            for t, label, p in zip(texts_lower, labels, max_probs)
+        ]
+    return labels
+
+
+def _fake_scores(vect, model=GLOBAL_MODEL):
+    """Map IsolationForest scores to 0..1 where 1 = likely fake."""
+    try:
+        with stage_timer('isolation_forest'):
+            df_scores = model.iso.decision_function(vect.toarray())
+        # decision_function: higher means more normal, lower means more anomalous
+        return np.clip(0.5 - df_scores, 0.0, 1.0)
+    except Exception:
+        return np.zeros(vect.shape[0])
+
+
+def _build_result(probs_row, priority, is_fake, secondary_threshold, categories=category_cols):
+    label_probs = {col: float(probs_row[i]) for i, col in enumerate(categories)}
 
     # ---- Determine dominant and secondary categories ----
     sorted_labels = sorted(label_probs.items(), key=lambda x: x[1], reverse=True)
@@ -158,37 +252,425 @@ def predict_complaint(text: str, secondary_threshold: float = 0.30):
     # Top_k
     top_k = [{"label": label, "score": round(score, 4)} for label, score in sorted_labels[:5]]
 
-    # ---- Priority prediction ----
-    text_lower = clean_text(text)
-    if prio_clf is not None:
-        prio_prob = prio_clf.predict_proba(vect)[0]
-        prio_idx = int(np.argmax(prio_prob))
-        priority = str(prio_encoder.inverse_transform([prio_idx])[0]) if prio_encoder else str(prio_idx)
-        max_prio_prob = float(prio_prob[prio_idx])
-        # Apply keyword-based adjustment
-        priority = _adjust_priority_score(text_lower, priority, max_prio_prob)
-    else:
-        priority = None
-
-    # ---- Anomaly / Fake score ----
-    try:
-        df_score = iso.decision_function(vect.toarray())[0]
-        # decision_function: higher means more normal, lower means more anomalous
-        # Map to 0..1 where 1 = likely fake
-        isFake = float(max(0.0, min(1.0, (0.5 - df_score))))
-    except Exception:
-        isFake = 0.0
-
-    result = {
+    return {
         'dominant_category': dominant_category,
         'category_probs': label_probs,
         'secondary_categories': secondary,
         'priority': priority,
-        'isFakeScore': round(isFake, 4),
+        'isFakeScore': round(float(is_fake), 4),
         'top_k': top_k,
         'confidence': round(float(dominant_score), 4),
     }
-    return result
+
+
+def _full_stack(vect, texts_lower, model):
+    """Category, priority and anomaly models on already vectorized rows."""
+    probs = _category_proba_matrix(vect, model)
+    if model is GLOBAL_MODEL:
+        # Admin corrections are learned in the global model's feature space
+        probs = online_model.adjust_categories(vect, probs)
+    priorities = _priority_labels(vect, texts_lower, model)
+    fake = _fake_scores(vect, model)
+    return {'category_probs': probs, 'priority': priorities, 'isFakeScore': fake}
+
+
+def first_stage_proba(clean, cascade):
+    """Category and priority probabilities from the cascade's small linear model."""
+    with stage_timer('cascade_first_stage'):
+        x = cascade['tfidf'].transform(clean)
+        probs = 1 / (1 + np.exp(-(x @ cascade['category_coef'] + cascade['category_intercept'])))
+        prio_probs = None
+        if cascade.get('priority_coef') is not None:
+            z = x @ cascade['priority_coef'] + cascade['priority_intercept']
+            z = np.exp(z - z.max(axis=1, keepdims=True))
+            prio_probs = z / z.sum(axis=1, keepdims=True)
+    return np.asarray(probs, dtype=float), prio_probs
+
+
+def cascade_confident(probs, prio_probs, cascade):
+    """
+    Rows the first stage may answer: every category probability is at least
+    the threshold away from undecided (p >= t or p <= 1 - t), so the dominant
+    and secondary categories are both settled, and the top priority
+    probability is at least the priority threshold.
+    """
+    confident = np.maximum(probs, 1 - probs).min(axis=1) >= cascade['threshold']
+    if prio_probs is not None:
+        confident &= prio_probs.max(axis=1) >= cascade['priority_threshold']
+    return confident
+
+
+def _predict_cascade(clean, texts_lower, model, vect=None):
+    """
+    Answer rows the first stage is confident about (see cascade_confident) and
+    send the rest through the full stack. Confident rows report the first
+    stage's probabilities and its priority (after the same keyword
+    adjustment). Every row is scored by the IsolationForest, so fake
+    detection does not depend on the cascade.
+    """
+    cascade = model.cascade
+    probs, prio_probs = first_stage_proba(clean, cascade)
+    if vect is None:
+        with stage_timer('tfidf_transform'):
+            vect = model.tfidf.transform(clean)
+    if model is GLOBAL_MODEL:
+        # Apply admin corrections to the first stage too, so they are not bypassed
+        probs = online_model.adjust_categories(vect, probs)
+        if prio_probs is not None and list(cascade['priority_classes']) == PRIORITY_CLASSES:
+            prio_probs = online_model.adjust_priority(vect, prio_probs)
+
+    confident = cascade_confident(probs, prio_probs, cascade)
+    n = len(clean)
+    fake = _fake_scores(vect, model)
+    priorities = [None] * n
+    if prio_probs is not None:
+        classes = cascade['priority_classes']
+        for i in np.flatnonzero(confident):
+            j = int(np.argmax(prio_probs[i]))
+            priorities[i] = _adjust_priority_score(texts_lower[i], classes[j], float(prio_probs[i, j]))
+
+    rest = np.flatnonzero(~confident)
+    CASCADE_ROWS.inc(n - len(rest), stage='first')
+    CASCADE_ROWS.inc(len(rest), stage='full')
+    if len(rest):
+        rest_vect = vect[rest]
+        rest_lower = [texts_lower[i] for i in rest]
+        rest_probs = _category_proba_matrix(rest_vect, model)
+        if model is GLOBAL_MODEL:
+            rest_probs = online_model.adjust_categories(rest_vect, rest_probs)
+        probs[rest] = rest_probs
+        for i, priority in zip(rest, _priority_labels(rest_vect, rest_lower, model)):
+            priorities[i] = priority
+    return {'category_probs': probs, 'priority': priorities, 'isFakeScore': fake}
+
+
+def predict_arrays(texts, model=None, cascade=None, vect=None):
+    """Run the model stack on a batch and return raw per-row arrays.
+
+    `model` is a ModelBundle (e.g. from model_registry); default: the global model.
+    `cascade` (default: ML_CASCADE) lets the model's first stage answer
+    confident rows when the model has one. `vect` passes the rows' TF-IDF
+    vectors when they are already known (prediction_store.py).
+
+    Returns a dict with:
+      - category_probs (ndarray, n_rows x n_categories, columns = category_cols)
+      - priority (list of str or None)
+      - isFakeScore (ndarray of float)
+    """
+    # Preprocess to match training pipeline
+    with stage_timer('preprocess'):
+        clean = [clean_text_no_stopwords(t) for t in texts]
+        texts_lower = [clean_text(t) for t in texts]
+    model = model or GLOBAL_MODEL
+    if (CASCADE_ENABLED if cascade is None else cascade) and model.cascade is not None:
+        return _predict_cascade(clean, texts_lower, model, vect)
+    if vect is None:
+        with stage_timer('tfidf_transform'):
+            vect = model.tfidf.transform(clean)
+    return _full_stack(vect, texts_lower, model)
+
+
+def scoring_version(model=None):
+    """Version string covering everything that shapes a prediction (model, corrections, cascade)."""
+    model = model or GLOBAL_MODEL
+    version = model_version() if model is GLOBAL_MODEL else model.version
+    if CASCADE_ENABLED and model.cascade is not None:
+        version += '+cascade'
+    return version
+
+
+def cascade_stats():
+    """How many rows the cascade's first stage answered, for /health."""
+    first, full = CASCADE_ROWS.get(stage='first'), CASCADE_ROWS.get(stage='full')
+    return {
+        'enabled': CASCADE_ENABLED and GLOBAL_MODEL.cascade is not None,
+        'threshold': GLOBAL_MODEL.cascade['threshold'] if GLOBAL_MODEL.cascade else None,
+        'first_stage_rows': int(first),
+        'full_stack_rows': int(full),
+        'short_circuit_ratio': round(first / (first + full), 4) if first + full else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Main prediction functions
+# ---------------------------------------------------------------------------
+def predict_complaints(texts, secondary_threshold: float = 0.30, model=None, cascade=None, vect=None):
+    """Batched `predict_complaint`: one vectorized pass over all texts.
+
+    Returns a list of result dicts in the same order and format as
+    `predict_complaint`.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    model = model or GLOBAL_MODEL
+    arrays = predict_arrays(texts, model, cascade, vect)
+    return [
+        _build_result(row, prio, fake, secondary_threshold, model.category_cols)
+        for row, prio, fake in zip(arrays['category_probs'], arrays['priority'], arrays['isFakeScore'])
+    ]
+
+
+def predict_columns(texts, secondary_threshold: float = 0.30, model=None, cascade=None):
+    """Batched prediction in a columnar layout (one list per field).
+
+    Cheaper to build and to parse than a list of per-row dicts. Returns:
+      - categories (list)              # column order of category_probs
+      - category, priority (lists of str)
+      - confidence, isFakeScore (lists of float)
+      - secondary_categories (list of lists)
+      - category_probs (list of lists, n_rows x n_categories)
+    """
+    texts = list(texts)
+    category_cols = (model or GLOBAL_MODEL).category_cols
+    if not texts:
+        return {'categories': list(category_cols), 'category': [], 'priority': [], 'confidence': [],
+                'isFakeScore': [], 'secondary_categories': [], 'category_probs': []}
+    arrays = predict_arrays(texts, model, cascade)
+    probs = arrays['category_probs']
+    # Stable descending order matches sorted(..., reverse=True) in _build_result
+    order = np.argsort(-probs, axis=1, kind='stable')
+    dominant_scores = probs[np.arange(len(probs)), order[:, 0]]
+    secondary = [
+        [category_cols[j] for j in idxs[1:]
+         if row[j] >= secondary_threshold and row[j] / max(dom, 0.01) > 0.4]
+        for row, idxs, dom in zip(probs, order, dominant_scores)
+    ]
+    return {
+        'categories': list(category_cols),
+        'category': [category_cols[i] for i in order[:, 0]],
+        'priority': arrays['priority'],
+        'confidence': [round(float(x), 4) for x in dominant_scores],
+        'isFakeScore': [round(float(x), 4) for x in arrays['isFakeScore']],
+        'secondary_categories': secondary,
+        'category_probs': probs.tolist(),
+    }
+
+
+def predict_complaint(text: str, secondary_threshold: float = 0.30, model=None, cascade=None):
+    """Predict categories and priority for a complaint text.
+
+    Returns a dict with:
+      - dominant_category (str)
+      - category_probs (dict)
+      - secondary_categories (list)
+      - priority (str)
+      - isFakeScore (float)    # 0 => likely genuine, 1 => likely fake/anomalous
+      - top_k (list of {label, score})
+      - confidence (float)     # probability of dominant category
+
+    With `cascade` (default: ML_CASCADE) and a calibrated first stage,
+    confident texts are answered without the full model stack.
+    """
+    return predict_complaints([text], secondary_threshold, model, cascade)[0]
+
+
+# ---------------------------------------------------------------------------
+# Online corrections (admin feedback, see online_model.py)
+# ---------------------------------------------------------------------------
+PRIORITY_CLASSES = [str(c) for c in prio_encoder.classes_] if prio_encoder is not None else []
+online_model.init(STATE_DIR, MODEL_VERSION, tfidf.transform(['']).shape[1], category_cols, PRIORITY_CLASSES)
+
+
+def model_version():
+    """Version of the model currently serving (base version plus published corrections)."""
+    return online_model.current_version()
+
+
+def learn_from_feedback(items, log=True):
+    """Apply corrected {text, category, priority?} items to the online model.
+
+    The corrected category is pushed up, and any other category the base
+    model predicted (p >= 0.5) is pushed down; the rest are left alone, so
+    legitimate secondary categories of unrelated texts are not disturbed.
+    """
+    clean = [clean_text_no_stopwords(item['text']) for item in items]
+    vect = tfidf.transform(clean)
+    base = _category_proba_matrix(vect)
+    cols = list(category_cols)
+    target = np.zeros_like(base)
+    mask = np.zeros_like(base)
+    for i, item in enumerate(items):
+        # Corrections logged under categories the current model lacks teach nothing
+        j = cols.index(item['category']) if item.get('category') in cols else -1
+        # Nothing to learn when the base model already got the category right
+        if j >= 0 and (np.argmax(base[i]) != j or base[i, j] < 0.5):
+            target[i, j] = 1
+            mask[i, j] = 1
+            mask[i, np.argmax(base[i])] = 1
+    base_prio = prio_clf.predict_proba(vect) if prio_clf is not None else None
+    y_prio = np.array([PRIORITY_CLASSES.index(item['priority']) if item.get('priority') in PRIORITY_CLASSES
+                       else -1 for item in items])
+    online_model.apply(lambda model: model.partial_fit(vect, base, target, mask, base_prio, y_prio),
+                       items, log=log)
+
+
+def start_online_learning():
+    """Replay corrections missing from the saved model and start periodic publishing."""
+    replay = online_model.unapplied_feedback()
+    if replay and online_model.ENABLED:
+        print(f"🔁 Replaying {len(replay)} admin corrections")
+        learn_from_feedback(replay, log=False)
+        online_model.publish()
+    online_model.start_publisher()
+
+
+# ---------------------------------------------------------------------------
+# Bulk offline scoring (CSV / JSONL / Parquet)
+# ---------------------------------------------------------------------------
+# python serve_model.py --bulk complaints.csv --output scored.csv --workers 8
+
+def _detect_format(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if suffix in ('.parquet', '.pq'):
+        return 'parquet'
+    if suffix == '.csv':
+        return 'csv'
+    raise ValueError(f"Unsupported file type '{suffix}' (use .csv, .jsonl or .parquet)")
+
+
+def _iter_chunks(path, fmt, chunk_size):
+    """Yield DataFrame chunks without reading the whole file."""
+    import pandas as pd
+    if fmt == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif fmt == 'jsonl':
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Parquet support requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+
+class _ChunkWriter:
+    """Appends scored DataFrame chunks to a CSV, JSONL or Parquet file."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._first = True
+        self._parquet = None
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, index=False)
+        elif self.fmt == 'jsonl':
+            # pandas < 2 leaves the last line without a newline, later versions end it with one
+            lines = df.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n')
+            with open(self.path, 'w' if self._first else 'a', encoding='utf-8') as f:
+                if len(df):
+                    f.write(lines + '\n')
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        self._first = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def score_texts(texts):
+    """Worker entry point: score one chunk and return plain result columns."""
+    arrays = predict_arrays([t if isinstance(t, str) else '' for t in texts])
+    probs = arrays['category_probs']
+    dominant = np.argmax(probs, axis=1)
+    return {
+        'category': [category_cols[i] for i in dominant],
+        'confidence': np.round(probs[np.arange(len(probs)), dominant], 4),
+        'priority': [p or 'low' for p in arrays['priority']],
+        'isFakeScore': np.round(arrays['isFakeScore'], 4),
+        'probs': probs.astype(np.float32),
+    }
+
+
+def _attach_results(df, result):
+    out = df.copy()
+    out['category'] = result['category']
+    out['confidence'] = result['confidence']
+    out['priority'] = result['priority']
+    out['isFakeScore'] = result['isFakeScore']
+    for i, col in enumerate(category_cols):
+        out[f'prob_{col}'] = np.round(result['probs'][:, i], 4)
+    return out
+
+
+def bulk_score(input_path, output_path, text_column='description', workers=None,
+               chunk_size=5000, output_format=None):
+    """Score a whole file in chunks across a process pool; returns rows scored.
+
+    At most 2 x workers chunks are in flight, so memory stays bounded however
+    large the input is, and output rows keep the input order.
+    """
+    import collections
+    import multiprocessing
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+
+    in_fmt = _detect_format(input_path)
+    out_fmt = output_format or _detect_format(output_path)
+    workers = workers or os.cpu_count() or 1
+
+    # Workers started with spawn re-import this module; have them mmap the
+    # artifacts. With fork they share the parent's already-loaded pages.
+    os.environ.setdefault('ML_MMAP_MODE', 'r')
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+
+    writer = _ChunkWriter(output_path, out_fmt)
+    pending = collections.deque()
+    done = 0
+    start = time.perf_counter()
+
+    def drain_one():
+        nonlocal done
+        df, future = pending.popleft()
+        writer.write(_attach_results(df, future.result()))
+        done += len(df)
+        elapsed = time.perf_counter() - start
+        print(f"   📈 {done:,} rows scored ({done / elapsed:,.0f} rows/s)", flush=True)
+
+    print(f"📦 Bulk scoring {input_path} -> {output_path} ({workers} workers, chunks of {chunk_size})")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            for df in _iter_chunks(input_path, in_fmt, chunk_size):
+                if text_column not in df.columns:
+                    raise SystemExit(f"❌ Column '{text_column}' not found in {input_path}")
+                texts = df[text_column].tolist()
+                pending.append((df, pool.submit(score_texts, texts)))
+                if len(pending) >= 2 * workers:
+                    drain_one()
+            while pending:
+                drain_one()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"✅ Scored {done:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+    return done
+
+
+def _bulk_main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(prog='serve_model.py --bulk', description='Offline bulk complaint scoring')
+    parser.add_argument('input', help='input .csv, .jsonl or .parquet file')
+    parser.add_argument('--output', '-o', required=True, help='output file (format from extension)')
+    parser.add_argument('--text-column', default='description')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='rows per worker task')
+    args = parser.parse_args(argv)
+    bulk_score(args.input, args.output, text_column=args.text_column,
+               workers=args.workers, chunk_size=args.chunk_size)
 
 
 # ---------------------------------------------------------------------------
@@ -196,6 +678,9 @@ def predict_complaint(text: str, secondary_threshold: float = 0.30):
 # ---------------------------------------------------------------------------
 if __name__ == '__main__':
     import sys
+    if len(sys.argv) >= 2 and sys.argv[1] == '--bulk':
+        _bulk_main(sys.argv[2:])
+        sys.exit(0)
     if len(sys.argv) < 2:
         # Run a few test predictions
         test_texts = [
@@ -224,5 +709,4 @@ if __name__ == '__main__':
 
     text = ' '.join(sys.argv[1:])
     out = predict_complaint(text)
-    import json
     print(json.dumps(out, indent=2))
\ No newline at end of file
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -----------------------------------------------------------------------------
+# FILE: server/ml/slim_model.py
+# Latency-aware feature pruning for the complaint classifier
+# -----------------------------------------------------------------------------
+# Ranks the word + char TF-IDF features by their learned weight in the
+# calibrated LinearSVCs, retrains the full model stack on the top-N features
+# for several vocabulary sizes and reports accuracy against prediction latency
+# and artifact size. The chosen size is retrained on all data and exported as
+# a new artifact version that serve_model.py loads via ML_MODELS_DIR:
+#
+#   python slim_model.py --sizes 1000,2000,4000,full --report slim_report.json
+#   ML_MODELS_DIR=models_slim_2000 python start_ml_service.py
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+import train_model
+from bench_ml_service import environment_info, summarize, time_call
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_SIZES = '500,1000,2000,4000,6000,full'
+
+
+# ---------------------------------------------------------------------------
+# Feature ranking
+# ---------------------------------------------------------------------------
+def feature_names(tfidf):
+    """(sub-vectorizer name, term) for every column of the FeatureUnion output."""
+    names = []
+    for name, vect in tfidf.transformer_list:
+        if vect == 'drop':
+            continue
+        names.extend((name, term) for term in vect.get_feature_names_out())
+    return names
+
+
+def feature_importance(cat_clf):
+    """Mean |coef| of the LinearSVCs behind each calibrated one-vs-rest estimator.
+
+    Every category contributes cv=3 fold models; their absolute weights are
+    averaged per category, then summed over categories.
+    """
+    importance = None
+    for calibrated in cat_clf.estimators_:
+        coefs = [np.abs(c.estimator.coef_).ravel() for c in calibrated.calibrated_classifiers_]
+        per_category = np.mean(coefs, axis=0)
+        importance = per_category if importance is None else importance + per_category
+    return importance
+
+
+def top_vocabularies(names, importance, size):
+    """Split the `size` highest-weighted features back into word/char vocabularies."""
+    order = np.argsort(-importance, kind='stable')[:size]
+    vocab = {'word': [], 'char': []}
+    for idx in sorted(order):
+        part, term = names[idx]
+        vocab[part].append(term)
+    return vocab
+
+
+def build_slim_tfidf(vocab):
+    tfidf = train_model.build_tfidf(
+        word_vocabulary=vocab['word'] or None,
+        char_vocabulary=vocab['char'] or None,
+    )
+    # An empty half would fall back to learning its own vocabulary
+    for part in ('word', 'char'):
+        if not vocab[part]:
+            tfidf.set_params(**{part: 'drop'})
+    return tfidf
+
+
+# ---------------------------------------------------------------------------
+# Training / evaluation
+# ---------------------------------------------------------------------------
+def training_arrays(df, category_cols, priority_le):
+    """(texts, y_multi, encoded y_priority or None) of a prepared frame."""
+    y_priority = None
+    if priority_le is not None:
+        y_priority = priority_le.transform(train_model.normalize_priority(df['priority']))
+    return df['description_features'].values, df[category_cols].astype(int).values, y_priority
+
+
+def fit_stack(tfidf, texts, y_multi, y_priority):
+    X_vect = tfidf.fit_transform(texts)
+    artifacts = {
+        'tfidf': tfidf,
+        'cat_clf': train_model.train_category_model(X_vect, y_multi),
+        'iso': train_model.train_isoforest(X_vect),
+        'prio_clf': None,
+    }
+    if y_priority is not None:
+        artifacts['prio_clf'] = train_model.train_priority_model(X_vect, y_priority)
+    return artifacts, X_vect.shape[1]
+
+
+def evaluate(artifacts, texts, y_multi, y_priority):
+    X_vect = artifacts['tfidf'].transform(texts)
+    y_pred = artifacts['cat_clf'].predict(X_vect)
+    scores = {
+        'micro_f1': round(float(f1_score(y_multi, y_pred, average='micro', zero_division=0)), 4),
+        'macro_f1': round(float(f1_score(y_multi, y_pred, average='macro', zero_division=0)), 4),
+        'priority_accuracy': None,
+    }
+    if artifacts['prio_clf'] is not None and y_priority is not None:
+        scores['priority_accuracy'] = round(
+            float(accuracy_score(y_priority, artifacts['prio_clf'].predict(X_vect))), 4
+        )
+    return scores
+
+
+def predict_once(artifacts, texts):
+    """Same model calls as serve_model.predict_arrays (without text cleaning)."""
+    vect = artifacts['tfidf'].transform(texts)
+    artifacts['cat_clf'].predict_proba(vect)
+    if artifacts['prio_clf'] is not None:
+        artifacts['prio_clf'].predict_proba(vect)
+    artifacts['iso'].decision_function(vect.toarray())
+
+
+def measure_latency(artifacts, texts, repeat, batch_size):
+    single = texts[:1]
+    batch = (texts * (batch_size // max(len(texts), 1) + 1))[:batch_size]
+    return {
+        'single': summarize(time_call(lambda: predict_once(artifacts, single), repeat=repeat)),
+        f'batch_{batch_size}': summarize(
+            time_call(lambda: predict_once(artifacts, batch), repeat=max(3, repeat // 10)),
+            items_per_call=batch_size,
+        ),
+    }
+
+
+def save_artifacts(artifacts, out_dir, category_cols, priority_le):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    joblib.dump(artifacts['tfidf'], out_dir / 'tfidf_vectorizer.joblib')
+    joblib.dump(artifacts['cat_clf'], out_dir / 'category_model.joblib')
+    joblib.dump(category_cols, out_dir / 'category_columns.joblib')
+    joblib.dump(artifacts['iso'], out_dir / 'isoforest.joblib')
+    if artifacts['prio_clf'] is not None:
+        joblib.dump(artifacts['prio_clf'], out_dir / 'priority_model.joblib')
+        joblib.dump(priority_le, out_dir / 'priority_encoder.joblib')
+
+
+def measure_memory(artifacts, category_cols, priority_le):
+    """On-disk artifact bytes and Python heap bytes held after loading them."""
+    tmp_dir = Path(tempfile.mkdtemp(prefix='grievassist_slim_'))
+    try:
+        save_artifacts(artifacts, tmp_dir, category_cols, priority_le)
+        files = {p.name: p.stat().st_size for p in tmp_dir.iterdir()}
+        tracemalloc.start()
+        loaded = [joblib.load(p) for p in tmp_dir.iterdir()]
+        loaded_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del loaded
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return {
+        'artifact_bytes': sum(files.values()),
+        'vectorizer_bytes': files.get('tfidf_vectorizer.joblib', 0),
+        'category_model_bytes': files.get('category_model.joblib', 0),
+        'loaded_bytes': loaded_bytes,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+def pareto_front(rows):
+    """Mark rows not dominated on (micro F1 up, single p50 down, loaded bytes down)."""
+    def key(r):
+        return (r['micro_f1'], -r['latency']['single']['median_ms'], -r['memory']['loaded_bytes'])
+
+    for row in rows:
+        k = key(row)
+        row['pareto'] = not any(
+            all(a >= b for a, b in zip(key(other), k)) and key(other) != k
+            for other in rows if other is not row
+        )
+    return rows
+
+
+def choose_size(rows, tolerance):
+    """Smallest size within `tolerance` of the full model's micro F1 and priority accuracy."""
+    full = max(rows, key=lambda r: r['n_features'])
+    for row in sorted(rows, key=lambda r: r['n_features']):
+        f1_ok = row['micro_f1'] >= full['micro_f1'] - tolerance
+        prio_ok = (full['priority_accuracy'] is None
+                   or row['priority_accuracy'] >= full['priority_accuracy'] - tolerance)
+        if f1_ok and prio_ok:
+            return row
+    return full
+
+
+def print_report(rows, chosen):
+    print("\n" + "=" * 96)
+    print(f"{'size':>8s} {'features':>9s} {'micro F1':>9s} {'macro F1':>9s} {'prio acc':>9s} "
+          f"{'p50 ms':>8s} {'batch/s':>9s} {'disk MB':>8s} {'heap MB':>8s}  pareto")
+    print("=" * 96)
+    for row in rows:
+        batch = next(v for k, v in row['latency'].items() if k.startswith('batch_'))
+        prio = row['priority_accuracy']
+        print(f"{str(row['size']):>8s} {row['n_features']:9d} {row['micro_f1']:9.4f} {row['macro_f1']:9.4f} "
+              f"{(f'{prio:.4f}' if prio is not None else '-'):>9s} "
+              f"{row['latency']['single']['median_ms']:8.2f} {batch['items_per_sec']:9.0f} "
+              f"{row['memory']['artifact_bytes'] / 1e6:8.2f} {row['memory']['loaded_bytes'] / 1e6:8.2f}  "
+              f"{'*' if row['pareto'] else ''}{'  <- selected' if row is chosen else ''}")
+
+
+def parse_sizes(value):
+    sizes = []
+    for part in value.split(','):
+        part = part.strip().lower()
+        if part:
+            sizes.append('full' if part == 'full' else int(part))
+    if 'full' not in sizes:
+        sizes.append('full')  # baseline for the tolerance check
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prune TF-IDF features by SVM weight and export a slimmer model')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma-separated vocabulary sizes ("full" = unpruned)')
+    parser.add_argument('--select', help='export this size instead of choosing automatically')
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help='max micro F1 / priority accuracy drop vs full when choosing automatically')
+    parser.add_argument('--max-rows', type=int, default=int(os.environ.get('ML_TRAIN_MAX_ROWS', '0') or 0))
+    parser.add_argument('--repeat', type=int, default=100, help='timed single-text predictions per size')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--report', help='write the Pareto report as JSON')
+    parser.add_argument('--output-dir', help='export directory (default: models_slim_<size>)')
+    parser.add_argument('--no-export', action='store_true', help='only print the report')
+    args = parser.parse_args()
+
+    df, category_cols = train_model.prepare_training_data(args.max_rows, augment=False)
+    priority_le = None
+    if 'priority' in df.columns:
+        priority_le = LabelEncoder().fit(train_model.normalize_priority(df['priority']))
+
+    # Split the original rows, then augment only the training side
+    idx_train, idx_test = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    print('\nAugmenting the training split...')
+    train_df = train_model.augment_data(df.iloc[idx_train], category_cols, n_augments=2)
+    texts_train, y_multi_train, y_prio_train = training_arrays(train_df, category_cols, priority_le)
+    texts_test, y_multi_test, y_prio_test = training_arrays(df.iloc[idx_test], category_cols, priority_le)
+    latency_texts = list(texts_test[:64])
+
+    # Rank features with the unpruned model trained on the training split only
+    print('\n🔎 Ranking features with the full model...')
+    base_tfidf = train_model.build_tfidf()
+    base, n_full = fit_stack(base_tfidf, texts_train, y_multi_train, y_prio_train)
+    names = feature_names(base_tfidf)
+    importance = feature_importance(base['cat_clf'])
+    print(f"   {n_full} features ranked")
+
+    rows = []
+    vocabularies = {}
+    for size in parse_sizes(args.sizes):
+        if size != 'full' and size >= n_full:
+            print(f"⏭️  Skipping size {size} (>= {n_full} features)")
+            continue
+        print(f"\n🏋️ Size {size}")
+        start = time.perf_counter()
+        if size == 'full':
+            artifacts, n_features = base, n_full
+        else:
+            vocabularies[size] = top_vocabularies(names, importance, size)
+            artifacts, n_features = fit_stack(
+                build_slim_tfidf(vocabularies[size]), texts_train, y_multi_train, y_prio_train
+            )
+        row = {
+            'size': size,
+            'n_features': int(n_features),
+            'n_word_features': len(vocabularies[size]['word']) if size != 'full' else None,
+            'train_seconds': round(time.perf_counter() - start, 2),
+        }
+        row.update(evaluate(artifacts, texts_test, y_multi_test, y_prio_test))
+        row['latency'] = measure_latency(artifacts, latency_texts, args.repeat, args.batch_size)
+        row['memory'] = measure_memory(artifacts, category_cols, priority_le)
+        rows.append(row)
+
+    pareto_front(rows)
+    if args.select:
+        wanted = 'full' if args.select == 'full' else int(args.select)
+        chosen = next((r for r in rows if r['size'] == wanted), None)
+        if chosen is None:
+            raise SystemExit(f"❌ --select {args.select} is not one of the evaluated sizes")
+    else:
+        chosen = choose_size(rows, args.tolerance)
+    print_report(rows, chosen)
+
+    report = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'environment': environment_info(),
+        'config': {
+            'sizes': [r['size'] for r in rows],
+            'tolerance': args.tolerance,
+            'n_train': int(len(train_df)),
+            'n_test': int(len(idx_test)),
+        },
+        'selected': chosen['size'],
+        'results': rows,
+    }
+
+    if not args.no_export and chosen['size'] != 'full':
+        size = chosen['size']
+        out_dir = Path(args.output_dir) if args.output_dir else BASE_DIR / f'models_slim_{size}'
+        full_df = train_model.augment_data(df, category_cols, n_augments=2)
+        print(f"\n📦 Retraining size {size} on all {len(full_df)} samples...")
+        artifacts, n_features = fit_stack(build_slim_tfidf(vocabularies[size]),
+                                          *training_arrays(full_df, category_cols, priority_le))
+        save_artifacts(artifacts, out_dir, category_cols, priority_le)
+
+        parent_meta = {}
+        parent_path = Path(os.environ.get('ML_MODELS_DIR', BASE_DIR / 'models')) / 'metadata.json'
+        if parent_path.exists():
+            with open(parent_path) as f:
+                parent_meta = json.load(f)
+        created = datetime.datetime.now(datetime.timezone.utc)
+        metadata = {
+            'created_at': created.isoformat(),
+            'model_version': f"{created.strftime('%Y%m%d%H%M%S')}-slim{size}",
+            'parent_model_version': parent_meta.get('model_version') or parent_meta.get('created_at'),
+            'n_samples': int(len(full_df)),
+            'n_features': int(n_features),
+            'categories': list(category_cols),
+            'has_priority': priority_le is not None,
+            'model_type': 'CalibratedLinearSVC',
+            'priority_model_type': 'GradientBoosting' if priority_le is not None else None,
+            'tfidf_config': f'word(1-3gram) + char_wb(3-5gram), top {size} by |LinearSVC coef|',
+            'slim': {key: chosen[key] for key in ('micro_f1', 'macro_f1', 'priority_accuracy')},
+        }
+        with open(out_dir / 'metadata.json', 'w') as f:
+            json.dump(metadata, f, indent=2)
+        report['exported'] = {'path': str(out_dir), 'model_version': metadata['model_version']}
+        print(f"✅ Exported {metadata['model_version']} to {out_dir}")
+        print(f"   Serve it with: ML_MODELS_DIR={out_dir} python start_ml_service.py")
+    elif chosen['size'] == 'full':
+        print("\nℹ️  No pruned size met the tolerance; keeping the full model")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
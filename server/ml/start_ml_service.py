@@ -2,22 +2,86 @@
 """
 Startup script for the ML service
 Run this to start the FastAPI ML service on port 8001
+
+Optionally also listen on a Unix domain socket (same process, same app), which
+avoids loopback TCP overhead for the co-located Node backend:
+
+    python start_ml_service.py --uds /tmp/grievassist-ml.sock
+
+Environment equivalents: ML_HOST, ML_PORT, ML_SERVICE_SOCKET, ML_KEEP_ALIVE.
 """
 
+import argparse
+import os
+import socket
+
 import uvicorn
 
+
+def bind_tcp(host, port):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def bind_uds(path):
+    if not hasattr(socket, 'AF_UNIX'):
+        raise SystemExit("❌ Unix domain sockets are not supported on this platform")
+    # Remove a stale socket left behind by a previous run
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    os.chmod(path, 0o660)
+    sock.set_inheritable(True)
+    return sock
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start the GrievAssist ML service")
+    parser.add_argument("--host", default=os.environ.get("ML_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("ML_PORT", "8001")))
+    parser.add_argument("--uds", default=os.environ.get("ML_SERVICE_SOCKET"),
+                        help="also listen on this Unix domain socket path")
+    parser.add_argument("--no-tcp", action="store_true", help="serve only on --uds")
+    parser.add_argument("--keep-alive", type=int, default=int(os.environ.get("ML_KEEP_ALIVE", "75")),
+                        help="seconds to keep idle connections open (longer than the client's idle timeout)")
+    args = parser.parse_args()
+    if args.no_tcp and not args.uds:
+        parser.error("--no-tcp requires --uds")
+
     print("🚀 Starting GrievAssist ML Service...")
-    print("📍 Service will be available at: http://localhost:8001")
-    print("🔗 Prediction endpoint: http://localhost:8001/predict")
-    print("❤️  Health check: http://localhost:8001/health")
-    print("📚 API docs: http://localhost:8001/docs")
+    if not args.no_tcp:
+        print(f"📍 Service will be available at: http://localhost:{args.port}")
+        print(f"🔗 Prediction endpoint: http://localhost:{args.port}/predict")
+        print(f"❤️  Health check: http://localhost:{args.port}/health")
+        print(f"📚 API docs: http://localhost:{args.port}/docs")
+    if args.uds:
+        print(f"🔌 Unix socket: {args.uds}")
     print("=" * 50)
-    
-    uvicorn.run(
+
+    config = uvicorn.Config(
         "app:app",  # <-- Import string matches your file name 'app.py'
-        host="0.0.0.0",
-        port=8001,
+        host=args.host,
+        port=args.port,
         reload=False,  # Disabled to avoid stale cache issues
-        log_level="info"
+        log_level="info",
+        # One long-lived client (the Node backend) reuses its connections,
+        # so keep idle ones open well past its pool timeout.
+        timeout_keep_alive=args.keep_alive,
     )
+    server = uvicorn.Server(config)
+
+    sockets = []
+    if not args.no_tcp:
+        sockets.append(bind_tcp(args.host, args.port))
+    if args.uds:
+        sockets.append(bind_uds(args.uds))
+    try:
+        server.run(sockets=sockets)
+    finally:
+        if args.uds and os.path.exists(args.uds):
+            os.unlink(args.uds)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -----------------------------------------------------------------------------
+# FILE: server/ml/synth_corpus.py
+# Synthetic labelled complaint corpora for scaling tests
+# -----------------------------------------------------------------------------
+# The bundled datasets hold ~900 complaints. This generator grows them to any
+# size (10k to 10M rows) in the same schema: description, one 0/1 column per
+# category, priority. Every row starts from a bundled complaint and keeps its
+# labels. It is varied with the synonym map train_model.py augments with
+# (train_model.SYNONYMS), plus locality, duration and opening phrases. Some rows
+# combine two complaints into one multi-label complaint.
+#
+# Rows are generated and written chunk by chunk, so memory stays flat at any
+# size. Output is CSV (what train_model.py reads), or Parquet with pyarrow
+# installed. The same --seed gives the same corpus. About 10% of the rows of a
+# 1M-row corpus repeat an earlier description; train_model.py drops those.
+#
+#   python synth_corpus.py --rows 1000000 --output data/synthetic/complaints_dataset.csv
+#   ML_DATA_DIR=data/synthetic python train_model.py
+#
+# scale_bench.py uses it to measure training and inference against corpus size.
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import train_model
+
+DEFAULT_CHUNK_SIZE = 100_000
+# Share of rows that combine two complaints (and their labels)
+DEFAULT_MULTI_LABEL = 0.05
+SYNONYM_RATE = 0.3
+SWAP_RATE = 0.05
+
+PRIORITY_RANK = {'low': 0, 'medium': 1, 'high': 2}
+
+LANDMARKS = [
+    'bus stand', 'market', 'school', 'hospital', 'temple', 'mosque', 'church',
+    'railway station', 'post office', 'park', 'main road', 'junction', 'bridge',
+    'flyover', 'college', 'panchayat office', 'ration shop', 'water tank',
+    'petrol pump', 'bank', 'police station', 'vegetable market', 'play ground',
+    'community hall', 'metro station', 'bus depot', 'government office',
+]
+LOCALITIES = ['ward', 'sector', 'block', 'street', 'colony', 'phase', 'lane']
+LOCATION_TEMPLATES = [
+    'near the {landmark}', 'in {locality} {n}', 'near {landmark} in {locality} {n}',
+    'opposite the {landmark}', 'behind {landmark} {locality} {n}', 'at {locality} {n} {landmark}',
+]
+DURATION_TEMPLATES = [
+    'for {n} days', 'since {n} days', 'for the last {n} weeks', 'since last week',
+    'for over a month', 'from yesterday', 'since morning', 'for {n} months now',
+]
+OPENINGS = [
+    'please help', 'urgent', 'kindly look into this', 'sir', 'request immediate action',
+    'this is the third complaint', 'nobody is responding', 'residents are suffering',
+]
+CONNECTORS = ['and also', 'also', 'and', 'moreover', 'in addition']
+
+
+def load_seeds():
+    """Bundled complaints as (words, labels, priority) lists, plus the category columns."""
+    df, category_cols = train_model.detect_category_columns(train_model.load_datasets())
+    df = df.dropna(subset=['description']).drop_duplicates(subset=['description']).reset_index(drop=True)
+    words = [str(text).lower().split() for text in df['description']]
+    labels = df[category_cols].fillna(0).astype(np.int8).values
+    if 'priority' in df.columns:
+        priorities = [str(p).strip().title() for p in df['priority'].fillna('Medium')]
+    else:
+        priorities = None
+    return words, labels, priorities, list(category_cols)
+
+
+class CorpusGenerator:
+    """Generates labelled rows from the seed complaints; deterministic per seed."""
+
+    def __init__(self, seed=42, multi_label=DEFAULT_MULTI_LABEL):
+        self.words, self.labels, self.priorities, self.category_cols = load_seeds()
+        self.multi_label = multi_label
+        self.rng = random.Random(seed)
+
+    def _vary(self, words):
+        rng = self.rng
+        synonyms = train_model.SYNONYMS
+        new_words = [rng.choice(synonyms[w]) if w in synonyms and rng.random() < SYNONYM_RATE else w
+                     for w in words]
+        for i in range(len(new_words) - 1):
+            if rng.random() < SWAP_RATE:
+                new_words[i], new_words[i + 1] = new_words[i + 1], new_words[i]
+        return ' '.join(new_words)
+
+    def _decorate(self, text):
+        rng = self.rng
+        if rng.random() < 0.85:
+            text += ' ' + rng.choice(LOCATION_TEMPLATES).format(
+                landmark=rng.choice(LANDMARKS), locality=rng.choice(LOCALITIES), n=rng.randint(1, 250))
+        if rng.random() < 0.4:
+            text += ' ' + rng.choice(DURATION_TEMPLATES).format(n=rng.randint(2, 12))
+        if rng.random() < 0.25:
+            text = rng.choice(OPENINGS) + ' ' + text
+        return text
+
+    def chunk(self, n_rows):
+        """One DataFrame of n_rows generated complaints."""
+        rng = self.rng
+        n_seeds = len(self.words)
+        texts = []
+        rows = np.empty(n_rows, dtype=np.int64)
+        partners = np.full(n_rows, -1, dtype=np.int64)
+        for r in range(n_rows):
+            i = rng.randrange(n_seeds)
+            text = self._vary(self.words[i])
+            if rng.random() < self.multi_label:
+                j = rng.randrange(n_seeds)
+                if (self.labels[j] & ~self.labels[i]).any():
+                    text += ' ' + rng.choice(CONNECTORS) + ' ' + self._vary(self.words[j])
+                    partners[r] = j
+            texts.append(self._decorate(text))
+            rows[r] = i
+
+        labels = self.labels[rows]
+        combined = partners >= 0
+        labels[combined] |= self.labels[partners[combined]]
+        df = pd.DataFrame(labels, columns=self.category_cols)
+        df.insert(0, 'description', texts)
+        if self.priorities:
+            priority = [self.priorities[i] for i in rows]
+            for r in np.flatnonzero(combined):
+                other = self.priorities[partners[r]]
+                if PRIORITY_RANK.get(other.lower(), 1) > PRIORITY_RANK.get(priority[r].lower(), 1):
+                    priority[r] = other
+            df['priority'] = priority
+        return df
+
+
+def output_format(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in ('.parquet', '.pq'):
+        return 'parquet'
+    if suffix == '.csv':
+        return 'csv'
+    raise ValueError(f"Unsupported file type '{suffix}' (use .csv or .parquet)")
+
+
+def write_corpus(path, n_rows, seed=42, chunk_size=DEFAULT_CHUNK_SIZE, multi_label=DEFAULT_MULTI_LABEL,
+                 quiet=False):
+    """Generate n_rows into path (CSV or Parquet), chunk by chunk. Returns rows/s."""
+    path = Path(path)
+    fmt = output_format(path)
+    if fmt == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Parquet output requires pyarrow (pip install pyarrow)")
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    generator = CorpusGenerator(seed=seed, multi_label=multi_label)
+    start = time.perf_counter()
+    written = 0
+    parquet = None
+    try:
+        while written < n_rows:
+            df = generator.chunk(min(chunk_size, n_rows - written))
+            if fmt == 'csv':
+                df.to_csv(path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+            else:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if parquet is None:
+                    parquet = pq.ParquetWriter(path, table.schema)
+                parquet.write_table(table)
+            written += len(df)
+            if not quiet:
+                elapsed = time.perf_counter() - start
+                print(f"   {written:>11,d}/{n_rows:,d} rows  ({written / elapsed:,.0f} rows/s)")
+    finally:
+        if parquet is not None:
+            parquet.close()
+    elapsed = time.perf_counter() - start
+    if not quiet:
+        print(f"✅ Wrote {written:,d} rows to {path} in {elapsed:.1f}s")
+    return written / elapsed if elapsed else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic labelled complaint corpus')
+    parser.add_argument('--rows', type=int, required=True, help='number of rows, e.g. 10000 or 10000000')
+    parser.add_argument('--output', '-o', required=True, help='output .csv or .parquet file')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--multi-label', type=float, default=DEFAULT_MULTI_LABEL,
+                        help='share of rows combining two complaints (default 0.05)')
+    args = parser.parse_args()
+    write_corpus(args.output, args.rows, seed=args.seed, chunk_size=args.chunk_size,
+                 multi_label=args.multi_label)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Tests for per-lane admission control (admission.py)
+Run with: python -m pytest test_admission.py
+"""
+
+import asyncio
+import time
+
+import anyio.to_thread
+import pytest
+
+import admission
+
+
+def test_requests_beyond_the_limit_queue_in_fifo_order():
+    async def main():
+        lane = admission.Lane("t", limit=1, max_queue=4, max_wait=5)
+        await lane.acquire()
+        order = []
+
+        async def request(n):
+            await lane.acquire()
+            order.append(n)
+            lane.release(0.01)
+
+        tasks = [asyncio.create_task(request(n)) for n in range(3)]
+        await asyncio.sleep(0)
+        assert lane.stats()["waiting"] == 3
+        lane.release(0.01)
+        await asyncio.gather(*tasks)
+        return lane, order
+
+    lane, order = asyncio.run(main())
+    assert order == [0, 1, 2]
+    assert lane.active == 0 and not lane.waiting
+    assert lane.admitted == 4
+
+
+def test_full_queue_is_rejected_at_once():
+    async def main():
+        lane = admission.Lane("t", limit=1, max_queue=0, max_wait=5)
+        await lane.acquire()
+        with pytest.raises(admission.Overloaded) as e:
+            await lane.acquire()
+        return lane, e.value
+
+    lane, error = asyncio.run(main())
+    assert error.reason == "queue_full" and error.retry_after >= 1
+    assert lane.rejected == {"queue_full": 1, "timeout": 0}
+
+
+def test_queued_request_times_out():
+    async def main():
+        lane = admission.Lane("t", limit=1, max_queue=1, max_wait=0.05)
+        await lane.acquire()
+        with pytest.raises(admission.Overloaded) as e:
+            await lane.acquire()
+        return lane, e.value
+
+    lane, error = asyncio.run(main())
+    assert error.reason == "timeout"
+    assert not lane.waiting and lane.active == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        lane = admission.Lane("t", limit=1, max_queue=1, max_wait=5)
+        await lane.acquire()
+        waiter = asyncio.create_task(lane.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        lane.release(0.01)
+        return lane
+
+    lane = asyncio.run(main())
+    assert lane.active == 0 and not lane.waiting
+
+
+def test_slot_holds_and_releases():
+    async def main():
+        lane = admission.Lane("t", limit=1, max_queue=0, max_wait=5)
+        async with lane.slot():
+            assert lane.active == 1
+            with pytest.raises(admission.Overloaded):
+                async with lane.slot():
+                    pass
+        return lane
+
+    assert asyncio.run(main()).active == 0
+
+
+def test_middleware_sheds_with_503_and_retry_after():
+    async def main():
+        lane = admission.Lane("t", limit=1, max_queue=0, max_wait=5)
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        middleware = admission.AdmissionMiddleware(app, lanes={"t": lane}, classify=lambda scope: "t")
+        sent = [[], []]
+
+        async def call(n):
+            async def send(message):
+                sent[n].append(message)
+            await middleware({"type": "http"}, None, send)
+
+        first = asyncio.create_task(call(0))
+        await asyncio.sleep(0)
+        await call(1)
+        release.set()
+        await first
+        return sent
+
+    first, second = asyncio.run(main())
+    assert first[0]["status"] == 200
+    assert second[0]["status"] == 503
+    assert dict(second[0]["headers"])[b"retry-after"] == b"1"
+
+
+def test_lane_from_env(monkeypatch):
+    monkeypatch.setenv("ML_ADMISSION_T", "3:7:2.5")
+    lane = admission.lane_from_env("t", limit=1, max_queue=1, max_wait=60)
+    assert (lane.limit, lane.max_queue, lane.max_wait) == (3, 7, 2.5)
+
+
+# ========== Lanes in the app ==========
+@pytest.fixture
+def service(monkeypatch):
+    app = pytest.importorskip("app")
+    httpx = pytest.importorskip("httpx")
+
+    def slow_media(*args, token=None, **kwargs):
+        time.sleep(0.5)
+        return {"category": "roads", "confidence": 0.9}
+
+    monkeypatch.setattr(app, "transcribe_file", slow_media)
+    monkeypatch.setattr(app, "analyze_video", slow_media)
+    for lane in app.ADMISSION_LANES.values():
+        monkeypatch.setattr(lane, "limit", 8)
+        monkeypatch.setattr(lane, "max_queue", 8)
+
+    def client():
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://ml")
+    return app, client
+
+
+def test_media_work_never_takes_the_default_thread_pool(service):
+    app, client = service
+
+    async def main():
+        # The default pool belongs to this event loop, so shrinking it ends with the test
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 4
+        async with client() as c:
+            media = [asyncio.create_task(c.post("/transcribe", files={"audio": ("a.webm", b"x")}))
+                     for _ in range(8)]
+            await asyncio.sleep(0.1)
+            start = time.perf_counter()
+            predict = await c.post("/predict", json={"text": "Huge pothole on the main road"})
+            elapsed = time.perf_counter() - start
+            return predict, elapsed, await asyncio.gather(*media)
+
+    predict, elapsed, media = asyncio.run(main())
+    assert predict.status_code == 200 and elapsed < 0.4
+    assert [r.status_code for r in media] == [200] * 8
+
+
+def test_analyze_complaint_media_stages_use_the_media_lanes(service, monkeypatch):
+    app, client = service
+    monkeypatch.setattr(app.ADMISSION_LANES["video"], "limit", 1)
+    monkeypatch.setattr(app.ADMISSION_LANES["video"], "max_queue", 0)
+
+    async def main():
+        async with client() as c:
+            return await asyncio.gather(*[
+                c.post("/analyze-complaint", data={"text": "Pothole on the main road", "video_url": "http://x"})
+                for _ in range(2)
+            ])
+
+    results = sorted((r.json() for r in asyncio.run(main())), key=lambda r: len(r["errors"]))
+    assert results[0]["errors"] == {} and results[0]["fused"]["sources"] == ["text", "video"]
+    assert "video lane overloaded" in results[1]["errors"]["video"]
+    assert results[1]["fused"]["sources"] == ["text"]
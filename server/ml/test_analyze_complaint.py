@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for multimodal complaint analysis and fusion (app.py /analyze-complaint)
+Run with: python -m pytest test_analyze_complaint.py
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+app = pytest.importorskip("app")
+httpx = pytest.importorskip("httpx")
+
+TEXT = "Huge pothole on the main road near the bus stand"
+
+
+def voice(category, priority="high", confidence=0.8):
+    return {"transcription": "...", "summary": "...", "detectedCategory": category, "detectedPriority": priority,
+            "detectedLanguage": "English", "confidence": confidence, "whisperTier": "base", "whisperTierReason": "test"}
+
+
+@pytest.fixture
+def media(monkeypatch):
+    """Canned voice and video results; each call sleeps `delay` seconds and records its thread."""
+    state = {"voice": voice("water"), "video": {"category": "water", "confidence": 0.9},
+             "delay": 0.0, "fail": set(), "calls": []}
+
+    def fake(name):
+        def run(*args, token=None, **kwargs):
+            state["calls"].append((name, threading.get_ident()))
+            time.sleep(state["delay"])
+            if name in state["fail"]:
+                raise RuntimeError(f"{name} broke")
+            return state[name]
+        return run
+
+    monkeypatch.setattr(app, "transcribe_file", fake("voice"))
+    monkeypatch.setattr(app, "analyze_video", fake("video"))
+    return state
+
+
+def analyze(data, audio=None):
+    async def main():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ml") as client:
+            files = {"audio": ("note.webm", audio, "audio/webm")} if audio else None
+            response = await client.post("/analyze-complaint", data=data, files=files)
+            assert response.status_code == 200, response.text
+            return response.json()
+
+    return asyncio.run(main())
+
+
+def test_text_only_matches_predict(media):
+    result = analyze({"text": TEXT})
+    assert result["voice"] is None and result["video"] is None and result["errors"] == {}
+    assert result["fused"]["sources"] == ["text"]
+    assert result["fused"]["category"] == result["text"]["category"]
+    assert result["fused"]["confidence"] == result["text"]["confidence"]
+    assert media["calls"] == []
+
+
+def test_all_modalities_run_concurrently_and_are_fused(media):
+    media["delay"] = 0.3
+    start = time.perf_counter()
+    result = analyze({"text": TEXT, "video_url": "http://example.com/clip.mp4"}, audio=b"fake audio")
+    assert time.perf_counter() - start < 0.55
+    assert {name for name, _ in media["calls"]} == {"voice", "video"}
+    assert len({thread for _, thread in media["calls"]}) == 2
+    assert result["fused"]["sources"] == ["text", "voice", "video"]
+    assert set(result["timings_ms"]) == {"text", "voice", "video"}
+
+
+def test_failed_modality_is_reported_and_left_out(media):
+    media["fail"].add("voice")
+    result = analyze({"text": TEXT, "video_url": "http://example.com/clip.mp4"}, audio=b"fake audio")
+    assert result["voice"] is None and result["errors"] == {"voice": "voice broke"}
+    assert result["fused"]["sources"] == ["text", "video"]
+
+
+def test_earlier_video_result_is_fused_without_download(media):
+    result = analyze({"text": TEXT, "video_category": "water", "video_confidence": "0.7"})
+    assert media["calls"] == []
+    assert result["video"] == {"category": "water", "confidence": 0.7}
+    assert result["fused"]["sources"] == ["text", "video"]
+
+
+def test_fusion_weights_and_priority():
+    fused = app.fuse_predictions([
+        {"source": "text", "category": "roads", "priority": "low", "confidence": 0.6},
+        {"source": "voice", "category": "water", "priority": "high", "confidence": 0.9},
+        {"source": "video", "category": "water", "priority": "medium", "confidence": 0.9},
+    ])
+    # roads 0.5 x 0.6 = 0.30 against water 0.3 x 0.9 + 0.2 x 0.9 = 0.45
+    assert fused["category"] == "water"
+    # (1 x 0.5 + 3 x 0.3 + 2 x 0.2) / 1.0 = 1.8 rounds to medium
+    assert fused["priority"] == "medium"
+    assert fused["confidence"] == pytest.approx(0.75)
+    assert app.fuse_predictions([])["sources"] == []
+
+
+def test_uninformative_modalities_are_not_fused():
+    text = {"category": "unassigned", "priority": None, "confidence": 0.2}
+    predictions = app.modality_predictions(text, voice("other"), {"category": "unassigned", "confidence": 0.5})
+    assert predictions == []
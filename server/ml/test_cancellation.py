@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for request cancellation and deadlines (cancellation.py)
+Run with: python -m pytest test_cancellation.py
+"""
+
+import asyncio
+import time
+
+import pytest
+
+import cancellation
+
+
+def test_token_expires_at_its_deadline():
+    token = cancellation.CancelToken(time.monotonic() + 0.05)
+    assert not token.cancelled
+    time.sleep(0.06)
+    assert token.cancelled and token.reason == "deadline"
+    with pytest.raises(cancellation.Cancelled):
+        token.check()
+
+
+def test_first_cancel_reason_wins():
+    token = cancellation.CancelToken()
+    token.cancel("client disconnected")
+    token.cancel("deadline")
+    assert token.reason == "client disconnected"
+
+
+def test_remaining_is_capped_by_default():
+    assert cancellation.CancelToken().remaining(5) == 5
+    token = cancellation.CancelToken(time.monotonic() + 2)
+    assert token.remaining(1) == 1
+    assert 1.5 < token.remaining() <= 2
+
+
+def test_deadline_from_headers(monkeypatch):
+    monkeypatch.setattr(cancellation, "MAX_TIMEOUT_S", 0)
+    assert cancellation.deadline_from_headers({}) is None
+    assert cancellation.deadline_from_headers({"x-request-timeout-ms": "soon"}) is None
+    deadline = cancellation.deadline_from_headers({"x-request-timeout-ms": "500"})
+    assert 0.4 < deadline - time.monotonic() <= 0.5
+
+
+def test_server_ceiling_caps_client_budget(monkeypatch):
+    monkeypatch.setattr(cancellation, "MAX_TIMEOUT_S", 1)
+    deadline = cancellation.deadline_from_headers({"x-request-timeout-ms": "60000"})
+    assert deadline - time.monotonic() <= 1
+    assert cancellation.deadline_from_headers({}) is not None
+
+
+def test_disconnect_cancels_token():
+    class Request:
+        def __init__(self):
+            self.messages = [{"type": "http.request", "body": b""}, {"type": "http.disconnect"}]
+
+        async def receive(self):
+            return self.messages.pop(0)
+
+    token = cancellation.CancelToken()
+    asyncio.run(cancellation.watch_disconnect(Request(), token))
+    assert token.cancelled and token.reason == "client disconnected"
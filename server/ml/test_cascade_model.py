@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for cascade threshold calibration and routing (cascade_model.py, serve_model.py)
+Run with: python -m pytest test_cascade_model.py
+"""
+
+import numpy as np
+
+import cascade_model
+import serve_model
+
+
+def test_threshold_is_lowest_confidence_meeting_the_target():
+    confidence = np.linspace(1.0, 0.5, 100)
+    correct = np.arange(100) < 60
+    threshold = cascade_model.calibrate_threshold(confidence, correct, 0.99)
+    assert threshold == confidence[59]
+
+
+def test_threshold_tolerates_errors_up_to_the_target():
+    confidence = np.linspace(1.0, 0.5, 100)
+    correct = np.ones(100, dtype=bool)
+    correct[[60, 90]] = False
+    assert cascade_model.calibrate_threshold(confidence, correct, 0.98) == confidence[99]
+    assert cascade_model.calibrate_threshold(confidence, correct, 0.99) == confidence[59]
+
+
+def test_no_threshold_on_too_few_rows():
+    confidence = np.linspace(1.0, 0.5, 100)
+    correct = np.arange(100) < cascade_model.MIN_CALIBRATION_ROWS - 1
+    assert cascade_model.calibrate_threshold(confidence, correct, 0.99) is None
+
+
+def test_threshold_never_below_minimum():
+    confidence = np.linspace(0.45, 0.3, 50)
+    correct = np.ones(50, dtype=bool)
+    assert cascade_model.calibrate_threshold(confidence, correct, 0.9) == cascade_model.MIN_THRESHOLD
+
+
+def test_confident_rows_need_every_category_settled():
+    cascade = {"threshold": 0.9, "priority_threshold": 0.8}
+    probs = np.array([
+        [0.97, 0.02, 0.05],  # settled
+        [0.97, 0.40, 0.05],  # secondary category undecided
+        [0.95, 0.95, 0.01],  # two settled categories
+    ])
+    assert serve_model.cascade_confident(probs, None, cascade).tolist() == [True, False, True]
+    prio = np.array([[0.9, 0.1], [0.9, 0.1], [0.6, 0.4]])
+    assert serve_model.cascade_confident(probs, prio, cascade).tolist() == [True, False, False]
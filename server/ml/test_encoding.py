@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for response content negotiation (encoding.py)
+Run with: python -m pytest test_encoding.py
+"""
+
+import json
+
+import pytest
+
+import encoding
+
+needs_msgpack = pytest.mark.skipif(encoding.msgpack is None, reason="msgpack not installed")
+
+
+@pytest.mark.parametrize("accept", [None, "", "*/*", "application/json", "text/html", "application/*"])
+def test_json_by_default(accept):
+    assert encoding.negotiate(accept) == encoding.JSON
+
+
+@needs_msgpack
+@pytest.mark.parametrize("accept", [
+    "application/msgpack",
+    "application/x-msgpack",
+    "application/json;q=0.5, application/msgpack",
+])
+def test_msgpack_when_preferred(accept):
+    assert encoding.negotiate(accept) == encoding.MSGPACK
+
+
+@needs_msgpack
+def test_ties_go_to_the_first_listed_type():
+    assert encoding.negotiate("application/json, application/msgpack") == encoding.JSON
+    assert encoding.negotiate("application/msgpack, application/json") == encoding.MSGPACK
+    assert encoding.negotiate("application/msgpack;q=0.1, */*;q=0.9") == encoding.JSON
+
+
+def test_msgpack_only_without_msgpack_is_not_acceptable(monkeypatch):
+    monkeypatch.setattr(encoding, "msgpack", None)
+    with pytest.raises(encoding.NotAcceptable):
+        encoding.negotiate("application/msgpack")
+    assert encoding.negotiate("application/msgpack, application/json;q=0.1") == encoding.JSON
+    assert encoding.available_types() == [encoding.JSON]
+
+
+def test_json_round_trip(monkeypatch):
+    obj = {"category": "roads", "confidence": 0.98, "top_k": [["roads", 0.98]], "text": "சாலை"}
+    assert json.loads(encoding.encode(obj, encoding.JSON)) == obj
+    monkeypatch.setattr(encoding, "orjson", None)
+    assert json.loads(encoding.encode(obj, encoding.JSON)) == obj
+
+
+@needs_msgpack
+def test_msgpack_round_trip():
+    obj = {"category": "roads", "confidence": 0.98, "top_k": [["roads", 0.98]]}
+    assert encoding.msgpack.unpackb(encoding.encode(obj, encoding.MSGPACK), use_list=True) == obj
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for the supervised media worker processes (media_workers.py)
+Run with: python -m pytest test_media_workers.py
+
+The job functions below run inside spawned workers, which import this module.
+"""
+
+import os
+import time
+
+import pytest
+
+import cancellation
+import media_workers
+import metrics
+
+MODULE = __name__
+
+
+# ========== Jobs (run in the worker) ==========
+def add(a, b, token=None):
+    return a + b
+
+
+def fail(token=None):
+    raise ValueError("bad frame")
+
+
+def crash(token=None):
+    os._exit(3)
+
+
+def wait_for_cancel(token=None):
+    while True:
+        token.check()
+        time.sleep(0.01)
+
+
+def record_hit(token=None):
+    metrics.record_cache("worker_test", hit=True)
+    return os.getpid()
+
+
+# ========== Tests ==========
+@pytest.fixture
+def pool():
+    pool = media_workers.WorkerPool("test", workers=1, concurrency=2, memory_mb=0, max_jobs=0)
+    yield pool
+    with pool.cond:
+        for worker in pool.workers:
+            worker.draining = True
+            worker.send(("stop",))
+
+
+def test_results_and_job_errors_come_back(pool):
+    assert pool.call(f"{MODULE}.add", (2, 3)) == 5
+    with pytest.raises(media_workers.WorkerError, match="bad frame"):
+        pool.call(f"{MODULE}.fail", ())
+    assert pool.call(f"{MODULE}.add", (1, 1)) == 2
+    assert pool.stats()["restarts"] == {"recycled": 0, "memory": 0, "crashed": 0}
+
+
+def test_crashed_worker_fails_its_job_and_is_replaced(pool):
+    first = pool.call(f"{MODULE}.record_hit", ())
+    with pytest.raises(media_workers.WorkerCrashed):
+        pool.call(f"{MODULE}.crash", ())
+    assert pool.call(f"{MODULE}.record_hit", ()) != first
+    assert pool.stats()["restarts"]["crashed"] == 1
+
+
+def test_worker_is_recycled_after_max_jobs(pool):
+    pool.max_jobs = 2
+    pids = [pool.call(f"{MODULE}.record_hit", ()) for _ in range(4)]
+    assert pids[0] == pids[1] != pids[2] == pids[3]
+    assert pool.stats()["restarts"]["recycled"] == 2
+
+
+def test_cancellation_is_forwarded(pool):
+    token = cancellation.CancelToken(time.monotonic() + 0.3)
+    start = time.perf_counter()
+    with pytest.raises(cancellation.Cancelled):
+        pool.call(f"{MODULE}.wait_for_cancel", (), token=token)
+    assert time.perf_counter() - start < 2
+    # The worker stopped the job and takes new ones
+    assert pool.call(f"{MODULE}.add", (1, 2)) == 3
+
+
+def test_worker_metrics_reach_the_api_process(pool):
+    before = metrics.CACHE_REQUESTS.get(cache="worker_test", result="hit")
+    pool.call(f"{MODULE}.record_hit", ())
+    pool.call(f"{MODULE}.record_hit", ())
+    assert metrics.CACHE_REQUESTS.get(cache="worker_test", result="hit") == before + 2
+
+
+def test_delta_exporter_sends_each_increment_once():
+    registry = metrics.Registry()
+    counter = metrics.Counter("t_total", "test", ["kind"], registry=registry)
+    exporter = metrics.DeltaExporter(registry)
+    counter.inc(kind="a")
+    counter.inc(2, kind="b")
+    deltas = exporter.take()
+    assert exporter.take() == {}
+    counter.inc(kind="a")
+    later = exporter.take()
+
+    target = metrics.Registry()
+    merged = metrics.Counter("t_total", "test", ["kind"], registry=target)
+    target.merge(deltas)
+    target.merge(later)
+    assert merged.get(kind="a") == 2 and merged.get(kind="b") == 2
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tests for on-demand specific models (model_registry.py)
+Run with: python -m pytest test_model_registry.py
+"""
+
+import json
+import shutil
+import threading
+import time
+
+import pytest
+
+import model_registry
+import prediction_store
+import serve_model
+
+MODEL_MB = 100
+
+
+class FakeBundle:
+    """Stands in for serve_model.ModelBundle: a fixed size and a load counter."""
+
+    loads = []
+    delay = 0
+    fail = False
+
+    def __init__(self, models_dir, name=None):
+        time.sleep(self.delay)
+        if self.fail:
+            raise OSError(f"cannot load {name}")
+        FakeBundle.loads.append(name)
+        self.version = f"{name}-v1"
+        self.size_mb = MODEL_MB
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    for key in ("district/a", "district/b", "district/c"):
+        (tmp_path / key).mkdir(parents=True)
+        (tmp_path / key / "category_model.joblib").touch()
+    monkeypatch.setattr(serve_model, "ModelBundle", FakeBundle)
+    monkeypatch.setattr(FakeBundle, "loads", [])
+    return model_registry.ModelRegistry(tmp_path, budget_mb=2.5 * MODEL_MB)
+
+
+def test_least_recently_used_model_is_evicted(registry):
+    for key in ("district/a", "district/b", "district/a", "district/c"):
+        model, served_by = registry.resolve(key)
+        assert served_by == key and model.version == f"{key}-v1"
+    stats = registry.stats()
+    assert set(stats["resident"]) == {"district/a", "district/c"}
+    assert stats["used_mb"] <= registry.budget_mb
+    assert stats["models"]["district/b"]["evictions"] == 1
+    assert stats["models"]["district/a"] == dict(stats["models"]["district/a"], loads=1, hits=1)
+
+    registry.resolve("district/b")
+    assert FakeBundle.loads == ["district/a", "district/b", "district/c", "district/b"]
+    assert set(registry.stats()["resident"]) == {"district/c", "district/b"}
+
+
+def test_unknown_and_invalid_keys_fall_back_to_global(registry):
+    assert registry.resolve("district/nowhere") == (serve_model.GLOBAL_MODEL, "global")
+    assert registry.resolve("../../etc") == (serve_model.GLOBAL_MODEL, "global")
+    assert registry.resolve(None) == (serve_model.GLOBAL_MODEL, "global")
+    assert registry.stats()["fallbacks"] == 1
+    assert model_registry.normalize_key(" District/Tamil Nadu ") == "district/tamil-nadu"
+
+
+def test_concurrent_requests_share_one_load(registry, monkeypatch):
+    monkeypatch.setattr(FakeBundle, "delay", 0.1)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.resolve("district/a"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert FakeBundle.loads == ["district/a"]
+    assert len({id(model) for model, _ in results}) == 1
+    entry = registry.stats()["models"]["district/a"]
+    assert entry["loads"] == 1 and entry["hits"] == 3
+
+
+def test_failed_load_is_retried(registry, monkeypatch):
+    monkeypatch.setattr(FakeBundle, "fail", True)
+    with pytest.raises(OSError):
+        registry.resolve("district/a")
+    assert registry.stats()["loading"] == []
+    monkeypatch.setattr(FakeBundle, "fail", False)
+    assert registry.resolve("district/a")[1] == "district/a"
+
+
+# ========== Bulk stream routing ==========
+@pytest.fixture
+def district_model(tmp_path, monkeypatch):
+    """A real copy of the global model registered as district/a, and an empty prediction store."""
+    shutil.copytree(serve_model.MODELS_DIR, tmp_path / "registry" / "district" / "a",
+                    ignore=shutil.ignore_patterns("registry"))
+    registry = model_registry.ModelRegistry(tmp_path / "registry", budget_mb=1024)
+    monkeypatch.setattr(model_registry, "registry", registry)
+    store = prediction_store.PredictionStore(tmp_path / "predictions.sqlite3")
+    monkeypatch.setattr(prediction_store, "ENABLED", True)
+    monkeypatch.setattr(prediction_store, "_store", store)
+    return tmp_path / "registry", store
+
+
+def stream(records, model_key=None):
+    app = pytest.importorskip("app")
+    records = [dict({"line": n + 1, "model_key": None}, **r) for n, r in enumerate(records)]
+    data, _ = app.predict_stream_chunk(records, 3, model_key)
+    return [json.loads(line) for line in data.splitlines()]
+
+
+def stored_keys(store):
+    return sorted(store.conn.execute("SELECT id, model_key FROM predictions"))
+
+
+def test_stream_rows_use_their_model_key(district_model):
+    _, store = district_model
+    out = stream([
+        {"id": "c1", "text": "Huge pothole on the main road", "model_key": "District/A"},
+        {"id": "c2", "text": "Street light not working"},
+        {"id": "c3", "text": "Garbage not collected", "model_key": "district/nowhere"},
+        {"id": None, "line": 4, "error": "Invalid JSON"},
+    ])
+    assert [(r["id"], r.get("model")) for r in out] == [
+        ("c1", "district/a"), ("c2", "global"), ("c3", "global"), (None, None),
+    ]
+    assert stored_keys(store) == [("c1", "district/a"), ("c2", "global"), ("c3", "global")]
+
+    # The query default applies to rows without a key; each model keeps its own row
+    out = stream([{"id": "c1", "text": "Huge pothole on the main road"}], model_key="district/a")
+    assert out[0]["model"] == "district/a" and out[0]["unchanged"]
+    out = stream([{"id": "c1", "text": "Huge pothole on the main road"}])
+    assert out[0]["model"] == "global" and "unchanged" not in out[0]
+    assert stored_keys(store)[:2] == [("c1", "district/a"), ("c1", "global")]
+
+
+def test_stale_prune_drops_rows_of_removed_models(district_model):
+    root, store = district_model
+    stream([{"id": "c1", "text": "Huge pothole on the main road", "model_key": "district/a"},
+            {"id": "c1", "text": "Huge pothole on the main road"}])
+    assert prediction_store.prune(stale=True) == 0
+    shutil.rmtree(root / "district" / "a")
+    assert prediction_store.prune(stale=True) == 1
+    assert stored_keys(store) == [("c1", "global")]
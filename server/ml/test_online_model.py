@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for online learning from admin corrections (online_model.py, serve_model.learn_from_feedback)
+Run with: python -m pytest test_online_model.py
+"""
+
+import json
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+import online_model
+import serve_model
+
+TEXT = "Water logging on the road after every rain near the school"
+UNRELATED = "Street light not working for a week"
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """A fresh online model in tmp_path; the module state is restored afterwards."""
+    for name in ("learner", "served", "base_version", "version", "feedback_applied",
+                 "published_applied", "last_published_at", "_out_dir"):
+        monkeypatch.setattr(online_model, name, getattr(online_model, name))
+    monkeypatch.setattr(online_model, "ENABLED", True)
+    monkeypatch.delenv("ML_FEEDBACK_LOG", raising=False)
+    online_model.init(tmp_path, serve_model.MODEL_VERSION, serve_model.tfidf.transform([""]).shape[1],
+                      serve_model.category_cols, serve_model.PRIORITY_CLASSES)
+    return tmp_path
+
+
+def test_zero_model_leaves_predictions_unchanged():
+    model = online_model.CorrectionModel(4, ["a", "b"], ["low", "high"])
+    vect = sp.csr_matrix(np.eye(4)[:2])
+    probs = np.array([[0.9, 0.2], [0.3, 0.6]])
+    assert np.allclose(model.category_proba(vect, probs), probs)
+    prio = np.array([[0.7, 0.3], [0.4, 0.6]])
+    assert np.allclose(model.priority_proba(vect, prio), prio)
+
+
+def test_partial_fit_moves_only_corrected_features():
+    model = online_model.CorrectionModel(4, ["a", "b"], [])
+    corrected = sp.csr_matrix([[1.0, 0, 0, 0]])
+    base = np.array([[0.9, 0.1]])
+    model.partial_fit(corrected, base, np.array([[0.0, 1.0]]), mask=np.array([[1.0, 1.0]]))
+    after = model.category_proba(corrected, base)[0]
+    assert after[0] < 0.9 and after[1] > 0.1
+    unrelated = sp.csr_matrix([[0, 0, 1.0, 0]])
+    assert np.allclose(model.category_proba(unrelated, base), base)
+
+
+def test_correction_is_served_after_publish(state_dir):
+    before = serve_model.predict_complaint(TEXT)
+    other = serve_model.predict_complaint(UNRELATED)
+    target = next(c for c in serve_model.category_cols if c != before["dominant_category"])
+
+    for _ in range(3):
+        serve_model.learn_from_feedback([{"text": TEXT, "category": target}])
+    # Learned, but not served until published
+    assert serve_model.predict_complaint(TEXT)["dominant_category"] == before["dominant_category"]
+
+    assert online_model.publish() == f"{serve_model.MODEL_VERSION}+fb3"
+    assert online_model.publish() is None
+    assert serve_model.predict_complaint(TEXT)["dominant_category"] == target
+    assert serve_model.predict_complaint(UNRELATED)["dominant_category"] == other["dominant_category"]
+
+    log = (state_dir / online_model.FEEDBACK_FILE).read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["category"] for line in log] == [target] * 3
+
+
+def test_restart_restores_published_model_and_replays_the_rest(state_dir):
+    items = [{"text": TEXT, "category": "water"}]
+    serve_model.learn_from_feedback(items)
+    online_model.publish()
+    serve_model.learn_from_feedback(items)
+
+    n_features = serve_model.tfidf.transform([""]).shape[1]
+    online_model.init(state_dir, serve_model.MODEL_VERSION, n_features,
+                      serve_model.category_cols, serve_model.PRIORITY_CLASSES)
+    assert online_model.current_version() == f"{serve_model.MODEL_VERSION}+fb1"
+    assert len(online_model.unapplied_feedback()) == 1
+
+    # A retrained base model replays the whole log
+    online_model.init(state_dir, "retrained", n_features, serve_model.category_cols, serve_model.PRIORITY_CLASSES)
+    assert len(online_model.unapplied_feedback()) == 2
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming NDJSON bulk classification (app.py /predict/stream)
+Run with: python -m pytest test_predict_stream.py
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import prediction_store
+import serve_model
+
+app = pytest.importorskip("app")
+httpx = pytest.importorskip("httpx")
+
+TEXTS = [
+    "Huge pothole on the main road near the bus stand",
+    "Street light not working for a week",
+    "Garbage not collected from our street",
+    "Drain overflowing after the rain",
+    "Water supply cut since two days",
+]
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "STREAM_CHUNK_SIZE", 2)
+    monkeypatch.setattr(prediction_store, "ENABLED", True)
+    monkeypatch.setattr(prediction_store, "_store", prediction_store.PredictionStore(tmp_path / "p.sqlite3"))
+
+
+def post_stream(parts, query="?top_k=2"):
+    """POST the byte `parts` as a streamed body; return the parsed NDJSON response lines."""
+    async def body():
+        for part in parts:
+            yield part
+
+    async def main():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ml") as client:
+            response = await client.post(f"/predict/stream{query}", content=body(),
+                                         headers={"Content-Type": "application/x-ndjson"})
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "application/x-ndjson"
+            return [json.loads(line) for line in response.text.splitlines()]
+
+    return asyncio.run(main())
+
+
+def ndjson(records):
+    return b"".join(json.dumps(r).encode() + b"\n" for r in records)
+
+
+def test_rows_come_back_in_order_and_match_predict():
+    records = [{"id": f"c{i}", "text": text} for i, text in enumerate(TEXTS)]
+    body = ndjson(records)
+    # Split mid-line, so lines span request chunks
+    out = post_stream([body[:30], body[30:101], body[101:]])
+    assert [r["id"] for r in out] == [r["id"] for r in records]
+    expected = serve_model.predict_complaints(TEXTS)
+    assert [r["category"] for r in out] == [e["dominant_category"] for e in expected]
+    assert all(len(r["top_k"]) == 2 and r["model"] == "global" for r in out)
+
+
+def test_bad_lines_are_reported_in_place():
+    body = (b'{"id": "a", "text": "Pothole on the road"}\n'
+            b'not json\n'
+            b'\n'
+            b'["a list"]\n'
+            b'{"id": "b"}\n'
+            b'{"id": "c", "text": "Garbage not collected"}')  # no trailing newline
+    out = post_stream([body])
+    assert [r["id"] for r in out] == ["a", None, None, "b", "c"]
+    assert [r.get("line") for r in out] == [None, 2, 4, 5, None]
+    assert out[1]["error"].startswith("Invalid JSON")
+    assert out[2]["error"] == "Each line must be a JSON object"
+    assert out[3]["error"] == "Missing or non-string 'text'"
+    assert "category" in out[4]
+
+
+def test_over_long_line_is_skipped(monkeypatch):
+    monkeypatch.setattr(app, "STREAM_MAX_LINE_BYTES", 64)
+    long_line = json.dumps({"id": "long", "text": "pothole " * 20}).encode()
+    # Only a partial line is capped: the limit trips once the buffer holds 64 bytes without a newline
+    out = post_stream([long_line[:40], long_line[40:], b"\n" + ndjson([{"id": "ok", "text": TEXTS[0]}])])
+    assert [r["id"] for r in out] == [None, "ok"]
+    assert "exceeds" in out[0]["error"]
+
+
+def test_repeat_run_is_unchanged():
+    records = ndjson([{"id": f"c{i}", "text": text} for i, text in enumerate(TEXTS)])
+    first = post_stream([records])
+    assert not any(r.get("unchanged") for r in first)
+    again = post_stream([records])
+    assert all(r["unchanged"] for r in again)
+    assert [r["category"] for r in again] == [r["category"] for r in first]
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental bulk re-scoring (prediction_store.py)
+Run with: python -m pytest test_prediction_store.py
+"""
+
+import sqlite3
+
+import pytest
+
+import prediction_store
+import serve_model
+
+TEXTS = [
+    "Huge pothole on the main road near the bus stand",
+    "Street light not working for a week",
+    "Garbage not collected from our street",
+]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = prediction_store.PredictionStore(tmp_path / "predictions.sqlite3")
+    monkeypatch.setattr(prediction_store, "ENABLED", True)
+    monkeypatch.setattr(prediction_store, "_store", store)
+    return store
+
+
+def outcomes():
+    return {result: prediction_store.ROWS.get(result=result) for result in ("fresh", "reused", "scored")}
+
+
+def categories(results):
+    return [r["dominant_category"] for r in results]
+
+
+def rescore(ids, texts):
+    before = outcomes()
+    results, unchanged = prediction_store.rescore(ids, texts)
+    return results, unchanged, {k: v - before[k] for k, v in outcomes().items()}
+
+
+def test_first_run_scores_and_repeat_is_fresh(store):
+    ids = ["c1", "c2", "c3"]
+    first, unchanged, counts = rescore(ids, TEXTS)
+    assert counts == {"fresh": 0, "reused": 0, "scored": 3} and not any(unchanged)
+    assert store.rows == 3
+    assert categories(first) == categories(serve_model.predict_complaints(TEXTS))
+
+    again, unchanged, counts = rescore(ids, TEXTS)
+    assert counts == {"fresh": 3, "reused": 0, "scored": 0} and all(unchanged)
+    assert again == first
+
+
+def test_edited_text_is_scored_again(store):
+    rescore(["c1", "c2"], TEXTS[:2])
+    results, unchanged, counts = rescore(["c1", "c2"], [TEXTS[0], TEXTS[2]])
+    assert counts == {"fresh": 1, "reused": 0, "scored": 1}
+    assert unchanged == [True, False]
+    assert store.rows == 2
+
+
+def test_new_model_version_reuses_stored_vectors(store, monkeypatch):
+    first, _, _ = rescore(["c1", "c2"], TEXTS[:2])
+    monkeypatch.setattr(serve_model, "scoring_version", lambda model=None: "retrained")
+    results, unchanged, counts = rescore(["c1", "c2"], TEXTS[:2])
+    assert counts == {"fresh": 0, "reused": 2, "scored": 0} and not any(unchanged)
+    assert categories(results) == categories(first)
+    for new, old in zip(results, first):
+        assert new["confidence"] == pytest.approx(old["confidence"], abs=1e-4)
+    assert rescore(["c1", "c2"], TEXTS[:2])[2]["fresh"] == 2
+
+
+def test_rows_without_id_are_not_stored(store):
+    _, unchanged, counts = rescore([None, "c1"], TEXTS[:2])
+    assert counts["scored"] == 2 and store.rows == 1
+    assert rescore([None, "c1"], TEXTS[:2])[2] == {"fresh": 1, "reused": 0, "scored": 1}
+
+
+def test_prune(store):
+    rescore(["c1", "c2", "c3"], TEXTS)
+    assert prediction_store.prune(ids=["c1", "missing"]) == 1
+    assert store.rows == 2
+    store.conn.execute("UPDATE predictions SET vectorizer_id = 'old' WHERE id = 'c2'")
+    assert prediction_store.prune(stale=True) == 1
+    version = serve_model.scoring_version()
+    assert prediction_store.prune(model_versions=[version]) == 1
+    assert store.rows == 0 == store.conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+
+def test_rows_are_kept_per_model_key(store):
+    rescore(["c1"], TEXTS[:1])
+    before = outcomes()
+    _, unchanged = prediction_store.rescore(["c1"], TEXTS[:1], model_key="district/a")
+    assert unchanged == [False] and outcomes()["scored"] == before["scored"] + 1
+    assert store.rows == 2
+    assert rescore(["c1"], TEXTS[:1])[1] == [True]
+    assert prediction_store.prune(ids=["c1"]) == 2
+
+
+def test_store_without_model_keys_is_migrated(tmp_path):
+    path = tmp_path / "old.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE predictions (id TEXT PRIMARY KEY, text_hash TEXT NOT NULL, model_version TEXT NOT NULL, "
+        "vectorizer_id TEXT NOT NULL, prediction TEXT NOT NULL, n_features INTEGER NOT NULL, "
+        "vec_indices BLOB NOT NULL, vec_data BLOB NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO predictions VALUES ('c1', 'h', 'v1', 'vec', '{}', 4, x'', x'', 0)")
+    conn.commit()
+    conn.close()
+
+    store = prediction_store.PredictionStore(path)
+    assert store.rows == 1
+    assert set(store.lookup(["c1"])) == {"c1"} and store.lookup(["c1"], "district/a") == {}
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for offline bulk scoring (serve_model.py --bulk)
+Run with: python -m pytest test_serve_model.py
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+import serve_model
+
+TEXTS = [
+    "Huge pothole on the main road near the bus stand",
+    "Street light not working for a week",
+    "Garbage not collected from our street",
+    "Drain overflowing after the rain",
+    "Water supply cut since two days",
+]
+
+
+@pytest.fixture
+def complaints():
+    return pd.DataFrame({"complaint_id": [f"c{i}" for i in range(len(TEXTS))], "description": TEXTS})
+
+
+def expected_categories(texts):
+    return [r["dominant_category"] for r in serve_model.predict_complaints(texts)]
+
+
+def test_csv_to_jsonl_keeps_order_and_columns(tmp_path, complaints):
+    complaints.to_csv(tmp_path / "in.csv", index=False)
+    rows = serve_model.bulk_score(tmp_path / "in.csv", tmp_path / "out.jsonl", workers=2, chunk_size=2)
+    assert rows == len(TEXTS)
+
+    out = [json.loads(line) for line in (tmp_path / "out.jsonl").read_text().splitlines()]
+    assert [r["complaint_id"] for r in out] == list(complaints["complaint_id"])
+    assert [r["category"] for r in out] == expected_categories(TEXTS)
+    for r in out:
+        assert r["priority"] in ("high", "medium", "low")
+        assert sum(r[f"prob_{c}"] for c in serve_model.category_cols) > 0
+        assert r[f"prob_{r['category']}"] == pytest.approx(r["confidence"], abs=1e-3)
+
+
+def test_jsonl_to_csv_with_another_text_column(tmp_path, complaints):
+    complaints = complaints.rename(columns={"description": "text"})
+    complaints.loc[2, "text"] = None
+    complaints.to_json(tmp_path / "in.jsonl", orient="records", lines=True)
+    serve_model.bulk_score(tmp_path / "in.jsonl", tmp_path / "out.csv", text_column="text",
+                           workers=1, chunk_size=3)
+    out = pd.read_csv(tmp_path / "out.csv")
+    assert list(out["complaint_id"]) == list(complaints["complaint_id"])
+    # A missing text is scored as empty rather than failing the chunk
+    assert list(out["category"]) == expected_categories(TEXTS[:2] + [""] + TEXTS[3:])
+
+
+def test_missing_column_and_unknown_format_are_rejected(tmp_path, complaints):
+    complaints.to_csv(tmp_path / "in.csv", index=False)
+    with pytest.raises(SystemExit, match="Column 'body' not found"):
+        serve_model.bulk_score(tmp_path / "in.csv", tmp_path / "out.csv", text_column="body", workers=1)
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        serve_model.bulk_score(tmp_path / "in.csv", tmp_path / "out.xlsx", workers=1)
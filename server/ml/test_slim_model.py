@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for feature pruning and size selection (slim_model.py)
+Run with: python -m pytest test_slim_model.py
+"""
+
+import numpy as np
+
+import slim_model
+
+TEXTS = [
+    "huge pothole on the main road",
+    "pothole near the bus stand road",
+    "garbage not collected from the street",
+    "garbage dumped near the school street",
+    "street light not working at night",
+    "no street light on the main road at night",
+]
+
+
+def row(size, n_features, micro_f1, priority_accuracy, median_ms=1.0, loaded_bytes=1000):
+    return {
+        'size': size, 'n_features': n_features, 'micro_f1': micro_f1, 'priority_accuracy': priority_accuracy,
+        'latency': {'single': {'median_ms': median_ms}}, 'memory': {'loaded_bytes': loaded_bytes},
+    }
+
+
+def test_parse_sizes_always_includes_full():
+    assert slim_model.parse_sizes("500, 2000") == [500, 2000, 'full']
+    assert slim_model.parse_sizes("full,100") == ['full', 100]
+
+
+def test_top_vocabularies_keeps_the_heaviest_features():
+    names = [('word', 'road'), ('word', 'light'), ('char', 'oad'), ('char', 'lig')]
+    importance = np.array([0.9, 0.1, 0.5, 0.7])
+    assert slim_model.top_vocabularies(names, importance, 2) == {'word': ['road'], 'char': ['lig']}
+    assert slim_model.top_vocabularies(names, importance, 1) == {'word': ['road'], 'char': []}
+
+
+def test_slim_vectorizer_uses_only_the_given_terms():
+    tfidf = slim_model.build_slim_tfidf({'word': ['road', 'garbage', 'street light'], 'char': []})
+    X = tfidf.fit_transform(TEXTS)
+    assert X.shape[1] == 3
+    assert slim_model.feature_names(tfidf) == [('word', 'road'), ('word', 'garbage'), ('word', 'street light')]
+
+
+def test_choose_size_picks_the_smallest_within_tolerance():
+    rows = [row(500, 500, 0.80, 0.70), row(2000, 2000, 0.845, 0.71), row('full', 8000, 0.85, 0.71)]
+    assert slim_model.choose_size(rows, 0.01)['size'] == 2000
+    assert slim_model.choose_size(rows, 0.1)['size'] == 500
+    # Priority accuracy must hold too
+    rows[1]['priority_accuracy'] = 0.6
+    assert slim_model.choose_size(rows, 0.01)['size'] == 'full'
+
+
+def test_pareto_front_drops_dominated_sizes():
+    rows = slim_model.pareto_front([
+        row(500, 500, 0.80, None, median_ms=1.0, loaded_bytes=100),
+        row(1000, 1000, 0.79, None, median_ms=2.0, loaded_bytes=200),
+        row('full', 8000, 0.85, None, median_ms=3.0, loaded_bytes=900),
+    ])
+    assert [r['pareto'] for r in rows] == [True, False, True]
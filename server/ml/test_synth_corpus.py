@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for the synthetic complaint corpus generator (synth_corpus.py)
+Run with: python -m pytest test_synth_corpus.py
+"""
+
+import pandas as pd
+import pytest
+
+import synth_corpus
+
+
+@pytest.fixture(scope="module")
+def generator():
+    return synth_corpus.CorpusGenerator(seed=7)
+
+
+def test_same_seed_gives_same_corpus(tmp_path):
+    synth_corpus.write_corpus(tmp_path / "a.csv", 250, seed=3, chunk_size=100, quiet=True)
+    synth_corpus.write_corpus(tmp_path / "b.csv", 250, seed=3, chunk_size=100, quiet=True)
+    synth_corpus.write_corpus(tmp_path / "c.csv", 250, seed=4, chunk_size=100, quiet=True)
+    a, b, c = (pd.read_csv(tmp_path / name) for name in ("a.csv", "b.csv", "c.csv"))
+    pd.testing.assert_frame_equal(a, b)
+    assert not a["description"].equals(c["description"])
+
+
+def test_chunks_add_up_to_the_requested_rows(tmp_path, generator):
+    synth_corpus.write_corpus(tmp_path / "out.csv", 250, chunk_size=100, quiet=True)
+    out = pd.read_csv(tmp_path / "out.csv")
+    # One header, written by the first chunk only
+    assert len(out) == 250
+    assert list(out.columns) == ["description"] + generator.category_cols + ["priority"]
+
+
+def test_rows_keep_the_labels_of_their_seed_complaints(generator):
+    df = generator.chunk(500)
+    labels = df[generator.category_cols]
+    assert set(labels.values.ravel()) <= {0, 1}
+    assert (labels.sum(axis=1) >= 1).all()
+    seeds = {tuple(row) for row in generator.labels}
+    single = synth_corpus.CorpusGenerator(seed=7, multi_label=0.0).chunk(200)
+    assert all(tuple(row) in seeds for row in single[generator.category_cols].values)
+    assert set(df["priority"]) <= {"High", "Medium", "Low"}
+    assert df["description"].str.len().gt(0).all()
+
+
+def test_multi_label_rows_combine_two_complaints():
+    single = synth_corpus.CorpusGenerator(seed=1, multi_label=0.0).chunk(300)
+    combined = synth_corpus.CorpusGenerator(seed=1, multi_label=1.0).chunk(300)
+    cols = [c for c in single.columns if c not in ("description", "priority")]
+    assert combined[cols].sum(axis=1).mean() > single[cols].sum(axis=1).mean()
+
+
+def test_unknown_output_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        synth_corpus.write_corpus(tmp_path / "out.json", 10, quiet=True)
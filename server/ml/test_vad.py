@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for the energy-based voice activity detector (vad.py)
+Run with: python -m pytest test_vad.py
+"""
+
+import numpy as np
+
+import vad
+
+SR = vad.SAMPLE_RATE
+
+
+def noise(seconds, level_db, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, 10 ** (level_db / 20), int(seconds * SR)).astype(np.float32)
+
+
+def tone(seconds, level_db, freq=440):
+    t = np.arange(int(seconds * SR)) / SR
+    return (np.sqrt(2) * 10 ** (level_db / 20) * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def seconds(segments):
+    return [(start / SR, end / SR) for start, end in segments]
+
+
+def test_tone_burst_in_steady_noise_is_trimmed():
+    # Fan/traffic-like background at -40 dBFS, 2 s of "speech" 15 dB above it
+    audio = noise(10, -40)
+    audio[4 * SR:6 * SR] += tone(2, -25)
+    segments = seconds(vad.speech_segments(audio))
+    assert len(segments) == 1
+    start, end = segments[0]
+    assert 3.5 <= start <= 4.0 and 6.0 <= end <= 6.5
+
+
+def test_tone_burst_in_near_silence_is_trimmed():
+    audio = noise(10, -70)
+    audio[2 * SR:3 * SR] += tone(1, -20)
+    [(start, end)] = seconds(vad.speech_segments(audio))
+    assert 1.5 <= start <= 2.0 and 3.0 <= end <= 3.5
+
+
+def test_speech_without_pauses_is_kept():
+    # Syllable-like loudness changes (up to 15 dB) but no pause: nothing to trim
+    audio = tone(8, -20)
+    envelope = 10 ** (-15 * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * np.arange(len(audio)) / SR)) / 20)
+    audio = (audio * envelope).astype(np.float32) + noise(8, -60)
+    [(start, end)] = seconds(vad.speech_segments(audio))
+    assert start == 0 and end == 8
+
+
+def test_noise_only_has_no_long_speech():
+    segments = seconds(vad.speech_segments(noise(10, -40)))
+    assert sum(end - start for start, end in segments) < 2
+
+
+def test_pack_segments_respects_whisper_window():
+    audio = tone(70, -20)
+    chunks = vad.pack_segments(audio, [(0, len(audio))])
+    assert len(chunks) == 3
+    assert all(len(chunk) <= vad.MAX_CHUNK_S * SR for chunk in chunks)
+    assert sum(len(chunk) for chunk in chunks) == len(audio)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for keyframe video classification (video_analysis.py)
+Run with: python -m pytest test_video_analysis.py
+"""
+
+import numpy as np
+import pytest
+
+import video_analysis
+
+cv2 = pytest.importorskip("cv2")
+
+FPS = 10
+RED, GREEN, BLUE = (40, 40, 200), (40, 200, 40), (200, 40, 40)
+
+
+def write_clip(path, scenes):
+    """One second per entry of `scenes` (BGR colours), with a moving dot so frames are not identical."""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), FPS, (160, 120))
+    for colour in scenes:
+        for f in range(FPS):
+            frame = np.full((120, 160, 3), colour, np.uint8)
+            cv2.circle(frame, (20 + f * 10, 60), 8, (255, 255, 255), -1)
+            writer.write(frame)
+    writer.release()
+    return str(path)
+
+
+def test_static_clip_classifies_one_frame_and_exits_early(tmp_path):
+    result = video_analysis.analyze_video_frames(write_clip(tmp_path / "static.mp4", [RED] * 10))
+    assert result["keyframes"] == 1
+    assert result["early_exit"] and result["frames_analyzed"] < 10
+    # Seeks past the unchanged scene instead of decoding every second
+    assert 2 <= result["frames_decoded"] <= 3
+    frames = result["frame_predictions"]
+    assert len(frames) == result["frames_analyzed"]
+    assert [f["second"] for f in frames] == list(range(len(frames)))
+    assert [f["keyframe"] for f in frames] == [True] + [False] * (len(frames) - 1)
+
+
+def test_cut_back_to_an_earlier_scene_is_not_classified_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_analysis, "VIDEO_EARLY_EXIT", False)
+    clip = write_clip(tmp_path / "cuts.mp4", [RED, RED, GREEN, GREEN, RED, RED, BLUE, BLUE, GREEN, GREEN])
+    result = video_analysis.analyze_video_frames(clip)
+    assert result["frames_analyzed"] == 10 and not result["early_exit"]
+    assert result["keyframes"] == 3
+    assert result["duplicate_frames"] == 2
+    assert [f["second"] for f in result["frame_predictions"] if f["keyframe"]] == [0, 2, 6]
+    assert [f["second"] for f in result["frame_predictions"]] == list(range(10))
+
+
+def test_scene_change_inside_a_skip_is_found(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_analysis, "VIDEO_EARLY_EXIT", False)
+    clip = write_clip(tmp_path / "late_cut.mp4", [RED] * 5 + [GREEN] * 5)
+    result = video_analysis.analyze_video_frames(clip)
+    frames = result["frame_predictions"]
+    assert [f["second"] for f in frames if f["keyframe"]] == [0, 5]
+    assert len({f["category"] for f in frames[:5]}) == 1
+    assert frames[5]["category"] == frames[9]["category"]
+    assert result["frames_decoded"] < 10
+
+
+def test_max_skip_of_one_decodes_every_second(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_analysis, "VIDEO_EARLY_EXIT", False)
+    monkeypatch.setattr(video_analysis, "VIDEO_MAX_SKIP", 1)
+    result = video_analysis.analyze_video_frames(write_clip(tmp_path / "static.mp4", [RED] * 10))
+    assert result["frames_decoded"] == result["frames_analyzed"] == 10
+
+
+def test_vote_is_decided():
+    assert video_analysis.vote_is_decided({"roads": 4}, remaining=3)
+    assert not video_analysis.vote_is_decided({"roads": 4, "water": 1}, remaining=3)
+    assert video_analysis.vote_is_decided({"roads": 5, "water": 1}, remaining=3)
+
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Tests for the video fingerprint index (video_index.py)
+Run with: python -m pytest test_video_index.py
+"""
+
+import pytest
+
+import video_analysis
+import video_index
+
+pytest.importorskip("cv2")
+
+from test_video_analysis import GREEN, RED, write_clip
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_index, "ENABLED", True)
+    monkeypatch.setattr(video_index, "_index", video_index.VideoIndex(tmp_path / "index.sqlite3"))
+    return video_index._index
+
+
+def test_index_answers_same_file_and_re_encoded_copy(tmp_path, index):
+    clip = write_clip(tmp_path / "clip.mp4", [RED] * 5 + [GREEN] * 5)
+
+    first = video_analysis.analyze_video_frames(clip, content_hash="a" * 64)
+    assert "fingerprint_match" not in first
+    exact = video_analysis.analyze_video_frames(clip, content_hash="a" * 64)
+    assert exact == dict(first, fingerprint_match="exact")
+    # Different bytes, same frames: answered once the fingerprint frames are decoded
+    similar = video_analysis.analyze_video_frames(clip, content_hash="b" * 64)
+    assert similar == dict(first, fingerprint_match="similar")
+
+
+def test_fingerprint_does_not_stop_the_skip_ahead(tmp_path, index):
+    clip = write_clip(tmp_path / "static.mp4", [RED] * 10)
+    first = video_analysis.analyze_video_frames(clip, content_hash="a" * 64)
+    assert first["frames_decoded"] == 3 and first["early_exit"]
+    assert video_analysis.analyze_video_frames(clip, content_hash="b" * 64)["fingerprint_match"] == "similar"
+
+
+def test_other_clip_is_not_matched(tmp_path, index):
+    video_analysis.analyze_video_frames(write_clip(tmp_path / "red.mp4", [RED] * 10), content_hash="a" * 64)
+    other = video_analysis.analyze_video_frames(write_clip(tmp_path / "green.mp4", [GREEN] * 10), content_hash="b" * 64)
+    assert "fingerprint_match" not in other
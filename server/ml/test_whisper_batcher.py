@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Tests for cross-request Whisper encoder batching (whisper_batcher.py)
+Run with: python -m pytest test_whisper_batcher.py
+
+The scheduling tests replace BatchScheduler._run, so they need neither torch
+nor Whisper. The encode/decode test needs torch and fakes the Whisper model.
+"""
+
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import cancellation
+import whisper_batcher
+
+
+class RecordingScheduler(whisper_batcher.BatchScheduler):
+    """Answers each job with its own chunks instead of running Whisper; `gate` holds batches back."""
+
+    def __init__(self, **kwargs):
+        super().__init__("test", pool=None, **kwargs)
+        self.batch_sizes = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fail = None
+
+    def _run(self, batch):
+        self.gate.wait()
+        if self.fail is not None:
+            raise self.fail
+        self.batch_sizes.append([len(job.chunks) for job in batch])
+        for job in batch:
+            job.result = {"text": " ".join(job.chunks), "language": job.language}
+            job.done.set()
+
+
+def submit_all(scheduler, jobs, **kwargs):
+    """submit() each chunk list from its own thread; return results in job order."""
+    results = [None] * len(jobs)
+
+    def run(i):
+        try:
+            results[i] = scheduler.submit(jobs[i], **kwargs)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(jobs))]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_requests_share_one_batch():
+    scheduler = RecordingScheduler(max_batch=8, max_wait_ms=200)
+    results = submit_all(scheduler, [["a"], ["b", "c"], ["d"]], language="en")
+    assert scheduler.batch_sizes == [[1, 2, 1]]
+    assert [r["text"] for r in results] == ["a", "b c", "d"]
+    assert scheduler.stats()["pending"] == 0
+
+
+def test_batches_are_capped_at_max_batch_windows():
+    scheduler = RecordingScheduler(max_batch=2, max_wait_ms=200)
+    scheduler.gate.clear()
+    # Hold the first batch so the others queue up behind it
+    first = threading.Thread(target=scheduler.submit, args=(["x"],))
+    first.start()
+    time.sleep(0.3)
+    release = threading.Timer(0.1, scheduler.gate.set)
+    release.start()
+    submit_all(scheduler, [["a"], ["b"], ["c"]])
+    first.join()
+    assert scheduler.batch_sizes == [[1], [1, 1], [1]]
+
+
+def test_full_batch_does_not_wait():
+    scheduler = RecordingScheduler(max_batch=2, max_wait_ms=5000)
+    start = time.perf_counter()
+    submit_all(scheduler, [["a"], ["b"]])
+    assert time.perf_counter() - start < 1
+    assert scheduler.batch_sizes == [[1, 1]]
+
+
+def test_cancelled_job_leaves_the_queue():
+    scheduler = RecordingScheduler(max_batch=1, max_wait_ms=0)
+    scheduler.gate.clear()
+    busy = threading.Thread(target=scheduler.submit, args=(["x"],))
+    busy.start()
+    time.sleep(0.1)
+    token = cancellation.CancelToken()
+    threading.Timer(0.1, token.cancel, args=("client disconnected",)).start()
+    with pytest.raises(cancellation.Cancelled):
+        scheduler.submit(["a"], token=token)
+    assert scheduler.stats()["pending"] == 0
+    scheduler.gate.set()
+    busy.join()
+    assert scheduler.batch_sizes == [[1]]
+
+
+def test_batch_failure_reaches_every_caller():
+    scheduler = RecordingScheduler(max_batch=8, max_wait_ms=100)
+    scheduler.fail = RuntimeError("encoder blew up")
+    results = submit_all(scheduler, [["a"], ["b"]])
+    assert all(isinstance(r, RuntimeError) for r in results)
+    # The scheduler thread survives and serves the next batch
+    scheduler.fail = None
+    assert scheduler.submit(["c"])["text"] == "c"
+
+
+# ========== Encode / decode with a fake Whisper model ==========
+@pytest.fixture
+def fake_whisper(monkeypatch):
+    torch = pytest.importorskip("torch")
+
+    class Model:
+        device = "cpu"
+        dims = types.SimpleNamespace(n_mels=80)
+
+        def __init__(self):
+            self.encoded = []
+
+        def embed_audio(self, mel):
+            self.encoded.append(mel.shape[0])
+            return mel
+
+        def detect_language(self, features):
+            # Language from the first sample of the clip: > 0 is confidently English
+            english = float(features[0, 0, 0]) > 0
+            return None, [{"en": 0.95, "hi": 0.05} if english else {"en": 0.4, "hi": 0.6}]
+
+    module = types.SimpleNamespace(
+        pad_or_trim=lambda chunk: chunk,
+        log_mel_spectrogram=lambda chunk, n_mels: torch.full((n_mels, 4), float(chunk[0])),
+        DecodingOptions=lambda **options: options,
+        decode=lambda model, features, options: [
+            types.SimpleNamespace(text=f" {options['language']}:{float(f[0, 0]):.0f} ") for f in features
+        ],
+    )
+    monkeypatch.setitem(sys.modules, "whisper", module)
+    model = Model()
+
+    class Pool:
+        def acquire(self, tier):
+            class Held:
+                def __enter__(self):
+                    return model
+
+                def __exit__(self, *exc):
+                    return False
+            return Held()
+
+    return model, Pool()
+
+
+def test_clips_are_encoded_together_and_decoded_separately(fake_whisper):
+    model, pool = fake_whisper
+    scheduler = whisper_batcher.BatchScheduler("base", pool, max_batch=8, max_wait_ms=200)
+    results = submit_all(scheduler, [[[1.0], [2.0]], [[-3.0]]], min_confidence=0.8)
+    assert model.encoded == [3]
+    assert results[0]["text"] == "en:1 en:2" and results[0]["language"] == "en"
+    assert results[0]["batch_windows"] == 3
+    # Not confident enough: handed back for a bigger tier instead of being decoded
+    assert results[1]["escalate"] and results[1]["language"] == "hi"
+    stats = scheduler.stats()
+    assert stats["batches"] == 1 and stats["jobs"] == 2 and stats["avg_windows_per_batch"] == 3
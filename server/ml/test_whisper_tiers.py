@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for adaptive Whisper tier choice and the model pool (whisper_tiers.py)
+Run with: python -m pytest test_whisper_tiers.py
+
+Whisper itself is replaced by a fake module: models are loaded by name and
+report the tier's estimated size.
+"""
+
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import whisper_tiers
+
+
+class FakeParameter:
+    def __init__(self, mb):
+        self.mb = mb
+
+    def numel(self):
+        return int(self.mb * 1e6 / 4)
+
+    def element_size(self):
+        return 4
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+    def parameters(self):
+        return [FakeParameter(whisper_tiers.MODEL_SIZE_MB[self.name])]
+
+
+@pytest.fixture
+def whisper(monkeypatch):
+    """Fake whisper module; `loads` lists the tiers loaded, `delay` slows loads, `fail` breaks them."""
+    module = types.SimpleNamespace(loads=[], delay=0.0, fail=False)
+
+    def load_model(name):
+        time.sleep(module.delay)
+        if module.fail:
+            raise RuntimeError(f"cannot load {name}")
+        module.loads.append(name)
+        return FakeModel(name)
+
+    module.load_model = load_model
+    monkeypatch.setitem(sys.modules, "whisper", module)
+    monkeypatch.setattr(whisper_tiers, "TIERS", ["tiny", "base", "small"])
+    monkeypatch.setattr(whisper_tiers, "DEFAULT_TIER", "base")
+    monkeypatch.setattr(whisper_tiers, "TIERING", True)
+    monkeypatch.setattr(whisper_tiers, "SHORT_CLIP_SECONDS", 30)
+    monkeypatch.setattr(whisper_tiers, "BUSY_QUEUE_DEPTH", 4)
+    return module
+
+
+def test_tier_follows_clip_length_and_load(whisper):
+    assert whisper_tiers.choose_tier(12, depth=0)[0] == "tiny"
+    assert whisper_tiers.choose_tier(120, depth=0) == ("base", "long clip (120.0s)")
+    assert whisper_tiers.choose_tier(120, depth=4) == ("tiny", "busy (4 in flight)")
+
+
+def test_tiering_disabled_always_uses_the_default(whisper, monkeypatch):
+    monkeypatch.setattr(whisper_tiers, "TIERING", False)
+    assert whisper_tiers.choose_tier(5, depth=10) == ("base", "tiering disabled")
+
+
+def test_escalation_is_capped_by_load_and_memory(whisper, monkeypatch):
+    monkeypatch.setattr(whisper_tiers, "pool", whisper_tiers.ModelPool(budget_mb=2000))
+    assert whisper_tiers.escalate("tiny", depth=0) == "base"
+    assert whisper_tiers.escalate("base", depth=0) == "small"
+    assert whisper_tiers.escalate("small", depth=0) is None
+    # Busy: never past the default tier
+    assert whisper_tiers.escalate("base", depth=4) is None
+    assert whisper_tiers.escalate("tiny", depth=4) == "base"
+    # "small" (970 MB) fits a 1200 MB budget alone, but not next to a pinned "base" (290 MB)
+    monkeypatch.setattr(whisper_tiers, "pool", whisper_tiers.ModelPool(budget_mb=1200))
+    assert whisper_tiers.escalate("base", depth=0) == "small"
+    with whisper_tiers.pool.acquire("base"):
+        assert whisper_tiers.pool.fits("tiny") and not whisper_tiers.pool.fits("small")
+        assert whisper_tiers.escalate("base", depth=0) is None
+
+
+def test_idle_models_are_evicted_least_recently_used_first(whisper):
+    pool = whisper_tiers.ModelPool(budget_mb=1000)
+    for name in ("tiny", "base", "tiny", "small"):
+        with pool.acquire(name) as model:
+            assert model.name == name
+    stats = pool.stats()
+    assert list(stats["loaded"]) == ["small"]
+    assert stats["loads"] == 3 and stats["evictions"] == 2
+    assert stats["used_mb"] <= pool.budget_mb
+
+
+def test_model_in_use_is_not_evicted(whisper):
+    pool = whisper_tiers.ModelPool(budget_mb=1000)
+    with pool.acquire("base"):
+        with pool.acquire("small"):
+            # Over budget rather than pulling a model out from under a running decode
+            assert set(pool.stats()["loaded"]) == {"base", "small"}
+        assert pool.stats()["in_use"] == {"base": 1}
+    assert pool.stats()["in_use"] == {}
+
+
+def test_concurrent_requests_share_one_load(whisper):
+    whisper.delay = 0.1
+    pool = whisper_tiers.ModelPool(budget_mb=1000)
+    seen = []
+
+    def use():
+        with pool.acquire("base") as model:
+            seen.append(model)
+
+    threads = [threading.Thread(target=use) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert whisper.loads == ["base"] and len({id(m) for m in seen}) == 1
+
+
+def test_failed_load_is_reported_and_retried(whisper):
+    pool = whisper_tiers.ModelPool(budget_mb=1000)
+    whisper.fail = True
+    with pytest.raises(RuntimeError, match="cannot load base"):
+        with pool.acquire("base"):
+            pass
+    stats = pool.stats()
+    assert stats["loading"] == [] and stats["in_use"] == {} and pool.reserved_mb == 0
+    whisper.fail = False
+    with pool.acquire("base") as model:
+        assert model.name == "base"
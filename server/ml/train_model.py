@@ -2,7 +2,11 @@
 # FILE: server/ml/train_model.py
 # Improved training pipeline for GrievAssist complaint classification
 # -----------------------------------------------------------------------------
+# Run as a script to train and save all artifacts. The data preparation and
+# model builders are importable for tools that retrain variants
+# (slim_model.py, cascade_model.py, benchmarks).
 import json
+import os
 from pathlib import Path
 import joblib
 import pandas as pd
@@ -30,26 +34,34 @@ warnings.filterwarnings('ignore')
 # Paths
 # ---------------------------------------------------------------------------
 BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR = BASE_DIR / 'data'
-
-# Load ALL available datasets and merge them
-datasets = []
-for csv_name in ['complaints_dataset.csv', 'complaints_labeled.csv']:
-    csv_path = DATA_DIR / csv_name
-    if csv_path.exists():
-        print(f"  Loading {csv_name}...")
-        datasets.append(pd.read_csv(csv_path))
-
-if not datasets:
-    raise FileNotFoundError(
-        f"No dataset found. Place complaints_dataset.csv or complaints_labeled.csv in {DATA_DIR}"
-    )
+# ML_DATA_DIR trains on another dataset folder (e.g. one district's complaints)
+DATA_DIR = Path(os.environ.get('ML_DATA_DIR', BASE_DIR / 'data'))
+DATASET_FILES = ['complaints_dataset.csv', 'complaints_labeled.csv']
+
+
+def load_datasets(max_rows=None):
+    """Load ALL available datasets and merge them."""
+    datasets = []
+    for csv_name in DATASET_FILES:
+        csv_path = DATA_DIR / csv_name
+        if csv_path.exists():
+            print(f"  Loading {csv_name}...")
+            datasets.append(pd.read_csv(csv_path))
+
+    if not datasets:
+        raise FileNotFoundError(
+            f"No dataset found. Place complaints_dataset.csv or complaints_labeled.csv in {DATA_DIR}"
+        )
 
-df = pd.concat(datasets, ignore_index=True)
-print(f"Combined dataset: {len(df)} samples")
+    df = pd.concat(datasets, ignore_index=True)
+    print(f"Combined dataset: {len(df)} samples")
+
+    # Optional row cap, used to train small fixture models for benchmarks
+    if max_rows and len(df) > max_rows:
+        df = df.sample(n=max_rows, random_state=42).reset_index(drop=True)
+        print(f"Sampled {max_rows} rows (ML_TRAIN_MAX_ROWS)")
+    return df
 
-OUT_DIR = BASE_DIR / 'models'
-OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 # ---------------------------------------------------------------------------
 # Text Preprocessing (enhanced)
@@ -84,62 +96,70 @@ def clean_text_no_stopwords(text: str) -> str:
 # ---------------------------------------------------------------------------
 # Data Validation & Cleaning
 # ---------------------------------------------------------------------------
-if 'description' not in df.columns:
-    raise ValueError('CSV must include a "description" column')
-
-# Identify category columns
-reserved = {'description', 'priority'}
-category_cols = [c for c in df.columns if c not in reserved]
-if len(category_cols) == 0:
-    if 'category' in df.columns:
-        df['category'] = df['category'].astype(str).str.lower().str.strip()
-        unique = sorted(df['category'].unique())
-        for u in unique:
-            df[u] = (df['category'] == u).astype(int)
-        category_cols = unique
-    else:
-        raise ValueError('No category columns detected.')
-
-print(f'Category columns: {category_cols}')
-
-# Drop rows with empty descriptions
-df = df.dropna(subset=['description']).reset_index(drop=True)
-
-# Remove exact duplicate descriptions (keep first)
-before_dedup = len(df)
-df = df.drop_duplicates(subset=['description'], keep='first').reset_index(drop=True)
-print(f'Removed {before_dedup - len(df)} duplicate descriptions. Remaining: {len(df)}')
-
-# Clean descriptions
-df['description_clean'] = df['description'].astype(str).apply(clean_text)
-df['description_features'] = df['description'].astype(str).apply(clean_text_no_stopwords)
+def detect_category_columns(df):
+    """Return (df, category_cols), one-hot encoding a 'category' column if needed."""
+    if 'description' not in df.columns:
+        raise ValueError('CSV must include a "description" column')
+
+    # Identify category columns
+    reserved = {'description', 'priority'}
+    category_cols = [c for c in df.columns if c not in reserved]
+    if len(category_cols) == 0:
+        if 'category' in df.columns:
+            df['category'] = df['category'].astype(str).str.lower().str.strip()
+            unique = sorted(df['category'].unique())
+            for u in unique:
+                df[u] = (df['category'] == u).astype(int)
+            category_cols = unique
+        else:
+            raise ValueError('No category columns detected.')
+
+    print(f'Category columns: {category_cols}')
+    return df, category_cols
+
+
+def clean_dataset(df):
+    """Drop empty/duplicate descriptions and add cleaned text columns."""
+    # Drop rows with empty descriptions
+    df = df.dropna(subset=['description']).reset_index(drop=True)
+
+    # Remove exact duplicate descriptions (keep first)
+    before_dedup = len(df)
+    df = df.drop_duplicates(subset=['description'], keep='first').reset_index(drop=True)
+    print(f'Removed {before_dedup - len(df)} duplicate descriptions. Remaining: {len(df)}')
+
+    # Clean descriptions
+    df['description_clean'] = df['description'].astype(str).apply(clean_text)
+    df['description_features'] = df['description'].astype(str).apply(clean_text_no_stopwords)
+    return df
 
 # ---------------------------------------------------------------------------
 # Data Augmentation: generate paraphrased variants
 # ---------------------------------------------------------------------------
+# Synonym map for complaint domain
+SYNONYMS = {
+    'road': ['roadway', 'highway', 'street', 'path'],
+    'pothole': ['crater', 'pit', 'hole', 'depression'],
+    'water': ['water supply', 'drinking water', 'tap water'],
+    'garbage': ['waste', 'trash', 'rubbish', 'litter'],
+    'fire': ['blaze', 'flames', 'inferno', 'burning'],
+    'drain': ['drainage', 'sewer', 'gutter', 'channel'],
+    'flood': ['waterlogging', 'inundation', 'submersion'],
+    'light': ['lamp', 'illumination', 'streetlight', 'bulb'],
+    'traffic': ['congestion', 'gridlock', 'bottleneck', 'jam'],
+    'broken': ['damaged', 'cracked', 'shattered', 'deteriorated'],
+    'leak': ['leaking', 'seeping', 'dripping', 'oozing'],
+    'blocked': ['clogged', 'choked', 'obstructed', 'jammed'],
+    'dangerous': ['hazardous', 'risky', 'unsafe', 'perilous'],
+    'stench': ['odour', 'smell', 'foul odor', 'stink'],
+    'dark': ['unlit', 'pitch black', 'no visibility', 'dim'],
+    'overflow': ['overflowing', 'spilling', 'flooding over'],
+}
+
 def augment_data(df, category_cols, n_augments=2):
     """Simple data augmentation by word reordering and synonym injection."""
     augmented_rows = []
-
-    # Synonym map for complaint domain
-    synonyms = {
-        'road': ['roadway', 'highway', 'street', 'path'],
-        'pothole': ['crater', 'pit', 'hole', 'depression'],
-        'water': ['water supply', 'drinking water', 'tap water'],
-        'garbage': ['waste', 'trash', 'rubbish', 'litter'],
-        'fire': ['blaze', 'flames', 'inferno', 'burning'],
-        'drain': ['drainage', 'sewer', 'gutter', 'channel'],
-        'flood': ['waterlogging', 'inundation', 'submersion'],
-        'light': ['lamp', 'illumination', 'streetlight', 'bulb'],
-        'traffic': ['congestion', 'gridlock', 'bottleneck', 'jam'],
-        'broken': ['damaged', 'cracked', 'shattered', 'deteriorated'],
-        'leak': ['leaking', 'seeping', 'dripping', 'oozing'],
-        'blocked': ['clogged', 'choked', 'obstructed', 'jammed'],
-        'dangerous': ['hazardous', 'risky', 'unsafe', 'perilous'],
-        'stench': ['odour', 'smell', 'foul odor', 'stink'],
-        'dark': ['unlit', 'pitch black', 'no visibility', 'dim'],
-        'overflow': ['overflowing', 'spilling', 'flooding over'],
-    }
+    synonyms = SYNONYMS
 
     np.random.seed(42)
     for _, row in df.iterrows():
@@ -173,120 +193,148 @@ def augment_data(df, category_cols, n_augments=2):
         return pd.concat([df, aug_df], ignore_index=True)
     return df
 
-print('\nAugmenting dataset...')
-df = augment_data(df, category_cols, n_augments=2)
-print(f'Total samples after augmentation: {len(df)}')
 
-# ---------------------------------------------------------------------------
-# Build Features: Combined Word + Character n-gram TF-IDF
-# ---------------------------------------------------------------------------
-print('\nBuilding TF-IDF features...')
-
-# Word-level TF-IDF
-word_tfidf = TfidfVectorizer(
-    analyzer='word',
-    ngram_range=(1, 3),        # Capture up to 3-word phrases
-    min_df=2,
-    max_df=0.9,
-    max_features=8000,
-    sublinear_tf=True,         # Apply log normalization
-    strip_accents='unicode',
-)
-
-# Character-level TF-IDF (captures partial word matches, typos)
-char_tfidf = TfidfVectorizer(
-    analyzer='char_wb',
-    ngram_range=(3, 5),
-    min_df=2,
-    max_df=0.9,
-    max_features=5000,
-    sublinear_tf=True,
-    strip_accents='unicode',
-)
+def prepare_training_data(max_rows=None, augment=True):
+    """Load, validate, clean and (unless augment=False) augment the bundled datasets.
 
-# Combine both feature sets
-tfidf = FeatureUnion([
-    ('word', word_tfidf),
-    ('char', char_tfidf),
-], n_jobs=1)
+    Returns (df, category_cols); df carries description_features for TF-IDF.
+    Tools that hold out an evaluation split load with augment=False and augment
+    only their training rows, so no augmented copy of a test text is trained on.
+    """
+    df = load_datasets(max_rows)
+    df, category_cols = detect_category_columns(df)
+    df = clean_dataset(df)
+    if not augment:
+        return df, category_cols
 
-X = df['description_features'].values
-y_multi = df[category_cols].astype(int).values
-
-X_vect = tfidf.fit_transform(X)
-print(f'Feature matrix shape: {X_vect.shape}')
-
-# ---------------------------------------------------------------------------
-# IsolationForest for anomaly/fake detection
-# ---------------------------------------------------------------------------
-print('\nTraining IsolationForest...')
-X_dense_sample = X_vect.toarray()
-iso = IsolationForest(n_estimators=300, contamination=0.02, random_state=42, n_jobs=-1)
-iso.fit(X_dense_sample)
+    print('\nAugmenting dataset...')
+    df = augment_data(df, category_cols, n_augments=2)
+    print(f'Total samples after augmentation: {len(df)}')
+    return df, category_cols
 
 # ---------------------------------------------------------------------------
-# Multi-label Category Classifier
-# ---------------------------------------------------------------------------
-print('\nTraining multi-label category classifier...')
-
-# Use Calibrated LinearSVC (better for text classification than LogisticRegression)
-base_clf = LinearSVC(
-    C=1.0,
-    class_weight='balanced',
-    max_iter=5000,
-    loss='squared_hinge',
-    random_state=42,
-)
-calibrated_clf = CalibratedClassifierCV(base_clf, cv=3, method='sigmoid')
-cat_clf = OneVsRestClassifier(calibrated_clf, n_jobs=-1)
-cat_clf.fit(X_vect, y_multi)
-print('Category classifier trained successfully.')
-
-# ---------------------------------------------------------------------------
-# Evaluation: Stratified split
+# Build Features: Combined Word + Character n-gram TF-IDF
 # ---------------------------------------------------------------------------
-print('\n' + '='*60)
-print('EVALUATION: Category Classification')
-print('='*60)
-
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y_multi, test_size=0.2, random_state=42
-)
-X_test_vect = tfidf.transform(X_test)
-y_pred = cat_clf.predict(X_test_vect)
+def build_tfidf(word_vocabulary=None, char_vocabulary=None):
+    """Word (1-3gram) + char_wb (3-5gram) TF-IDF union.
+
+    Passing fixed vocabularies restricts each half to those terms (used by
+    slim_model.py); sklearn then ignores min_df/max_df/max_features and only
+    learns idf from the training data.
+    """
+    # Word-level TF-IDF
+    word_tfidf = TfidfVectorizer(
+        analyzer='word',
+        ngram_range=(1, 3),        # Capture up to 3-word phrases
+        min_df=2,
+        max_df=0.9,
+        max_features=8000,
+        sublinear_tf=True,         # Apply log normalization
+        strip_accents='unicode',
+        vocabulary=word_vocabulary,
+    )
 
-for i, col in enumerate(category_cols):
-    f1 = f1_score(y_test[:, i], y_pred[:, i], zero_division=0)
-    print(f"  {col:12s} -> F1: {f1:.3f}")
+    # Character-level TF-IDF (captures partial word matches, typos)
+    char_tfidf = TfidfVectorizer(
+        analyzer='char_wb',
+        ngram_range=(3, 5),
+        min_df=2,
+        max_df=0.9,
+        max_features=5000,
+        sublinear_tf=True,
+        strip_accents='unicode',
+        vocabulary=char_vocabulary,
+    )
 
-# Overall metrics
-from sklearn.metrics import hamming_loss
-print(f"\n  Hamming Loss: {hamming_loss(y_test, y_pred):.4f}")
-print(f"  Micro F1:     {f1_score(y_test, y_pred, average='micro', zero_division=0):.3f}")
-print(f"  Macro F1:     {f1_score(y_test, y_pred, average='macro', zero_division=0):.3f}")
+    # Combine both feature sets
+    return FeatureUnion([
+        ('word', word_tfidf),
+        ('char', char_tfidf),
+    ], n_jobs=1)
 
 # ---------------------------------------------------------------------------
-# Priority Classifier (with keyword features)
+# Model builders
 # ---------------------------------------------------------------------------
-has_priority = 'priority' in df.columns
-if has_priority:
-    print('\n' + '='*60)
-    print('TRAINING: Priority Classifier')
-    print('='*60)
-
-    df['priority'] = df['priority'].astype(str).str.lower().str.strip()
-    # Normalize priority values
-    priority_map = {
-        'high': 'high', 'h': 'high', 'critical': 'high', 'urgent': 'high',
-        'medium': 'medium', 'med': 'medium', 'moderate': 'medium', 'm': 'medium',
-        'low': 'low', 'l': 'low', 'minor': 'low',
+def train_isoforest(X_vect):
+    """IsolationForest for anomaly/fake detection."""
+    iso = IsolationForest(n_estimators=300, contamination=0.02, random_state=42, n_jobs=-1)
+    iso.fit(X_vect.toarray())
+    return iso
+
+
+def train_category_model(X_vect, y_multi):
+    """Multi-label category classifier (one calibrated LinearSVC per category)."""
+    # Use Calibrated LinearSVC (better for text classification than LogisticRegression)
+    base_clf = LinearSVC(
+        C=1.0,
+        class_weight='balanced',
+        max_iter=5000,
+        loss='squared_hinge',
+        random_state=42,
+    )
+    calibrated_clf = CalibratedClassifierCV(base_clf, cv=3, method='sigmoid')
+    cat_clf = OneVsRestClassifier(calibrated_clf, n_jobs=-1)
+    cat_clf.fit(X_vect, y_multi)
+    return cat_clf
+
+
+def train_cascade_stage(texts, y_multi, y_priority=None, vocab_size=2000):
+    """Cheap first stage for the serving cascade (see cascade_model.py).
+
+    A word (1-2gram) TF-IDF on a small vocabulary with one logistic
+    regression per category and a multinomial one for priority. Weights are
+    stored as plain arrays, so serving is one sparse-dense product per head.
+    Thresholds are added by cascade_model.py.
+    """
+    vect = TfidfVectorizer(
+        analyzer='word',
+        ngram_range=(1, 2),
+        min_df=2,
+        max_df=0.9,
+        max_features=vocab_size,
+        sublinear_tf=True,
+        strip_accents='unicode',
+        dtype=np.float32,
+    )
+    X = vect.fit_transform(texts)
+    cat = OneVsRestClassifier(LogisticRegression(C=10.0, class_weight='balanced', max_iter=2000))
+    cat.fit(X, y_multi)
+    stage = {
+        'tfidf': vect,
+        'category_coef': np.column_stack([e.coef_.ravel() for e in cat.estimators_]).astype(np.float32),
+        'category_intercept': np.array([e.intercept_[0] for e in cat.estimators_], dtype=np.float32),
+        'priority_coef': None,
+        'priority_intercept': None,
     }
-    df['priority'] = df['priority'].map(lambda x: priority_map.get(x, x))
+    if y_priority is not None:
+        # Priority labels as strings; classes_ then sort like the LabelEncoder's
+        prio = LogisticRegression(C=10.0, class_weight='balanced', max_iter=2000)
+        prio.fit(X, y_priority)
+        coef, intercept = prio.coef_, prio.intercept_
+        if len(prio.classes_) == 2:
+            # softmax([-z/2, z/2]) == sigmoid(z)
+            coef, intercept = np.vstack([-coef / 2, coef / 2]), np.concatenate([-intercept / 2, intercept / 2])
+        stage['priority_coef'] = coef.T.astype(np.float32)
+        stage['priority_intercept'] = intercept.astype(np.float32)
+        stage['priority_classes'] = [str(c) for c in prio.classes_]
+    return stage
+
+
+PRIORITY_MAP = {
+    'high': 'high', 'h': 'high', 'critical': 'high', 'urgent': 'high',
+    'medium': 'medium', 'med': 'medium', 'moderate': 'medium', 'm': 'medium',
+    'low': 'low', 'l': 'low', 'minor': 'low',
+}
+
 
-    priority_le = LabelEncoder()
-    y_priority = priority_le.fit_transform(df['priority'].values)
+def normalize_priority(values):
+    """Lower-case and map priority spellings onto high/medium/low."""
+    cleaned = pd.Series(values).astype(str).str.lower().str.strip()
+    return cleaned.map(lambda x: PRIORITY_MAP.get(x, x)).values
 
-    # Use Gradient Boosting for priority (handles class imbalance better)
+
+def train_priority_model(X_vect, y_priority):
+    """Gradient Boosting priority classifier (handles class imbalance better)."""
     prio_clf = GradientBoostingClassifier(
         n_estimators=200,
         max_depth=4,
@@ -295,56 +343,133 @@ if has_priority:
         random_state=42,
     )
     prio_clf.fit(X_vect, y_priority)
+    return prio_clf
 
-    # Evaluate priority
-    try:
-        X_train_p, X_test_p, y_train_p, y_test_p = train_test_split(
-            X, y_priority, test_size=0.2, random_state=42, stratify=y_priority
-        )
-        X_test_p_vect = tfidf.transform(X_test_p)
-        y_pred_p = prio_clf.predict(X_test_p_vect)
-        print('\nPriority classification report:')
-        print(classification_report(
-            y_test_p, y_pred_p,
-            target_names=priority_le.classes_,
-            zero_division=0
-        ))
-        print(f"  Accuracy: {accuracy_score(y_test_p, y_pred_p):.3f}")
-    except Exception as e:
-        print(f'Skipping priority eval: {e}')
-else:
-    prio_clf = None
-    priority_le = None
 
-# ---------------------------------------------------------------------------
-# Save Artifacts
-# ---------------------------------------------------------------------------
-print('\nSaving model artifacts...')
-
-joblib.dump(tfidf, OUT_DIR / 'tfidf_vectorizer.joblib')
-joblib.dump(cat_clf, OUT_DIR / 'category_model.joblib')
-joblib.dump(category_cols, OUT_DIR / 'category_columns.joblib')
-joblib.dump(iso, OUT_DIR / 'isoforest.joblib')
-
-if has_priority:
-    joblib.dump(prio_clf, OUT_DIR / 'priority_model.joblib')
-    joblib.dump(priority_le, OUT_DIR / 'priority_encoder.joblib')
-
-metadata = {
-    'created_at': datetime.datetime.utcnow().isoformat(),
-    'n_samples': int(df.shape[0]),
-    'n_original_samples': int(len(df)),
-    'n_features': int(X_vect.shape[1]),
-    'categories': list(category_cols),
-    'has_priority': bool(has_priority),
-    'model_type': 'CalibratedLinearSVC',
-    'priority_model_type': 'GradientBoosting' if has_priority else None,
-    'tfidf_config': 'word(1-3gram) + char_wb(3-5gram)',
-}
-with open(OUT_DIR / 'metadata.json', 'w') as f:
-    json.dump(metadata, f, indent=2)
+def main():
+    max_rows = int(os.environ.get('ML_TRAIN_MAX_ROWS', '0') or 0)
+    df, category_cols = prepare_training_data(max_rows)
+
+    OUT_DIR = Path(os.environ.get('ML_MODELS_DIR', BASE_DIR / 'models'))
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    print('\nBuilding TF-IDF features...')
+    tfidf = build_tfidf()
+
+    X = df['description_features'].values
+    y_multi = df[category_cols].astype(int).values
+
+    X_vect = tfidf.fit_transform(X)
+    print(f'Feature matrix shape: {X_vect.shape}')
+
+    # -----------------------------------------------------------------------
+    # IsolationForest for anomaly/fake detection
+    # -----------------------------------------------------------------------
+    print('\nTraining IsolationForest...')
+    iso = train_isoforest(X_vect)
+
+    # -----------------------------------------------------------------------
+    # Multi-label Category Classifier
+    # -----------------------------------------------------------------------
+    print('\nTraining multi-label category classifier...')
+    cat_clf = train_category_model(X_vect, y_multi)
+    print('Category classifier trained successfully.')
+
+    # -----------------------------------------------------------------------
+    # Evaluation: Stratified split
+    # -----------------------------------------------------------------------
+    print('\n' + '='*60)
+    print('EVALUATION: Category Classification')
+    print('='*60)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y_multi, test_size=0.2, random_state=42
+    )
+    X_test_vect = tfidf.transform(X_test)
+    y_pred = cat_clf.predict(X_test_vect)
+
+    for i, col in enumerate(category_cols):
+        f1 = f1_score(y_test[:, i], y_pred[:, i], zero_division=0)
+        print(f"  {col:12s} -> F1: {f1:.3f}")
+
+    # Overall metrics
+    from sklearn.metrics import hamming_loss
+    print(f"\n  Hamming Loss: {hamming_loss(y_test, y_pred):.4f}")
+    print(f"  Micro F1:     {f1_score(y_test, y_pred, average='micro', zero_division=0):.3f}")
+    print(f"  Macro F1:     {f1_score(y_test, y_pred, average='macro', zero_division=0):.3f}")
+
+    # -----------------------------------------------------------------------
+    # Priority Classifier (with keyword features)
+    # -----------------------------------------------------------------------
+    has_priority = 'priority' in df.columns
+    if has_priority:
+        print('\n' + '='*60)
+        print('TRAINING: Priority Classifier')
+        print('='*60)
+
+        # Normalize priority values
+        df['priority'] = normalize_priority(df['priority'])
+
+        priority_le = LabelEncoder()
+        y_priority = priority_le.fit_transform(df['priority'].values)
+
+        prio_clf = train_priority_model(X_vect, y_priority)
+
+        # Evaluate priority
+        try:
+            X_train_p, X_test_p, y_train_p, y_test_p = train_test_split(
+                X, y_priority, test_size=0.2, random_state=42, stratify=y_priority
+            )
+            X_test_p_vect = tfidf.transform(X_test_p)
+            y_pred_p = prio_clf.predict(X_test_p_vect)
+            print('\nPriority classification report:')
+            print(classification_report(
+                y_test_p, y_pred_p,
+                target_names=priority_le.classes_,
+                zero_division=0
+            ))
+            print(f"  Accuracy: {accuracy_score(y_test_p, y_pred_p):.3f}")
+        except Exception as e:
+            print(f'Skipping priority eval: {e}')
+    else:
+        prio_clf = None
+        priority_le = None
+
+    # -----------------------------------------------------------------------
+    # Save Artifacts
+    # -----------------------------------------------------------------------
+    print('\nSaving model artifacts...')
+
+    joblib.dump(tfidf, OUT_DIR / 'tfidf_vectorizer.joblib')
+    joblib.dump(cat_clf, OUT_DIR / 'category_model.joblib')
+    joblib.dump(category_cols, OUT_DIR / 'category_columns.joblib')
+    joblib.dump(iso, OUT_DIR / 'isoforest.joblib')
+
+    if has_priority:
+        joblib.dump(prio_clf, OUT_DIR / 'priority_model.joblib')
+        joblib.dump(priority_le, OUT_DIR / 'priority_encoder.joblib')
+
+    created = datetime.datetime.now(datetime.timezone.utc)
+    metadata = {
+        'created_at': created.isoformat(),
+        'model_version': created.strftime('%Y%m%d%H%M%S'),
+        'n_samples': int(df.shape[0]),
+        'n_original_samples': int(len(df)),
+        'n_features': int(X_vect.shape[1]),
+        'categories': list(category_cols),
+        'has_priority': bool(has_priority),
+        'model_type': 'CalibratedLinearSVC',
+        'priority_model_type': 'GradientBoosting' if has_priority else None,
+        'tfidf_config': 'word(1-3gram) + char_wb(3-5gram)',
+    }
+    with open(OUT_DIR / 'metadata.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    print(f'\n[OK] All model artifacts saved to {OUT_DIR}')
+    print(f'   Total training samples: {len(df)}')
+    print(f'   Feature dimensions: {X_vect.shape[1]}')
+    print(f'   Categories: {category_cols}')
+
 
-print(f'\n[OK] All model artifacts saved to {OUT_DIR}')
-print(f'   Total training samples: {len(df)}')
-print(f'   Feature dimensions: {X_vect.shape[1]}')
-print(f'   Categories: {category_cols}')
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/vad.py
+# Energy-based voice activity detection (numpy only)
+# -----------------------------------------------------------------------------
+# Finds speech in 16 kHz mono float audio so Whisper only sees the voiced
+# parts of a recording. A frame is speech when its energy is clearly above the
+# recording's own noise floor; short gaps are bridged and short blips dropped.
+#
+#   segments = speech_segments(audio)         # [(start, end), ...] in samples
+#   chunks = pack_segments(audio, segments)   # [np.ndarray, ...] each <= 30 s
+
+import os
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+ENABLED = os.environ.get("ML_VAD_ENABLED", "1") != "0"
+# Speech must be this many dB above the noise floor (10th percentile frame energy)
+THRESHOLD_DB = float(os.environ.get("ML_VAD_THRESHOLD_DB", "12"))
+# Frames within this many dB of the loud (95th percentile) frames always count...
+PEAK_RANGE_DB = 20.0
+# ...unless that is within this many dB of the noise floor: steady background
+# noise (fan, traffic) varies by a dB or two, speech rises well above it
+MIN_MARGIN_DB = float(os.environ.get("ML_VAD_MIN_MARGIN_DB", "6"))
+# Frames quieter than this are never speech, however quiet the recording is
+ABSOLUTE_FLOOR_DB = -55.0
+MIN_SPEECH_S = 0.25
+MIN_SILENCE_S = float(os.environ.get("ML_VAD_MIN_SILENCE_S", "0.6"))
+PAD_S = 0.2
+# Whisper processes audio in 30 second windows
+MAX_CHUNK_S = 30.0
+
+
+def frame_energy_db(audio, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+    """RMS energy in dBFS of consecutive non-overlapping frames."""
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return np.empty(0, dtype=np.float32), frame
+    frames = np.asarray(audio[:n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1) + 1e-12)
+    return 20 * np.log10(rms), frame
+
+
+def speech_segments(audio, sample_rate=SAMPLE_RATE):
+    """Return [(start, end)] sample ranges that contain speech, in order."""
+    energy, frame = frame_energy_db(audio, sample_rate)
+    if len(energy) == 0:
+        return []
+
+    # Clearly above the noise floor, but never so strict that quieter syllables
+    # of a recording without pauses (floor inside the speech) are dropped, and
+    # never so lax on a noisy recording that the noise itself counts as speech
+    noise_floor = np.percentile(energy, 10)
+    threshold = min(noise_floor + THRESHOLD_DB, np.percentile(energy, 95) - PEAK_RANGE_DB)
+    threshold = max(threshold, noise_floor + MIN_MARGIN_DB)
+    voiced = energy > max(threshold, ABSOLUTE_FLOOR_DB)
+
+    # Runs of voiced frames as [start, end) frame indices
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    frames_per_s = sample_rate / frame
+    max_gap = int(MIN_SILENCE_S * frames_per_s)
+    merged = []
+    for s, e in zip(starts, ends):
+        if merged and s - merged[-1][1] <= max_gap:
+            merged[-1][1] = e
+        else:
+            merged.append([s, e])
+
+    min_len = int(MIN_SPEECH_S * frames_per_s)
+    pad = int(PAD_S * sample_rate)
+    segments = []
+    for s, e in merged:
+        if e - s < min_len:
+            continue
+        start = max(0, s * frame - pad)
+        end = min(len(audio), e * frame + pad)
+        if segments and start <= segments[-1][1]:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return segments
+
+
+def _split_long(audio, start, end, limit, sample_rate):
+    """Cut a segment longer than `limit` samples at its quietest frame near each boundary."""
+    pieces = []
+    while end - start > limit:
+        search_from = start + int(limit * 0.8)
+        energy, frame = frame_energy_db(audio[search_from:start + limit], sample_rate)
+        cut = search_from + int(np.argmin(energy)) * frame if len(energy) else start + limit
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def pack_segments(audio, segments, sample_rate=SAMPLE_RATE, max_chunk_s=MAX_CHUNK_S):
+    """Concatenate speech segments, in order, into chunks no longer than max_chunk_s."""
+    limit = int(max_chunk_s * sample_rate)
+    gap = np.zeros(int(0.1 * sample_rate), dtype=np.float32)  # keep words apart
+    chunks = []
+    current = []
+    current_len = 0
+    for seg_start, seg_end in segments:
+        for start, end in _split_long(audio, seg_start, seg_end, limit, sample_rate):
+            piece = audio[start:end]
+            if current and current_len + len(gap) + len(piece) > limit:
+                chunks.append(np.concatenate(current))
+                current, current_len = [], 0
+            if current:
+                current.append(gap)
+                current_len += len(gap)
+            current.append(piece)
+            current_len += len(piece)
+    if current:
+        chunks.append(np.concatenate(current).astype(np.float32, copy=False))
+    return chunks
+
+
+def whisper_windows(n_samples, sample_rate=SAMPLE_RATE):
+    """Number of 30 s windows Whisper's encoder runs over for this much audio."""
+    return int(np.ceil(n_samples / (MAX_CHUNK_S * sample_rate))) if n_samples else 0
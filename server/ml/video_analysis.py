@@ -0,0 +1,381 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/video_analysis.py
+# Frame-based video classification with OpenCV (used by /analyze-video)
+# -----------------------------------------------------------------------------
+# Kept out of app.py so a video worker process (media_workers.py) can run it
+# without importing FastAPI or the text models.
+
+import hashlib
+import os
+import tempfile
+
+import metrics
+import video_index
+
+
+def remove_temp_file(path):
+    if path and os.path.exists(path):
+        try:
+            os.unlink(path)
+        except:
+            pass
+
+
+# Frames whose colour histogram is within this Bhattacharyya distance of the
+# current keyframe are treated as the same scene and reuse its prediction
+SCENE_CHANGE_THRESHOLD = float(os.environ.get("ML_VIDEO_SCENE_THRESHOLD", "0.2"))
+# Stop sampling once the remaining frames can no longer change the vote
+VIDEO_EARLY_EXIT = os.environ.get("ML_VIDEO_EARLY_EXIT", "1") != "0"
+# Longest seek (in sampled seconds) past a scene that has not changed; 1 decodes every second
+VIDEO_MAX_SKIP = max(int(os.environ.get("ML_VIDEO_MAX_SKIP_S", "4")), 1)
+# Frames whose 64-bit dHashes differ in at most this many bits (and whose
+# histograms are within SCENE_CHANGE_THRESHOLD) are near-duplicates
+DHASH_DISTANCE = int(os.environ.get("ML_VIDEO_DHASH_DISTANCE", "6"))
+# Leading decoded frames that make up a video's perceptual fingerprint
+FINGERPRINT_FRAMES = int(os.environ.get("ML_VIDEO_FINGERPRINT_FRAMES", "3"))
+# Bump when classify_frame, the sampling or the result format changes, so indexed analyses are not reused
+ANALYSIS_VERSION = 3
+
+FRAMES = metrics.Counter(
+    'ml_video_frames_total', 'Sampled video frames by outcome (classified/same_scene/duplicate/skipped).', ['result'],
+)
+
+
+def frame_signature(frame, cv2):
+    """
+    Cheap frame signature from a 64x64 thumbnail: its normalized hue/saturation
+    histogram (colour) and its 64-bit difference hash (structure).
+    """
+    thumb = cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(thumb, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+    cv2.normalize(hist, hist, 1, 0, cv2.NORM_L1)
+    return hist, dhash(thumb, cv2)
+
+
+def dhash(thumb, cv2):
+    """Difference hash: one bit per horizontally adjacent pixel pair of a 9x8 greyscale image."""
+    import numpy as np
+
+    gray = cv2.resize(cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY), (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(gray[:, 1:] > gray[:, :-1]).tobytes(), "big")
+
+
+def same_frame(a, b, cv2):
+    """True when two frame signatures match in both structure and colour."""
+    return (bin(a[1] ^ b[1]).count("1") <= DHASH_DISTANCE
+            and cv2.compareHist(a[0], b[0], cv2.HISTCMP_BHATTACHARYYA) <= SCENE_CHANGE_THRESHOLD)
+
+
+def vote_is_decided(category_votes, remaining):
+    """True when the leader's margin exceeds the votes still to be cast."""
+    counts = sorted(category_votes.values(), reverse=True)
+    runner_up = counts[1] if len(counts) > 1 else 0
+    return counts[0] - runner_up > remaining
+
+
+def analyze_video_frames(video_path: str, max_frames: int = 10, token=None, content_hash=None):
+    """Extract frames from video and analyze them for complaint categories.
+
+    One frame per second (up to max_frames) is sampled. Only keyframes (scene
+    changes) are classified; frames from the same scene, or near-duplicates of
+    an earlier keyframe, reuse its prediction. While the scene stays the same,
+    decoding seeks ahead 2, 4, ... (up to VIDEO_MAX_SKIP) seconds and the
+    skipped seconds vote with the keyframe; a seek that lands in another scene
+    goes back and walks up to it one second at a time. Sampling stops early
+    once the majority vote is decided.
+
+    With a content_hash (SHA-256 of the file), the video fingerprint index is
+    consulted: an exact match returns the earlier analysis without opening the
+    file, and a match on the first sampled frames returns it without decoding
+    the rest. New analyses are added to the index.
+    """
+    index = video_index.get_index() if content_hash else None
+    if index is not None:
+        earlier = index.lookup_exact(content_hash, max_frames, ANALYSIS_VERSION)
+        metrics.record_cache("video_index", hit=earlier is not None)
+        if earlier is not None:
+            print(f"🗂️ Video already analyzed (same file): {earlier['category']}")
+            return dict(earlier, fingerprint_match="exact")
+
+    try:
+        import cv2
+    except ImportError:
+        print("⚠️ OpenCV not installed, using fallback analysis")
+        return {"category": "unassigned", "confidence": 0.5, "frames_analyzed": 0, "frame_predictions": []}
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Could not open video: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration = total_frames / fps if fps > 0 else 0
+
+    print(f"📹 Video: {total_frames} frames, {fps:.1f} FPS, {duration:.1f}s duration")
+
+    # Extract 1 frame per second, max 10 frames
+    frame_interval = max(int(fps), 1)
+    frames_to_extract = min(max_frames, int(duration) + 1)
+
+    frame_predictions = []
+    category_votes = {}
+    confidence_sums = {}
+    # (signature, prediction) of every classified keyframe
+    keyframes = []
+    keyframe_signature = None
+    keyframe_prediction = None
+    fingerprint = []
+    fingerprint_size = min(FINGERPRINT_FRAMES, frames_to_extract) if index is not None else 0
+    frames_sampled = 0
+    frames_decoded = 0
+    classified_frames = 0
+    duplicate_frames = 0
+    early_exit = False
+
+    # Seconds that actually have a frame (int(duration) + 1 overshoots by one on whole-second clips)
+    end = min(frames_to_extract, -(-total_frames // frame_interval)) if total_frames > 0 else frames_to_extract
+    second = 0
+    skip = min(2, VIDEO_MAX_SKIP)
+    # (second, frame, signature) decoded past a scene change that the walk back has not reached yet
+    pending = None
+
+    while frames_sampled < end:
+        if token is not None and token.cancelled:
+            cap.release()
+            token.check()
+        if pending is not None and pending[0] == second:
+            _, frame, signature = pending
+            pending = None
+        else:
+            with metrics.stage_timer("frame_decode"):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, second * frame_interval)
+                ret, frame = cap.read()
+            if not ret:
+                if second == frames_sampled:
+                    break
+                # Seeked past the real end of a video whose frame count was overestimated
+                end, second = second, frames_sampled
+                continue
+            frames_decoded += 1
+
+            # The fingerprint is the first decoded frames; which seconds they come from
+            # depends only on the frames before them, so copies decode the same seconds
+            signature = frame_signature(frame, cv2)
+            if len(fingerprint) < fingerprint_size:
+                fingerprint.append(signature)
+                if len(fingerprint) == fingerprint_size:
+                    earlier = index.lookup_similar(frames_to_extract, max_frames, ANALYSIS_VERSION, fingerprint,
+                                                   lambda a, b: same_frame(a, b, cv2))
+                    metrics.record_cache("video_fingerprint", hit=earlier is not None)
+                    if earlier is not None:
+                        cap.release()
+                        print(f"🗂️ Video already analyzed (matching frames): {earlier['category']}")
+                        return dict(earlier, fingerprint_match="similar")
+
+        classified = False
+        new_scene = keyframe_signature is None or cv2.compareHist(
+            signature[0], keyframe_signature[0], cv2.HISTCMP_BHATTACHARYYA
+        ) > SCENE_CHANGE_THRESHOLD
+        if not new_scene:
+            FRAMES.inc(result="same_scene")
+            if second > frames_sampled:
+                FRAMES.inc(second - frames_sampled, result="skipped")
+        elif second > frames_sampled:
+            # The scene changed somewhere in the seconds just skipped: walk up to this frame
+            pending = (second, frame, signature)
+            second = frames_sampled
+            continue
+        else:
+            duplicate = next((k for k in keyframes if same_frame(signature, k[0], cv2)), None)
+            if duplicate is not None:
+                # Back to a scene already classified (e.g. a cut back to the first shot)
+                keyframe_prediction = duplicate[1]
+                duplicate_frames += 1
+                FRAMES.inc(result="duplicate")
+            else:
+                # Resize frame to 224x224 for analysis
+                frame_resized = cv2.resize(frame, (224, 224))
+
+                # Analyze frame using visual features
+                with metrics.stage_timer("frame_classify"):
+                    keyframe_prediction = classify_frame(frame_resized, cv2)
+                keyframes.append((signature, keyframe_prediction))
+                classified = True
+                classified_frames += 1
+                FRAMES.inc(result="classified")
+            keyframe_signature = signature
+
+        # Every second votes and is listed; same-scene and skipped seconds reuse their keyframe's prediction
+        cat = keyframe_prediction["category"]
+        for voted in range(frames_sampled, second + 1):
+            frame_predictions.append(dict(keyframe_prediction, second=voted, keyframe=classified))
+            category_votes[cat] = category_votes.get(cat, 0) + 1
+            confidence_sums[cat] = confidence_sums.get(cat, 0.0) + keyframe_prediction["confidence"]
+        frames_sampled = second + 1
+
+        # The fingerprint frames are always decoded, so every indexed video has a complete fingerprint
+        if VIDEO_EARLY_EXIT and len(fingerprint) >= fingerprint_size and vote_is_decided(
+            category_votes, end - frames_sampled
+        ):
+            early_exit = frames_sampled < end
+            break
+
+        if pending is not None:
+            second += 1
+        else:
+            skip = min(2, VIDEO_MAX_SKIP) if new_scene else min(skip * 2, VIDEO_MAX_SKIP)
+            # Leave enough seconds to finish the fingerprint
+            second = min(second + skip, end - max(fingerprint_size - len(fingerprint), 1))
+
+    cap.release()
+
+    if not frame_predictions:
+        return {"category": "unassigned", "confidence": 0.5, "frames_analyzed": 0, "frame_predictions": []}
+
+    # Get winning category (majority voting across frames)
+    winning_category = max(category_votes, key=category_votes.get)
+    avg_confidence = confidence_sums[winning_category] / category_votes[winning_category]
+
+    result = {
+        "category": winning_category,
+        "confidence": round(avg_confidence, 4),
+        "frames_analyzed": frames_sampled,
+        "frames_decoded": frames_decoded,
+        "keyframes": classified_frames,
+        "duplicate_frames": duplicate_frames,
+        "early_exit": early_exit,
+        "frame_predictions": frame_predictions,
+    }
+    if index is not None and fingerprint and len(fingerprint) == fingerprint_size:
+        index.save(content_hash, max_frames, ANALYSIS_VERSION, frames_to_extract, fingerprint, result)
+    return result
+
+
+def classify_frame(frame, cv2):
+    """Classify a single frame using visual feature analysis.
+
+    Uses color histograms, edge density, and brightness to detect:
+    - Roads: grey/asphalt tones, edge lines
+    - Garbage: diverse colors, high texture variation
+    - Water: blue/brown water tones
+    - Lighting: dark scenes, bright spots
+    """
+    import numpy as np
+
+    # Convert to different color spaces
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    # Feature 1: Color histogram analysis
+    h_hist = cv2.calcHist([hsv], [0], None, [180], [0, 180]).flatten()
+    s_hist = cv2.calcHist([hsv], [1], None, [256], [0, 256]).flatten()
+    v_hist = cv2.calcHist([hsv], [2], None, [256], [0, 256]).flatten()
+
+    h_hist = h_hist / (h_hist.sum() + 1e-7)
+    s_hist = s_hist / (s_hist.sum() + 1e-7)
+    v_hist = v_hist / (v_hist.sum() + 1e-7)
+
+    # Feature 2: Edge density (Canny)
+    edges = cv2.Canny(gray, 50, 150)
+    edge_density = np.mean(edges) / 255.0
+
+    # Feature 3: Mean brightness & saturation
+    mean_brightness = np.mean(v_hist * np.arange(256))
+    mean_saturation = np.mean(s_hist * np.arange(256))
+
+    # Feature 4: Color dominance
+    blue_ratio = np.sum(h_hist[90:130])   # Blue-cyan hues
+    green_ratio = np.sum(h_hist[35:85])   # Green hues
+    brown_ratio = np.sum(h_hist[10:25])   # Brown/earth hues
+    grey_ratio = 1.0 - np.sum(s_hist[50:])  # Low saturation = grey
+
+    # Score each category
+    scores = {}
+
+    # Roads: grey tones, medium edge density (road markings), low saturation
+    scores["roads"] = float(
+        grey_ratio * 0.35 +
+        min(edge_density * 2, 1.0) * 0.35 +
+        brown_ratio * 0.15 +
+        (1.0 - mean_saturation / 256) * 0.15
+    )
+
+    # Garbage: high color variance (diverse items), high texture
+    color_variance = float(np.std(h_hist))
+    scores["garbage"] = float(
+        color_variance * 3.0 * 0.3 +
+        edge_density * 0.3 +
+        brown_ratio * 0.2 +
+        green_ratio * 0.2
+    )
+
+    # Water: blue tones, low edge density (smooth surface)
+    scores["water"] = float(
+        blue_ratio * 0.4 +
+        (1.0 - edge_density) * 0.25 +
+        mean_saturation / 256 * 0.2 +
+        brown_ratio * 0.15
+    )
+
+    # Lighting: dark scenes, low brightness
+    darkness = 1.0 - (mean_brightness / 256)
+    scores["lighting"] = float(
+        darkness * 0.5 +
+        (1.0 - edge_density) * 0.2 +
+        grey_ratio * 0.15 +
+        (1.0 - mean_saturation / 256) * 0.15
+    )
+
+    # Normalize scores
+    total = sum(scores.values()) + 1e-7
+    for k in scores:
+        scores[k] = scores[k] / total
+
+    # Get predicted category
+    predicted = max(scores, key=scores.get)
+    confidence = scores[predicted]
+
+    return {"category": predicted, "confidence": round(confidence, 4)}
+
+
+def download_video(video_url: str, token=None):
+    """Download a video to a temp file and return its path and SHA-256."""
+    import requests as req_lib
+
+    print(f"📥 Downloading video from: {video_url[:80]}...")
+    temp_path = None
+    digest = hashlib.sha256()
+    try:
+        with metrics.stage_timer("video_download"):
+            timeout = token.remaining(60) if token is not None else 60
+            response = req_lib.get(video_url, stream=True, timeout=max(timeout, 1))
+            response.raise_for_status()
+
+            # Save to temp file
+            with response, tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
+                temp_path = tmp.name
+                for chunk in response.iter_content(chunk_size=8192):
+                    if token is not None:
+                        token.check()
+                    tmp.write(chunk)
+                    digest.update(chunk)
+    except Exception:
+        remove_temp_file(temp_path)
+        raise
+
+    file_size = os.path.getsize(temp_path)
+    print(f"💾 Downloaded video: {file_size / (1024*1024):.2f} MB")
+    return temp_path, digest.hexdigest()
+
+
+def analyze_video_url(video_url: str, max_frames: int = 10, token=None):
+    """Download a video, analyze its frames and delete the download."""
+    temp_path = None
+    try:
+        temp_path, content_hash = download_video(video_url, token=token)
+        result = analyze_video_frames(temp_path, max_frames=max_frames, token=token, content_hash=content_hash)
+        print(f"✅ Video analysis complete: {result['category']} ({result['confidence']:.2%}), {result['frames_analyzed']} frames, {result.get('keyframes', 0)} classified")
+        return result
+    finally:
+        remove_temp_file(temp_path)
@@ -0,0 +1,172 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/video_index.py
+# Fingerprint index of analyzed videos
+# -----------------------------------------------------------------------------
+# Citizens often attach the same clip, or a re-encoded copy of it, to several
+# complaints. /analyze-video records every analysis in a local SQLite file
+# together with two fingerprints of the video:
+#
+#   content hash   SHA-256 of the downloaded bytes; the same upload is answered
+#                  from the index before the file is opened at all
+#   frame hashes   dHash and colour histogram of the first few sampled frames
+#                  (video_analysis.frame_signature); a re-encoded or re-muxed
+#                  copy of the same clip is answered once those frames are
+#                  decoded, without decoding or classifying the rest
+#
+# ML_VIDEO_INDEX sets the file (default video_index.sqlite3 in ML_STATE_DIR);
+# ML_VIDEO_INDEX=0 turns the index off. ML_VIDEO_INDEX_MAX_ENTRIES bounds it,
+# oldest analyses are dropped first.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+import metrics
+
+BASE_DIR = Path(__file__).resolve().parent
+STATE_DIR = Path(os.environ.get('ML_STATE_DIR', BASE_DIR / 'state'))
+
+INDEX_PATH = os.environ.get("ML_VIDEO_INDEX", "")
+ENABLED = INDEX_PATH != "0"
+MAX_ENTRIES = int(os.environ.get("ML_VIDEO_INDEX_MAX_ENTRIES", "10000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    content_hash TEXT NOT NULL,
+    max_frames INTEGER NOT NULL,
+    analysis_version INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    frame_hashes TEXT NOT NULL,
+    frame_hists BLOB NOT NULL,
+    result TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, max_frames, analysis_version)
+)
+"""
+SAMPLES_INDEX = "CREATE INDEX IF NOT EXISTS videos_samples ON videos (samples, max_frames, analysis_version)"
+
+
+class VideoIndex:
+    """Earlier video analyses, keyed by content hash and searchable by frame fingerprint."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        self.conn.execute(SAMPLES_INDEX)
+        self.conn.commit()
+        # Kept up to date by save(), so stats() never scans the table
+        self.rows = self.conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def _hit(self, content_hash, max_frames, version, result):
+        self.conn.execute(
+            "UPDATE videos SET hits = hits + 1, updated_at = ? "
+            "WHERE content_hash = ? AND max_frames = ? AND analysis_version = ?",
+            (time.time(), content_hash, max_frames, version),
+        )
+        self.conn.commit()
+        return json.loads(result)
+
+    def lookup_exact(self, content_hash, max_frames, version):
+        """The stored analysis of this exact file, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT result FROM videos WHERE content_hash = ? AND max_frames = ? AND analysis_version = ?",
+                (content_hash, max_frames, version),
+            ).fetchone()
+            return self._hit(content_hash, max_frames, version, row[0]) if row else None
+
+    def lookup_similar(self, samples, max_frames, version, signatures, same_frame):
+        """
+        The stored analysis of a video with the same number of samples whose
+        first frames all match `signatures` ([(hist, dhash)]) under
+        same_frame(a, b), or None.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT content_hash, frame_hashes, frame_hists, result FROM videos "
+                "WHERE samples = ? AND max_frames = ? AND analysis_version = ?",
+                (samples, max_frames, version),
+            ).fetchall()
+            for content_hash, frame_hashes, frame_hists, result in rows:
+                hashes = [int(h, 16) for h in frame_hashes.split(",")] if frame_hashes else []
+                if len(hashes) != len(signatures):
+                    continue
+                hists = np.frombuffer(frame_hists, dtype=np.float32).reshape(len(hashes), -1)
+                if all(same_frame((hist.reshape(signatures[0][0].shape), h), sig)
+                       for hist, h, sig in zip(hists, hashes, signatures)):
+                    return self._hit(content_hash, max_frames, version, result)
+        return None
+
+    def save(self, content_hash, max_frames, version, samples, signatures, result):
+        hists = np.array([sig[0].ravel() for sig in signatures], dtype=np.float32)
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.execute(
+                "INSERT OR IGNORE INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)",
+                (content_hash, max_frames, version, samples,
+                 ",".join(f"{sig[1]:016x}" for sig in signatures), hists.tobytes(),
+                 json.dumps(result), time.time()),
+            )
+            self.rows += self.conn.total_changes - before
+            if self.rows > MAX_ENTRIES:
+                evicted = self.conn.execute(
+                    "DELETE FROM videos WHERE rowid IN (SELECT rowid FROM videos ORDER BY updated_at "
+                    "LIMIT ?)", (self.rows - MAX_ENTRIES,),
+                ).rowcount
+                self.rows -= evicted
+            self.conn.commit()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def index_path():
+    return INDEX_PATH or str(STATE_DIR / "video_index.sqlite3")
+
+
+def get_index():
+    """The process-wide index (opened on first use), or None when disabled."""
+    global _index
+    if not ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = VideoIndex(index_path())
+            print(f"🗂️ Video fingerprint index at {_index.path}")
+        return _index
+
+
+def stats():
+    """
+    Lookups and reuses, from the cache metrics (which include the video
+    workers'). Never opens the index: with media workers it lives in the
+    worker process, and `videos` is only known where it is open.
+    """
+    if not ENABLED:
+        return {"enabled": False}
+    counts = {
+        (cache, result): int(metrics.CACHE_REQUESTS.get(cache=cache, result=result))
+        for cache in ("video_index", "video_fingerprint") for result in ("hit", "miss")
+    }
+    index = _index
+    return {
+        "enabled": True,
+        "path": index.path if index is not None else index_path(),
+        "videos": index.rows if index is not None else None,
+        "max_entries": MAX_ENTRIES,
+        "lookups": counts["video_index", "hit"] + counts["video_index", "miss"],
+        "exact_hits": counts["video_index", "hit"],
+        "similar_hits": counts["video_fingerprint", "hit"],
+    }
@@ -0,0 +1,188 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/whisper_batcher.py
+# Cross-request batching of Whisper's encoder
+# -----------------------------------------------------------------------------
+# Concurrent transcriptions on the same model tier are collected for up to
+# ML_WHISPER_BATCH_WAIT_MS (or until ML_WHISPER_MAX_BATCH 30 s windows are
+# waiting). Every clip is padded to Whisper's 30 s window and the whole batch
+# goes through the encoder in one pass. Language detection and decoding then
+# run per request on its slice of the encoded features, so each caller gets
+# its own result in its own language. A job whose CancelToken is cancelled
+# while queued is dropped from the queue, and is not decoded if its batch had
+# already started.
+#
+#   scheduler = BatchScheduler('base', pool)
+#   result = scheduler.submit(chunks, language=None, min_confidence=0.8)
+
+import os
+import threading
+import time
+
+import cancellation
+import metrics
+
+MAX_BATCH = int(os.environ.get("ML_WHISPER_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.environ.get("ML_WHISPER_BATCH_WAIT_MS", "50"))
+
+
+class _Job:
+    def __init__(self, chunks, language, min_confidence, token):
+        self.chunks = chunks
+        self.language = language
+        self.min_confidence = min_confidence
+        self.token = token
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchScheduler:
+    """One background thread per model tier that encodes queued clips together."""
+
+    def __init__(self, tier, pool, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.tier = tier
+        self.pool = pool
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self.pending = []
+        self.cond = threading.Condition()
+        self.thread = None
+        self.batches = 0
+        self.windows = 0
+        self.jobs = 0
+
+    def submit(self, chunks, language=None, min_confidence=None, token=None):
+        """
+        Transcribe <= 30 s chunks of one recording; blocks until done.
+        With min_confidence set and language None, a clip whose detected
+        language is less likely than that is returned undecoded
+        ({"escalate": True, ...}) so the caller can retry on a bigger tier.
+        Raises cancellation.Cancelled once `token` is cancelled.
+        """
+        job = _Job(chunks, language, min_confidence, token)
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, name=f"whisper-batch-{self.tier}", daemon=True)
+                self.thread.start()
+            self.pending.append(job)
+            metrics.QUEUE_DEPTH.set(len(self.pending), queue=f"whisper_batch_{self.tier}")
+            self.cond.notify()
+        while not job.done.wait(None if token is None else cancellation.POLL_INTERVAL_S):
+            if token.cancelled:
+                with self.cond:
+                    if job in self.pending:
+                        self.pending.remove(job)
+                        metrics.QUEUE_DEPTH.set(len(self.pending), queue=f"whisper_batch_{self.tier}")
+                        token.check()
+                # Already being encoded; _decode skips it
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _pending_windows(self):
+        return sum(len(job.chunks) for job in self.pending)
+
+    def _take_batch(self):
+        """Wait for the batch to fill or the oldest job's deadline, then pop jobs FIFO."""
+        with self.cond:
+            while not self.pending:
+                self.cond.wait()
+            deadline = self.pending[0].enqueued + self.max_wait
+            while self._pending_windows() < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            batch = [self.pending.pop(0)]
+            windows = len(batch[0].chunks)
+            while self.pending and windows + len(self.pending[0].chunks) <= self.max_batch:
+                windows += len(self.pending[0].chunks)
+                batch.append(self.pending.pop(0))
+            metrics.QUEUE_DEPTH.set(len(self.pending), queue=f"whisper_batch_{self.tier}")
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                self._run(batch)
+            except Exception as e:
+                for job in batch:
+                    if not job.done.is_set():
+                        job.error = e
+                        job.done.set()
+
+    def _run(self, batch):
+        import torch
+        import whisper
+
+        started = time.perf_counter()
+        with self.pool.acquire(self.tier) as model:
+            fp16 = str(model.device) != "cpu"
+            dtype = torch.float16 if fp16 else torch.float32
+            mels = [
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(chunk), n_mels=model.dims.n_mels)
+                for job in batch for chunk in job.chunks
+            ]
+            # A single long recording can exceed max_batch on its own
+            features = []
+            with metrics.stage_timer("whisper_encode"), torch.no_grad():
+                for i in range(0, len(mels), self.max_batch):
+                    mel = torch.stack(mels[i:i + self.max_batch]).to(model.device, dtype)
+                    features.append(model.embed_audio(mel))
+            features = torch.cat(features)
+
+            offset = 0
+            for job in batch:
+                job_features = features[offset:offset + len(job.chunks)]
+                offset += len(job.chunks)
+                try:
+                    if job.token is not None:
+                        job.token.check()
+                    job.result = self._decode(model, job, job_features, fp16)
+                    job.result["batch_windows"] = len(mels)
+                    job.result["batch_wait_ms"] = round((started - job.enqueued) * 1000, 2)
+                except Exception as e:
+                    job.error = e
+                job.done.set()
+
+        self.batches += 1
+        self.windows += len(mels)
+        self.jobs += len(batch)
+
+    def _decode(self, model, job, features, fp16):
+        import whisper
+
+        language, confidence = job.language, None
+        if language is None:
+            # detect_language accepts encoded features, so no second encoder pass
+            _, probs = model.detect_language(features[:1])
+            probs = probs[0]
+            language = max(probs, key=probs.get)
+            confidence = float(probs[language])
+            if job.min_confidence is not None and confidence < job.min_confidence:
+                return {"escalate": True, "language": language, "language_confidence": confidence}
+
+        options = whisper.DecodingOptions(language=language, task="transcribe",
+                                          without_timestamps=True, fp16=fp16)
+        with metrics.stage_timer("whisper_decode"):
+            texts = [r.text.strip() for r in whisper.decode(model, features, options)]
+        return {
+            "escalate": False,
+            "text": " ".join(t for t in texts if t),
+            "language": language,
+            "language_confidence": confidence,
+        }
+
+    def stats(self):
+        with self.cond:
+            pending = len(self.pending)
+        return {
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "avg_windows_per_batch": round(self.windows / self.batches, 2) if self.batches else None,
+            "pending": pending,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
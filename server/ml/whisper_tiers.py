@@ -0,0 +1,360 @@
+# -----------------------------------------------------------------------------
+# FILE: server/ml/whisper_tiers.py
+# Adaptive Whisper model tiering for /transcribe
+# -----------------------------------------------------------------------------
+# Picks the Whisper model per clip instead of always using "base":
+#   1. clip length: short clips (most voice complaints) start on the fast tier
+#   2. load: while many transcriptions are in flight, never escalate past the
+#      default tier
+#   3. language confidence: the first 30 s window's language detection runs on
+#      the chosen model; below ML_WHISPER_LANGUAGE_CONFIDENCE the clip moves up
+#      one tier and the bigger model auto-detects. Otherwise the detected
+#      language is passed to transcribe() so detection is not repeated.
+#
+# Silence is trimmed first (vad.py). Speech longer than one 30 s window is
+# packed into <= 30 s chunks that are decoded in batches (one encoder pass per
+# ML_WHISPER_SEGMENT_BATCH chunks) and stitched back in order.
+#
+# With ML_WHISPER_BATCHING (default on) the chunks are queued to a per-tier
+# scheduler that encodes concurrent requests in one batch (whisper_batcher.py);
+# language detection then reuses those encoded features.
+#
+# An optional CancelToken (cancellation.py) is checked between stages, so a
+# clip whose caller went away stops before the next load, encode or decode.
+#
+# Loaded models share ML_WHISPER_MEMORY_MB; idle models are evicted least
+# recently used first. ML_WHISPER_TIERING=0 restores the single-model
+# behaviour (always ML_WHISPER_DEFAULT_TIER, full auto-detection).
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import metrics
+import vad
+import whisper_batcher
+
+TIERS = [t.strip() for t in os.environ.get("ML_WHISPER_TIERS", "tiny,base,small").split(",") if t.strip()]
+DEFAULT_TIER = os.environ.get("ML_WHISPER_DEFAULT_TIER", "base")
+if DEFAULT_TIER not in TIERS:
+    TIERS.append(DEFAULT_TIER)
+TIERING = os.environ.get("ML_WHISPER_TIERING", "1") != "0"
+SHORT_CLIP_SECONDS = float(os.environ.get("ML_WHISPER_SHORT_CLIP_SECONDS", "30"))
+LANGUAGE_CONFIDENCE = float(os.environ.get("ML_WHISPER_LANGUAGE_CONFIDENCE", "0.8"))
+BUSY_QUEUE_DEPTH = int(os.environ.get("ML_WHISPER_BUSY_QUEUE_DEPTH", "4"))
+MEMORY_BUDGET_MB = float(os.environ.get("ML_WHISPER_MEMORY_MB", "2048"))
+# Encode concurrent requests together (whisper_batcher.py)
+BATCHING = os.environ.get("ML_WHISPER_BATCHING", "1") != "0"
+# Speech chunks of a long recording decoded per encoder batch (without BATCHING)
+SEGMENT_BATCH = int(os.environ.get("ML_WHISPER_SEGMENT_BATCH", "8"))
+
+SAMPLE_RATE = 16000
+# Approximate fp32 weight sizes, used before a model is loaded
+MODEL_SIZE_MB = {
+    "tiny": 150, "base": 290, "small": 970, "medium": 3100,
+    "large": 6200, "large-v2": 6200, "large-v3": 6200, "turbo": 3200,
+}
+
+
+class ModelPool:
+    """Loaded Whisper models under a shared memory budget (LRU eviction of idle models)."""
+
+    def __init__(self, budget_mb):
+        self.budget_mb = budget_mb
+        self.models = OrderedDict()  # name -> (model, size_mb, inference lock), LRU first
+        self.in_use = {}
+        self.loads = 0
+        self.evictions = 0
+        # name -> Future of a load in progress, and the memory those loads will take;
+        # loads run outside `lock` so stats() and loaded tiers are never held up
+        self.loading = {}
+        self.reserved_mb = 0.0
+        self.lock = threading.Lock()
+
+    def used_mb(self):
+        return sum(entry[1] for entry in self.models.values())
+
+    def fits(self, name):
+        """Whether `name` is loaded or could be loaded after evicting idle models."""
+        with self.lock:
+            if name in self.models:
+                return True
+            if name in self.loading:
+                return True
+            pinned = sum(entry[1] for n, entry in self.models.items() if self.in_use.get(n))
+            return pinned + self.reserved_mb + MODEL_SIZE_MB.get(name, 1000) <= self.budget_mb
+
+    def _evict_for(self, size_mb):
+        for name in list(self.models):
+            if self.used_mb() + self.reserved_mb + size_mb <= self.budget_mb:
+                return
+            if not self.in_use.get(name):
+                print(f"🧹 Evicting Whisper model ({name}) to stay within {self.budget_mb:.0f} MB")
+                del self.models[name]
+                self.evictions += 1
+
+    @contextmanager
+    def acquire(self, name):
+        """
+        Yield the loaded model, loading it (and evicting idle ones) if needed.
+        Inference is serialized per model: Whisper's decoder installs kv-cache
+        hooks on the shared module, so concurrent decodes would corrupt each other.
+        """
+        loader = False
+        with self.lock:
+            entry = self.models.get(name)
+            if entry is not None:
+                self.models.move_to_end(name)
+                pending = None
+            else:
+                pending = self.loading.get(name)
+                if pending is None:
+                    pending = self.loading[name] = Future()
+                    loader = True
+                    self._evict_for(MODEL_SIZE_MB.get(name, 1000))
+                    self.reserved_mb += MODEL_SIZE_MB.get(name, 1000)
+            metrics.record_cache("whisper_model", hit=not loader)
+            # Pinned from here, so a concurrent load cannot evict it
+            self.in_use[name] = self.in_use.get(name, 0) + 1
+        try:
+            if entry is None:
+                entry = self._load(name, pending) if loader else pending.result()
+            with entry[2]:
+                yield entry[0]
+        finally:
+            with self.lock:
+                self.in_use[name] -= 1
+
+    def _load(self, name, pending):
+        """Load a tier without holding the pool lock; waiters get it through `pending`."""
+        estimate = MODEL_SIZE_MB.get(name, 1000)
+        try:
+            import whisper
+            print(f"🎙️ Loading Whisper model ({name})... This may take a moment on first run.")
+            with metrics.stage_timer("whisper_load"):
+                model = whisper.load_model(name)
+            size_mb = sum(p.numel() * p.element_size() for p in model.parameters()) / 1e6
+            entry = (model, size_mb, threading.Lock())
+        except BaseException as e:
+            with self.lock:
+                del self.loading[name]
+                self.reserved_mb -= estimate
+            pending.set_exception(e)
+            raise
+        with self.lock:
+            self.reserved_mb -= estimate
+            self.models[name] = entry
+            del self.loading[name]
+            self.loads += 1
+            used = self.used_mb()
+        pending.set_result(entry)
+        print(f"✅ Whisper model ({name}) loaded, {size_mb:.0f} MB "
+              f"({used:.0f}/{self.budget_mb:.0f} MB in use)")
+        return entry
+
+    def stats(self):
+        with self.lock:
+            return {
+                "budget_mb": self.budget_mb,
+                "used_mb": round(self.used_mb(), 1),
+                "loaded": {n: round(entry[1], 1) for n, entry in self.models.items()},
+                "in_use": {n: c for n, c in self.in_use.items() if c},
+                "loading": sorted(self.loading),
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+pool = ModelPool(MEMORY_BUDGET_MB)
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+_active = 0
+_active_lock = threading.Lock()
+
+
+@contextmanager
+def track_queue():
+    """Count in-flight transcriptions (exported as ml_queue_depth{queue="whisper"})."""
+    global _active
+    with _active_lock:
+        _active += 1
+        metrics.QUEUE_DEPTH.set(_active, queue="whisper")
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active -= 1
+            metrics.QUEUE_DEPTH.set(_active, queue="whisper")
+
+
+def queue_depth():
+    return _active
+
+
+def _tier_index(name):
+    return TIERS.index(name)
+
+
+def choose_tier(duration, depth):
+    """Initial tier from clip length and load; returns (tier, reason)."""
+    if not TIERING:
+        return DEFAULT_TIER, "tiering disabled"
+    if duration <= SHORT_CLIP_SECONDS:
+        return TIERS[0], f"short clip ({duration:.1f}s)"
+    if depth >= BUSY_QUEUE_DEPTH:
+        return TIERS[0], f"busy ({depth} in flight)"
+    return DEFAULT_TIER, f"long clip ({duration:.1f}s)"
+
+
+def escalate(tier, depth):
+    """Next tier up for a low-confidence clip, or None when at the cap."""
+    cap = _tier_index(DEFAULT_TIER) if depth >= BUSY_QUEUE_DEPTH else len(TIERS) - 1
+    idx = _tier_index(tier) + 1
+    # Stay put if the bigger model cannot be loaded within the memory budget now
+    if idx > cap or not pool.fits(TIERS[idx]):
+        return None
+    return TIERS[idx]
+
+
+def detect_language(model, audio):
+    """Language probabilities for the first 30 s window; returns (code, probability)."""
+    import whisper
+
+    window = whisper.pad_or_trim(audio)
+    mel = whisper.log_mel_spectrogram(window, n_mels=model.dims.n_mels).to(model.device)
+    _, probs = model.detect_language(mel)
+    language = max(probs, key=probs.get)
+    return language, float(probs[language])
+
+
+def _check(token):
+    if token is not None:
+        token.check()
+
+
+def transcribe(audio_path, token=None):
+    """
+    Transcribe with the adaptively chosen model.
+    Returns (whisper result dict, tier info dict).
+    Raises cancellation.Cancelled once `token` is cancelled.
+    """
+    import whisper
+
+    with track_queue():
+        _check(token)
+        audio = whisper.load_audio(audio_path)
+        _check(token)
+        duration = len(audio) / SAMPLE_RATE
+        chunks = [audio]
+        if vad.ENABLED:
+            with metrics.stage_timer("vad"):
+                chunks = vad.pack_segments(audio, vad.speech_segments(audio))
+            _check(token)
+        speech = sum(len(c) for c in chunks) / SAMPLE_RATE
+        depth = queue_depth()
+        # Tier by the audio Whisper will actually process
+        tier, reason = choose_tier(speech, depth)
+        info = {"tier": tier, "reason": reason, "duration": round(duration, 2),
+                "speech_duration": round(speech, 2), "segments": len(chunks),
+                "queue_depth": depth, "language_confidence": None}
+        if not chunks:
+            info["reason"] = "no speech detected"
+            return {"text": "", "language": "unknown"}, info
+        if BATCHING:
+            if not vad.ENABLED:
+                chunks = vad.pack_segments(audio, [(0, len(audio))])
+                info["segments"] = len(chunks)
+            return _transcribe_batched(chunks, tier, depth, info, token), info
+
+        with pool.acquire(tier) as model:
+            _check(token)
+            language = None  # auto-detect inside transcribe()
+            upgrade = None
+            if TIERING:
+                with metrics.stage_timer("whisper_language_detect"):
+                    language, confidence = detect_language(model, chunks[0])
+                info["language_confidence"] = round(confidence, 4)
+                if confidence < LANGUAGE_CONFIDENCE:
+                    upgrade = escalate(tier, depth)
+            if upgrade is None:
+                return _run(model, chunks, language, info, token), info
+
+        info["tier"] = upgrade
+        info["reason"] += f", escalated: language confidence {confidence:.2f} < {LANGUAGE_CONFIDENCE}"
+        with pool.acquire(upgrade) as model:
+            _check(token)
+            return _run(model, chunks, None, info, token), info
+
+
+def scheduler_for(tier):
+    with _schedulers_lock:
+        if tier not in _schedulers:
+            _schedulers[tier] = whisper_batcher.BatchScheduler(tier, pool)
+        return _schedulers[tier]
+
+
+def batching_stats():
+    with _schedulers_lock:
+        return {tier: scheduler.stats() for tier, scheduler in _schedulers.items()}
+
+
+def _transcribe_batched(chunks, tier, depth, info, token=None):
+    """Encode alongside other in-flight clips of the same tier, then decode this one."""
+    upgrade = escalate(tier, depth) if TIERING else None
+    start = time.perf_counter()
+    with metrics.stage_timer("whisper_transcribe"):
+        out = scheduler_for(tier).submit(chunks, min_confidence=LANGUAGE_CONFIDENCE if upgrade else None,
+                                         token=token)
+        if out["language_confidence"] is not None:
+            info["language_confidence"] = round(out["language_confidence"], 4)
+        if out["escalate"]:
+            info["tier"] = upgrade
+            info["reason"] += (f", escalated: language confidence "
+                               f"{out['language_confidence']:.2f} < {LANGUAGE_CONFIDENCE}")
+            out = scheduler_for(upgrade).submit(chunks, token=token)
+    info["seconds"] = round(time.perf_counter() - start, 3)
+    info["batch_windows"] = out["batch_windows"]
+    info["batch_wait_ms"] = out["batch_wait_ms"]
+    return {"text": out["text"], "language": out["language"]}
+
+
+def _run(model, chunks, language, info, token=None):
+    start = time.perf_counter()
+    with metrics.stage_timer("whisper_transcribe"):
+        if len(chunks) == 1:
+            result = model.transcribe(chunks[0], language=language, task="transcribe")
+        else:
+            if language is None:
+                # Segments are decoded together, so settle the language once
+                language, _ = detect_language(model, chunks[0])
+            result = _decode_segments(model, chunks, language, token)
+    info["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def _decode_segments(model, chunks, language, token=None):
+    """
+    Decode <= 30 s speech chunks as batches (one encoder pass per batch) and
+    stitch the text back in order.
+    """
+    import torch
+    import whisper
+
+    options = whisper.DecodingOptions(
+        language=language, task="transcribe", without_timestamps=True,
+        fp16=str(model.device) != "cpu",
+    )
+    texts = []
+    for i in range(0, len(chunks), SEGMENT_BATCH):
+        _check(token)
+        mels = [
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(chunk), n_mels=model.dims.n_mels)
+            for chunk in chunks[i:i + SEGMENT_BATCH]
+        ]
+        batch = torch.stack(mels).to(model.device)
+        texts.extend(r.text.strip() for r in whisper.decode(model, batch, options))
+    return {"text": " ".join(t for t in texts if t), "language": language or "unknown"}
@@ -3,7 +3,9 @@ const express = require("express");
 const mongoose = require("mongoose");
 const path = require("path");
 const fs = require("fs");
-const fetch = require("node-fetch");
+const readline = require("readline");
+const { Readable } = require("stream");
+const { mlFetch, ML_MEDIA_TIMEOUT_MS } = require("../utils/mlClient");
 const multer = require("multer");
 
 const Complaint = require("../models/Complaint");
@@ -108,6 +110,49 @@ function generateComplaintId() {
   return `CMP-${timestamp}-${random}`;
 }
 
+// Send a complaint's text, optional voice recording and optional video to the
+// ML service in one request; the service runs the pipelines concurrently and
+// returns per-modality results plus the fused category/priority/confidence.
+async function analyzeComplaint({ text, district, audioPath, audioName, videoUrl, videoCategory, videoConfidence }) {
+  const FormData = (await import("form-data")).default;
+  const formData = new FormData();
+  formData.append("text", text || "");
+  if (district) {
+    // Text is classified by the district's model, as on /predict
+    formData.append("model_key", `district/${district}`);
+  }
+  if (audioPath && fs.existsSync(audioPath)) {
+    formData.append("audio", fs.createReadStream(audioPath), {
+      filename: audioName || path.basename(audioPath),
+      contentType: "audio/webm",
+    });
+  }
+  if (videoUrl) {
+    formData.append("video_url", videoUrl);
+  } else if (videoCategory) {
+    // Reuse an earlier video analysis instead of downloading the video again
+    formData.append("video_category", videoCategory);
+    formData.append("video_confidence", String(videoConfidence ?? 0.5));
+  }
+  return mlFetch("/analyze-complaint", {
+    method: "POST",
+    body: formData,
+    headers: formData.getHeaders(),
+    timeoutMs: ML_MEDIA_TIMEOUT_MS,
+  });
+}
+
+function voiceSummaryFrom(voice) {
+  return {
+    transcription: voice.transcription || "",
+    summary: voice.summary || "",
+    detectedCategory: voice.detectedCategory || "other",
+    detectedPriority: voice.detectedPriority || "medium",
+    detectedLanguage: voice.detectedLanguage || "unknown",
+    analyzedAt: new Date(),
+  };
+}
+
 // Create a new complaint (with image + voice upload)
 router.post("/", verifyToken, upload.fields([
   { name: "image", maxCount: 1 },
@@ -147,10 +192,15 @@ router.post("/", verifyToken, upload.fields([
     console.log(`🔍 Attempting ML classification for: "${req.body.description}"`);
 
     try {
-      const mlRes = await fetch("http://localhost:8001/predict", {
+      const mlRes = await mlFetch("/predict", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ text: req.body.description, top_k: 3 }),
+        // Served by the district's own model when one is registered, else the global one
+        body: JSON.stringify({
+          text: req.body.description,
+          top_k: 3,
+          model_key: req.body.district ? `district/${req.body.district}` : undefined,
+        }),
       });
 
       console.log(`📡 ML Service Response Status: ${mlRes.status}`);
@@ -206,122 +256,54 @@ router.post("/", verifyToken, upload.fields([
 
     await newComplaint.save();
 
-    // 🎥 Trigger async video ML analysis + aggregate all predictions
-    if (newComplaint.videoUrl) {
+    // 🎥 Trigger async multimodal ML analysis (text + voice + video in one call)
+    if (newComplaint.videoUrl || voiceFile) {
       (async () => {
         try {
-          console.log(`🎥 Triggering async video analysis for ${newComplaint.complaintId}...`);
-          const videoMlRes = await fetch("http://localhost:8001/analyze-video", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({
-              video_url: newComplaint.videoUrl,
-              complaint_id: newComplaint._id.toString(),
-            }),
+          console.log(`🎥 Triggering async multimodal analysis for ${newComplaint.complaintId}...`);
+          const analysisRes = await analyzeComplaint({
+            text: newComplaint.description,
+            district: newComplaint.district,
+            audioPath: voiceFile ? voiceFile.path : null,
+            audioName: voiceFile ? voiceFile.filename : null,
+            videoUrl: newComplaint.videoUrl,
           });
-
-          let videoCategory = null;
-          let videoConfidence = 0;
-          let videoStatus = "failed";
-
-          if (videoMlRes.ok) {
-            const videoData = await videoMlRes.json();
-            videoCategory = videoData.category || null;
-            videoConfidence = videoData.confidence || 0;
-            videoStatus = "completed";
-            console.log(`✅ Video analysis completed: ${videoData.category} (${videoData.confidence})`);
+          if (!analysisRes.ok) {
+            throw new Error(`ML service returned ${analysisRes.status}`);
           }
-
-          // Fetch latest complaint state (may have voice analysis too now)
-          const latestComplaint = await Complaint.findById(newComplaint._id);
-
-          // --- AGGREGATE PREDICTIONS: text + voice + video ---
-          const predictions = [];
-
-          // Text ML prediction (weight: 0.5)
-          if (latestComplaint.category && latestComplaint.category !== "unassigned") {
-            predictions.push({
-              source: "text",
-              category: latestComplaint.category,
-              priority: latestComplaint.priority || "low",
-              confidence: latestComplaint.modelConfidence || 0.5,
-              weight: 0.5,
-            });
+          const analysis = await analysisRes.json();
+          const { fused } = analysis;
+
+          // Text alone is already classified above; only a fusion with voice/video replaces it
+          const update = {};
+          if (fused.sources.length > 1) {
+            // Fetch latest complaint state (an admin may have corrected it meanwhile)
+            const latestComplaint = await Complaint.findById(newComplaint._id);
+            update.category = latestComplaint.humanCorrection || fused.category;
+            update.priority = fused.priority;
+            update.modelConfidence = fused.confidence;
+            console.log(`🧮 Aggregated from ${fused.sources.join("+")}: category=${fused.category}, priority=${fused.priority}, confidence=${fused.confidence.toFixed(2)}`);
           }
 
-          // Voice prediction (weight: 0.3)
-          if (latestComplaint.voiceSummary?.detectedCategory && latestComplaint.voiceSummary.detectedCategory !== "other") {
-            predictions.push({
-              source: "voice",
-              category: latestComplaint.voiceSummary.detectedCategory,
-              priority: latestComplaint.voiceSummary.detectedPriority || "low",
-              confidence: latestComplaint.voiceSummary.confidence || 0.5,
-              weight: 0.3,
-            });
+          if (newComplaint.videoUrl) {
+            update.videoCategory = analysis.video?.category || null;
+            update.videoConfidence = analysis.video?.confidence || 0;
+            update.videoStatus = analysis.video ? "completed" : "failed";
+            if (analysis.video) {
+              console.log(`✅ Video analysis completed: ${analysis.video.category} (${analysis.video.confidence})`);
+            }
           }
-
-          // Video prediction (weight: 0.2)
-          if (videoCategory && videoCategory !== "unassigned") {
-            predictions.push({
-              source: "video",
-              category: videoCategory,
-              priority: "medium", // video analysis doesn't predict priority directly
-              confidence: videoConfidence,
-              weight: 0.2,
-            });
+          if (analysis.voice) {
+            update.voiceSummary = voiceSummaryFrom(analysis.voice);
           }
 
-          // Weighted majority voting for category
-          let finalCategory = latestComplaint.category || "unassigned";
-          let finalPriority = latestComplaint.priority || "low";
-          let finalConfidence = latestComplaint.modelConfidence || 0;
-
-          if (predictions.length > 1) {
-            // Category: weighted vote
-            const categoryScores = {};
-            for (const pred of predictions) {
-              const score = pred.weight * pred.confidence;
-              categoryScores[pred.category] = (categoryScores[pred.category] || 0) + score;
-            }
-            finalCategory = Object.entries(categoryScores).sort((a, b) => b[1] - a[1])[0][0];
-
-            // Priority: weighted average (high=3, medium=2, low=1)
-            const prioMap = { high: 3, medium: 2, low: 1 };
-            const prioReverseMap = { 3: "high", 2: "medium", 1: "low" };
-            let totalWeight = 0;
-            let prioScore = 0;
-            for (const pred of predictions) {
-              prioScore += (prioMap[pred.priority] || 1) * pred.weight;
-              totalWeight += pred.weight;
-            }
-            const avgPrio = Math.round(prioScore / totalWeight);
-            finalPriority = prioReverseMap[avgPrio] || "low";
-
-            // Confidence: weighted average
-            totalWeight = 0;
-            let confSum = 0;
-            for (const pred of predictions) {
-              confSum += pred.confidence * pred.weight;
-              totalWeight += pred.weight;
-            }
-            finalConfidence = confSum / totalWeight;
+          await Complaint.findByIdAndUpdate(newComplaint._id, update);
 
-            console.log(`🧮 Aggregated from ${predictions.map(p => p.source).join("+")}: category=${finalCategory}, priority=${finalPriority}, confidence=${finalConfidence.toFixed(2)}`);
+        } catch (analysisErr) {
+          console.error("⚠️ Multimodal analysis failed:", analysisErr.message);
+          if (newComplaint.videoUrl) {
+            await Complaint.findByIdAndUpdate(newComplaint._id, { videoStatus: "failed" });
           }
-
-          // Update complaint with video results + aggregated final
-          await Complaint.findByIdAndUpdate(newComplaint._id, {
-            videoCategory,
-            videoConfidence,
-            videoStatus,
-            category: latestComplaint.humanCorrection || finalCategory,
-            priority: finalPriority,
-            modelConfidence: parseFloat(finalConfidence.toFixed(4)),
-          });
-
-        } catch (videoErr) {
-          console.error("⚠️ Video analysis failed:", videoErr.message);
-          await Complaint.findByIdAndUpdate(newComplaint._id, { videoStatus: "failed" });
         }
       })();
     }
@@ -433,33 +415,86 @@ router.post("/reclassify", verifyToken, verifyAdmin, async (req, res) => {
       }
       : {};
 
-    const complaints = await Complaint.find(query).limit(2000);
+    // Stream every matching complaint to the ML service as NDJSON over one
+    // connection and apply predictions as they stream back. Nothing is held
+    // in memory beyond one write batch, so there is no row limit.
+    const cursor = Complaint.find(query).select("_id description district").lean().cursor();
+    let total = 0;
+    const body = Readable.from(
+      (async function* () {
+        for await (const c of cursor) {
+          total += 1;
+          yield JSON.stringify({
+            id: c._id.toString(),
+            text: c.description || "",
+            // Scored by the district's own model when one is registered, as on create
+            model_key: c.district ? `district/${c.district}` : undefined,
+          }) + "\n";
+        }
+      })()
+    );
+
+    const mlRes = await mlFetch("/predict/stream?top_k=3", {
+      method: "POST",
+      headers: { "Content-Type": "application/x-ndjson" },
+      body,
+    });
+    if (!mlRes.ok) {
+      await cursor.close();
+      return res.status(502).json({
+        message: "ML service rejected reclassification stream",
+        error: `${mlRes.status} ${mlRes.statusText}`,
+      });
+    }
+
     let updated = 0;
+    let failed = 0;
+    let skipped = 0;
+    let ops = [];
+    const flush = async () => {
+      if (!ops.length) return;
+      const result = await Complaint.bulkWrite(ops, { ordered: false });
+      updated += result.modifiedCount ?? ops.length;
+      ops = [];
+    };
 
-    for (const c of complaints) {
-      try {
-        const mlRes = await fetch("http://localhost:8001/predict", {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ text: c.description || "", top_k: 3 }),
-        });
-        if (!mlRes.ok) continue;
-        const data = await mlRes.json();
-        c.category = data.category || "unassigned";
-        c.priority = data.priority || "low";
-        c.modelConfidence = data.confidence ?? null;
-        c.isFakeScore = data.isFakeScore ?? null;
-        await c.save();
-        updated += 1;
-      } catch (e) {
+    const lines = readline.createInterface({ input: mlRes.body, crlfDelay: Infinity });
+    for await (const line of lines) {
+      if (!line.trim()) continue;
+      const data = JSON.parse(line);
+      if (data.error || !data.id) {
+        failed += 1;
+        continue;
+      }
+      // Same text and model as the last run: the stored result is already current.
+      // Unassigned complaints are written anyway, since they were picked for lacking one.
+      if (data.unchanged && !onlyUnassigned) {
+        skipped += 1;
         continue;
       }
+      ops.push({
+        updateOne: {
+          filter: { _id: data.id },
+          update: {
+            $set: {
+              category: data.category || "unassigned",
+              priority: data.priority || "low",
+              modelConfidence: data.confidence ?? null,
+              isFakeScore: data.isFakeScore ?? null,
+            },
+          },
+        },
+      });
+      if (ops.length >= 500) await flush();
     }
+    await flush();
 
     res.json({
       message: "Reclassification complete",
-      total: complaints.length,
+      total,
       updated,
+      skipped,
+      failed,
     });
   } catch (err) {
     res.status(500).json({
@@ -507,6 +542,65 @@ router.put("/:id/status", verifyToken, verifyAdmin, async (req, res) => {
   }
 });
 
+/* -------------------------------------------------------------------------- */
+/*                        ADMIN CATEGORY CORRECTION                           */
+/* -------------------------------------------------------------------------- */
+router.put("/:id/correction", verifyToken, verifyAdmin, async (req, res) => {
+  try {
+    const { category, priority } = req.body;
+    const validPriorities = ["low", "medium", "high"];
+
+    if (!category) {
+      return res.status(400).json({ message: "Category is required" });
+    }
+    if (priority && !validPriorities.includes(priority)) {
+      return res.status(400).json({
+        message: "Invalid priority value",
+        error: `Priority must be one of: ${validPriorities.join(", ")}`,
+      });
+    }
+
+    if (!mongoose.Types.ObjectId.isValid(req.params.id)) {
+      return res.status(400).json({ message: "Invalid complaint ID format" });
+    }
+
+    const complaint = await Complaint.findByIdAndUpdate(
+      req.params.id,
+      { humanCorrection: category, ...(priority && { priority }) },
+      { new: true, runValidators: true }
+    );
+
+    if (!complaint) {
+      return res.status(404).json({ message: "Complaint not found" });
+    }
+
+    // Teach the ML service in the background; the correction is saved either way
+    mlFetch("/feedback", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        items: [{
+          text: complaint.description,
+          category,
+          ...(priority && { priority }),
+          complaint_id: String(complaint._id),
+        }],
+      }),
+    })
+      .then(async (mlRes) => {
+        if (!mlRes.ok) console.warn(`⚠️ ML feedback rejected (${mlRes.status}): ${await mlRes.text()}`);
+      })
+      .catch((err) => console.warn("⚠️ ML feedback failed:", err.message));
+
+    res.json({ message: "Correction saved", complaint });
+  } catch (err) {
+    res.status(500).json({
+      message: "Error saving correction",
+      error: err.message,
+    });
+  }
+});
+
 /* -------------------------------------------------------------------------- */
 /*                            DELETE COMPLAINT                                */
 /* -------------------------------------------------------------------------- */
@@ -516,6 +610,18 @@ router.delete("/:id", verifyToken, verifyAdmin, async (req, res) => {
     if (!complaint) {
       return res.status(404).json({ message: "Complaint not found" });
     }
+
+    // Drop its stored bulk prediction in the background; nothing re-scores a deleted complaint
+    mlFetch("/predict/store/prune", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ ids: [String(complaint._id)] }),
+    })
+      .then(async (mlRes) => {
+        if (!mlRes.ok) console.warn(`⚠️ ML store prune rejected (${mlRes.status}): ${await mlRes.text()}`);
+      })
+      .catch((err) => console.warn("⚠️ ML store prune failed:", err.message));
+
     res.json({ message: "Complaint deleted successfully", complaint });
   } catch (err) {
     res
@@ -612,20 +718,17 @@ router.post("/:id/summarize-audio", verifyToken, async (req, res) => {
       return res.status(404).json({ message: "Audio file not found on server" });
     }
 
-    // Send audio file to local ML service (Whisper transcription)
-    const FormData = (await import("form-data")).default;
-    const formData = new FormData();
-    formData.append("audio", fs.createReadStream(audioPath), {
-      filename: complaint.voiceRecording,
-      contentType: "audio/webm",
-    });
-
     console.log(`🎙️ Sending audio to Whisper ML service for complaint ${complaint.complaintId}...`);
 
-    const mlRes = await fetch("http://localhost:8001/transcribe", {
-      method: "POST",
-      body: formData,
-      headers: formData.getHeaders(),
+    // Re-classifies the text alongside the audio and fuses in the stored video result
+    const videoDone = complaint.videoStatus === "completed";
+    const mlRes = await analyzeComplaint({
+      text: complaint.description,
+      district: complaint.district,
+      audioPath,
+      audioName: complaint.voiceRecording,
+      videoCategory: videoDone ? complaint.videoCategory : null,
+      videoConfidence: complaint.videoConfidence || 0.5,
     });
 
     if (!mlRes.ok) {
@@ -635,81 +738,21 @@ router.post("/:id/summarize-audio", verifyToken, async (req, res) => {
     }
 
     const analysis = await mlRes.json();
-
-    // Save to database
-    complaint.voiceSummary = {
-      transcription: analysis.transcription || "",
-      summary: analysis.summary || "",
-      detectedCategory: analysis.detectedCategory || "other",
-      detectedPriority: analysis.detectedPriority || "medium",
-      detectedLanguage: analysis.detectedLanguage || "unknown",
-      analyzedAt: new Date(),
-    };
-
-    // --- Aggregate text + voice + video predictions ---
-    const predictions = [];
-
-    // Text prediction (weight: 0.5)
-    if (complaint.category && complaint.category !== "unassigned") {
-      predictions.push({
-        source: "text",
-        category: complaint.category,
-        priority: complaint.priority || "low",
-        confidence: complaint.modelConfidence || 0.5,
-        weight: 0.5,
-      });
+    if (!analysis.voice) {
+      console.error("ML Service error:", analysis.errors?.voice);
+      return res.status(500).json({ message: "Failed to analyze audio via ML service", error: analysis.errors?.voice });
     }
 
-    // Voice prediction (weight: 0.3)
-    const voiceCat = analysis.detectedCategory;
-    if (voiceCat && voiceCat !== "other") {
-      predictions.push({
-        source: "voice",
-        category: voiceCat,
-        priority: analysis.detectedPriority || "low",
-        confidence: analysis.confidence || 0.5,
-        weight: 0.3,
-      });
-    }
-
-    // Video prediction (weight: 0.2)
-    if (complaint.videoCategory && complaint.videoCategory !== "unassigned" && complaint.videoStatus === "completed") {
-      predictions.push({
-        source: "video",
-        category: complaint.videoCategory,
-        priority: "medium",
-        confidence: complaint.videoConfidence || 0.5,
-        weight: 0.2,
-      });
-    }
-
-    // Perform weighted aggregation if multiple sources exist
-    if (predictions.length > 1) {
-      const categoryScores = {};
-      for (const pred of predictions) {
-        const score = pred.weight * pred.confidence;
-        categoryScores[pred.category] = (categoryScores[pred.category] || 0) + score;
-      }
-      complaint.category = complaint.humanCorrection || Object.entries(categoryScores).sort((a, b) => b[1] - a[1])[0][0];
-
-      const prioMap = { high: 3, medium: 2, low: 1 };
-      const prioReverseMap = { 3: "high", 2: "medium", 1: "low" };
-      let totalWeight = 0, prioScore = 0;
-      for (const pred of predictions) {
-        prioScore += (prioMap[pred.priority] || 1) * pred.weight;
-        totalWeight += pred.weight;
-      }
-      complaint.priority = prioReverseMap[Math.round(prioScore / totalWeight)] || "low";
-
-      totalWeight = 0;
-      let confSum = 0;
-      for (const pred of predictions) {
-        confSum += pred.confidence * pred.weight;
-        totalWeight += pred.weight;
-      }
-      complaint.modelConfidence = parseFloat((confSum / totalWeight).toFixed(4));
-
-      console.log(`🧮 Aggregated from ${predictions.map(p => p.source).join("+")}: category=${complaint.category}, priority=${complaint.priority}`);
+    // Save to database
+    complaint.voiceSummary = voiceSummaryFrom(analysis.voice);
+
+    // Apply the fused text + voice + video prediction
+    const { fused } = analysis;
+    if (fused.sources.length > 1) {
+      complaint.category = complaint.humanCorrection || fused.category;
+      complaint.priority = fused.priority;
+      complaint.modelConfidence = fused.confidence;
+      console.log(`🧮 Aggregated from ${fused.sources.join("+")}: category=${complaint.category}, priority=${complaint.priority}`);
     }
 
     await complaint.save();
@@ -6,7 +6,7 @@ const fs = require("fs");
 const ffmpeg = require("fluent-ffmpeg");
 const ffmpegInstaller = require("@ffmpeg-installer/ffmpeg");
 const cloudinary = require("cloudinary").v2;
-const fetch = require("node-fetch");
+const { mlFetch, ML_MEDIA_TIMEOUT_MS } = require("../utils/mlClient");
 
 const Complaint = require("../models/Complaint");
 const { verifyToken } = require("../middleware/authMiddleware");
@@ -116,10 +116,11 @@ async function triggerMLAnalysis(complaintId, videoUrl) {
   try {
     console.log(`🧠 Triggering ML video analysis for complaint ${complaintId}...`);
 
-    const mlRes = await fetch("http://localhost:8001/analyze-video", {
+    const mlRes = await mlFetch("/analyze-video", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ video_url: videoUrl, complaint_id: complaintId }),
+      timeoutMs: ML_MEDIA_TIMEOUT_MS,
     });
 
     if (mlRes.ok) {
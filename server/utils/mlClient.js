@@ -0,0 +1,41 @@
+// utils/mlClient.js
+// Shared HTTP client for the Python ML service.
+//
+// Reuses keep-alive connections instead of opening a new loopback connection
+// per call. If ML_SERVICE_SOCKET is set (see `start_ml_service.py --uds`), all
+// requests go over that Unix domain socket; otherwise ML_SERVICE_URL is used.
+const http = require("http");
+const net = require("net");
+const fetch = require("node-fetch");
+
+const ML_SERVICE_URL = process.env.ML_SERVICE_URL || "http://localhost:8001";
+const ML_SERVICE_SOCKET = process.env.ML_SERVICE_SOCKET;
+// How long callers wait for transcription / video analysis before giving up
+const ML_MEDIA_TIMEOUT_MS = parseInt(process.env.ML_MEDIA_TIMEOUT_MS || "120000", 10);
+
+// Idle sockets are dropped after 60s, below the service's 75s keep-alive,
+// so we never reuse a connection the server is about to close.
+const agentOptions = { keepAlive: true, keepAliveMsecs: 30000, maxSockets: 32, timeout: 60000 };
+
+class UnixSocketAgent extends http.Agent {
+  createConnection(options, callback) {
+    return net.createConnection(ML_SERVICE_SOCKET, callback);
+  }
+}
+
+const agent = ML_SERVICE_SOCKET ? new UnixSocketAgent(agentOptions) : new http.Agent(agentOptions);
+// With a socket path the host part of the URL is only used for the Host header
+const baseUrl = ML_SERVICE_SOCKET ? "http://ml-service" : ML_SERVICE_URL.replace(/\/$/, "");
+
+// With `timeoutMs` the call gives up after that long, and the same budget is
+// sent as X-Request-Timeout-Ms so the service stops work nobody waits for.
+function mlFetch(path, options = {}) {
+  const { timeoutMs, ...fetchOptions } = options;
+  if (timeoutMs) {
+    fetchOptions.timeout = timeoutMs;
+    fetchOptions.headers = { ...fetchOptions.headers, "X-Request-Timeout-Ms": String(timeoutMs) };
+  }
+  return fetch(`${baseUrl}${path}`, { ...fetchOptions, agent });
+}
+
+module.exports = { mlFetch, ML_MEDIA_TIMEOUT_MS };